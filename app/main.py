@@ -1,9 +1,92 @@
+import logging
+import time
+import uuid
 from fastapi import FastAPI
-from app.models.database import Base, engine
+from fastapi.responses import PlainTextResponse
+from starlette.datastructures import Headers, MutableHeaders
+from app.models.database import (
+    DATABASE_READ_URL,
+    DATABASE_URL,
+    Base,
+    describe_engine,
+    engine,
+    engine_settings,
+    read_engine,
+    read_engine_settings,
+)
 from app.views import user_routes, account_routes, routes
+from app.services import idempotency, money_migration, profile_cache, rollups, user_import
+from app.services.password_pool import password_pool
+from app.services.write_pipeline import WRITE_PIPELINE, write_pipeline
+from app.utils.audit import close_journals
+from app.utils.log_config import request_id_var, setup_logging, shutdown_logging
+from app.utils import metrics, query_budget
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="API Bancária Assíncrona", version="1.0")
 
+metrics.instrument_engine(engine, "write")
+if read_engine is not engine:
+    metrics.instrument_engine(read_engine, "read")
+for _engine in {engine, read_engine}:
+    query_budget.instrument_engine(_engine)
+
+class RequestMiddleware:
+    """Middleware ASGI da aplicação: ID de correlação, orçamento de consultas e métricas.
+
+    Propaga o ``X-Request-ID`` (gerado se ausente) para os logs e para a
+    resposta, conta os comandos SQL da requisição (``query_budget``) e mede
+    latência e requisições em andamento por router. Uma única camada ASGI
+    pura, sem a task e o stream extras que cada ``BaseHTTPMiddleware`` cria
+    por requisição.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = Headers(scope=scope).get("x-request-id") or uuid.uuid4().hex
+        router = metrics.router_label(scope["path"])
+        in_flight = metrics.HTTP_IN_FLIGHT.labels(router)
+        in_flight.inc()
+        started = time.perf_counter()
+        status_code = 500
+        request_id_token = request_id_var.set(request_id)
+        stats, stats_token = query_budget.begin_request(scope)
+
+        async def send_with_headers(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = request_id
+                for name, value in query_budget.debug_headers(stats):
+                    headers[name] = value
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            query_budget.end_request(stats, stats_token)
+            request_id_var.reset(request_id_token)
+            in_flight.dec()
+            metrics.HTTP_LATENCY.labels(router).observe(time.perf_counter() - started)
+            metrics.HTTP_REQUESTS.labels(router, scope["method"], str(status_code)).inc()
+
+
+app.add_middleware(RequestMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Métricas da aplicação no formato texto do Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 app.include_router(user_routes.router)
 app.include_router(account_routes.router)
 app.include_router(routes.router)
@@ -11,5 +94,58 @@ app.include_router(routes.router)
 @app.on_event("startup")
 async def startup():
     """Cria as tabelas no banco de dados ao iniciar o aplicativo."""
+    logger.info(describe_engine(DATABASE_URL, engine_settings))
+    if read_engine is not engine:
+        logger.info("leitura: " + describe_engine(DATABASE_READ_URL, read_engine_settings))
     async with engine.begin() as conn:
+        await conn.run_sync(money_migration.check_migrated)
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
+        await conn.run_sync(_normalize_legacy_timestamps)
+    await rollups.ensure_rollups()
+    if WRITE_PIPELINE:
+        await write_pipeline.start()
+    idempotency.start_purger()
+    rollups.start_catchup()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Drena o pipeline de escrita, libera o pool de hashing e grava auditoria e logs pendentes."""
+    await idempotency.stop_purger()
+    await rollups.stop_catchup()
+    await write_pipeline.stop()
+    password_pool.shutdown()
+    user_import.shutdown()
+    await profile_cache.close()
+    close_journals()
+    shutdown_logging()
+
+
+def _create_missing_indexes(sync_conn):
+    """Cria índices novos em tabelas que já existiam (o create_all só os cria junto da tabela)."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+def _normalize_legacy_timestamps(sync_conn):
+    """Completa com microssegundos os ``created_at`` gravados pelo ``func.now()`` do SQLite.
+
+    As linhas antigas ficaram como ``'YYYY-MM-DD HH:MM:SS'`` e, comparadas como
+    texto, ordenam antes de ``'... HH:MM:SS.000000'``: o cursor do extrato e a
+    cauda do saldo histórico perderiam transações do mesmo segundo. Como essas
+    linhas são sempre as mais antigas, basta olhar a primeira para saber se a
+    conversão (feita uma única vez) ainda é necessária.
+    """
+    if sync_conn.dialect.name != "sqlite":
+        return
+    first = sync_conn.exec_driver_sql(
+        "SELECT length(created_at) FROM transactions ORDER BY id LIMIT 1"
+    ).scalar()
+    if first != 19:
+        return
+    updated = sync_conn.exec_driver_sql(
+        "UPDATE transactions SET created_at = created_at || '.000000' WHERE length(created_at) = 19"
+    ).rowcount
+    logger.info("created_at normalizado para microssegundos em %s transações antigas.", updated)
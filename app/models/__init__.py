@@ -1,4 +1,11 @@
-from .database import Base, engine, get_db
+from .database import Base, engine, get_db, get_read_db, read_engine
 from .user import User
 from .account import Account
 from .transaction import Transaction
+from .idempotency import IdempotencyKey
+from .balance_slot import AccountBalanceSlot
+from .user_import import UserImport, UserImportError
+from .rollup import AccountDailyRollup, AccountMonthlyRollup, RollupState
+from .balance_checkpoint import BalanceCheckpoint, BalanceCheckpointState
+from .posting_run import PostingRun
+from .revoked_token import RevokedToken
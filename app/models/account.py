@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, ForeignKey
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -6,7 +6,8 @@ class Account(Base):
     __tablename__ = "accounts"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    balance = Column(Float, default=0.0)
+    # Saldo em centavos (ver ``app/utils/money.py``).
+    balance_cents = Column(BigInteger, nullable=False, default=0)
 
     transactions = relationship("Transaction", back_populates="account")
     owner = relationship("User", back_populates="accounts")
@@ -0,0 +1,23 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer
+from .database import Base
+
+class BalanceCheckpoint(Base):
+    """Saldo de uma conta (em centavos) logo após uma transação (ponto de partida para saldos históricos)."""
+    __tablename__ = "balance_checkpoints"
+    # Busca do checkpoint mais próximo anterior a um instante.
+    __table_args__ = (
+        Index("ix_balance_checkpoints_account_created", "account_id", "created_at"),
+    )
+    account_id = Column(Integer, ForeignKey("accounts.id"), primary_key=True)
+    # Última transação da conta incluída em ``balance``.
+    transaction_id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    balance = Column(BigInteger, nullable=False)
+
+
+class BalanceCheckpointState(Base):
+    """Transações da conta desde o último checkpoint (decide quando gravar o próximo)."""
+    __tablename__ = "balance_checkpoint_state"
+    account_id = Column(Integer, ForeignKey("accounts.id"), primary_key=True)
+    since_checkpoint = Column(Integer, nullable=False, default=0)
+    checkpoint_at = Column(DateTime(timezone=True), nullable=False)
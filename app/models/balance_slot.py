@@ -0,0 +1,12 @@
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer
+from .database import Base
+
+class AccountBalanceSlot(Base):
+    """Parcela do saldo de uma conta com saldo fragmentado (contas muito movimentadas).
+
+    O saldo da conta é ``accounts.balance_cents`` mais a soma das suas parcelas (em centavos).
+    """
+    __tablename__ = "account_balance_slots"
+    account_id = Column(Integer, ForeignKey("accounts.id"), primary_key=True)
+    slot = Column(Integer, primary_key=True)
+    balance = Column(BigInteger, nullable=False, default=0)
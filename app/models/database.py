@@ -1,16 +1,214 @@
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-DATABASE_URL = os.getenv("DB_URL")
+DATABASE_URL = os.getenv("DB_URL", "sqlite+aiosqlite:///./bank.db")
+# Réplica/URL somente leitura opcional; sem ela, as leituras usam o mesmo banco com outro pool.
+DATABASE_READ_URL = os.getenv("DB_READ_URL") or DATABASE_URL
+DB_PROFILE = os.getenv("DB_PROFILE", "safe")
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+# Perfis de engine: PRAGMAs aplicados a cada conexão SQLite + dimensionamento do pool.
+# "legacy" mantém os padrões do driver (rollback journal, sem busy_timeout).
+ENGINE_PROFILES = {
+    "legacy": {},
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+        "cache_size": -16000,
+        "temp_store": "DEFAULT",
+    },
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "busy_timeout": 10000,
+        "cache_size": -131072,
+        "mmap_size": 1073741824,
+        "temp_store": "MEMORY",
+    },
+}
+
+_PRAGMA_CHOICES = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+_PRAGMA_INTS = ("busy_timeout", "cache_size", "mmap_size")
+_POOL_INTS = ("pool_size", "max_overflow", "pool_timeout")
+
+
+def load_engine_settings(profile: str = DB_PROFILE, environ=os.environ):
+    """Monta e valida as configurações de engine a partir do perfil e do ``.env``.
+
+    Variáveis ``DB_<OPÇÃO>`` (ex.: ``DB_SYNCHRONOUS``, ``DB_BUSY_TIMEOUT``,
+    ``DB_POOL_SIZE``) sobrescrevem o valor do perfil.
+
+    Args:
+        profile (str): Nome do perfil em ``ENGINE_PROFILES``.
+        environ (Mapping): Origem das variáveis de ambiente.
+    Returns:
+        dict: ``{"profile", "pragmas", "pool"}`` já validados.
+    Raises:
+        ValueError: Se o perfil ou algum valor for inválido.
+    """
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"DB_PROFILE inválido: {profile} (opções: {', '.join(ENGINE_PROFILES)}).")
+
+    pragmas = dict(ENGINE_PROFILES[profile])
+    for name in (*_PRAGMA_CHOICES, *_PRAGMA_INTS):
+        value = environ.get(f"DB_{name.upper()}")
+        if value is not None and value != "":
+            pragmas[name] = value
+
+    for name, choices in _PRAGMA_CHOICES.items():
+        if name in pragmas:
+            pragmas[name] = str(pragmas[name]).upper()
+            if pragmas[name] not in choices:
+                raise ValueError(f"DB_{name.upper()} inválido: {pragmas[name]} (opções: {', '.join(sorted(choices))}).")
+    for name in _PRAGMA_INTS:
+        if name in pragmas:
+            try:
+                pragmas[name] = int(pragmas[name])
+            except ValueError:
+                raise ValueError(f"DB_{name.upper()} deve ser um número inteiro.")
+
+    return {"profile": profile, "pragmas": pragmas, "pool": _load_pool_settings(environ, "DB_")}
+
+
+def _load_pool_settings(environ, prefix: str):
+    pool = {}
+    for name in _POOL_INTS:
+        key = f"{prefix}{name.upper()}"
+        value = environ.get(key)
+        if value is not None and value != "":
+            try:
+                pool[name] = int(value)
+            except ValueError:
+                raise ValueError(f"{key} deve ser um número inteiro.")
+            if pool[name] < 0:
+                raise ValueError(f"{key} não pode ser negativo.")
+    return pool
+
+
+def load_read_engine_settings(settings: dict, environ=os.environ):
+    """Deriva as configurações da engine de leitura a partir das de escrita.
+
+    Em SQLite adiciona ``PRAGMA query_only=ON`` (o ``mode=ro`` da URI não abre
+    bancos em WAL sem o arquivo ``-shm``). ``DB_READ_POOL_SIZE``,
+    ``DB_READ_MAX_OVERFLOW`` e ``DB_READ_POOL_TIMEOUT`` dimensionam o pool.
+    """
+    return {
+        "profile": settings["profile"],
+        "pragmas": {**settings["pragmas"], "query_only": "ON"},
+        "pool": _load_pool_settings(environ, "DB_READ_") or dict(settings["pool"]),
+    }
+
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def create_engine_from_settings(url: str, settings: dict, **kwargs):
+    """Cria uma engine async aplicando o perfil (PRAGMAs via evento ``connect``).
+
+    Em SQLite, a transação passa a ser aberta explicitamente com ``BEGIN``; o
+    modo pode ser escolhido por conexão com a opção de execução
+    ``sqlite_begin`` (ex.: ``IMMEDIATE`` para caminhos de escrita).
+    """
+    parsed = make_url(url)
+    engine_kwargs = dict(kwargs)
+    if not _is_memory_sqlite(parsed):
+        if parsed.get_backend_name() == "sqlite":
+            # O aiosqlite usa NullPool por padrão: reconectaria (e reaplicaria os PRAGMAs) a cada uso.
+            engine_kwargs.setdefault("poolclass", AsyncAdaptedQueuePool)
+        engine_kwargs.update(settings["pool"])
+    new_engine = create_async_engine(url, echo=False, **engine_kwargs)
+
+    if parsed.get_backend_name() == "sqlite":
+        pragmas = settings["pragmas"]
+
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            # Desliga o controle de transação do driver para que BEGIN/SAVEPOINT funcionem.
+            dbapi_connection.isolation_level = None
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+        @event.listens_for(new_engine.sync_engine, "begin")
+        def _on_begin(conn):
+            mode = conn.get_execution_options().get("sqlite_begin", "DEFERRED")
+            conn.exec_driver_sql(f"BEGIN {mode}")
+
+    return new_engine
+
+
+def describe_engine(url: str, settings: dict):
+    """Resumo legível (sem credenciais) do perfil em uso, para o log de startup."""
+    safe_url = make_url(url).render_as_string(hide_password=True)
+    pragmas = ", ".join(f"{k}={v}" for k, v in settings["pragmas"].items()) or "padrões do driver"
+    pool = ", ".join(f"{k}={v}" for k, v in settings["pool"].items()) or "padrão"
+    return f"engine {safe_url} perfil={settings['profile']} pragmas=[{pragmas}] pool=[{pool}]"
+
+
+engine_settings = load_engine_settings()
+engine = create_engine_from_settings(DATABASE_URL, engine_settings)
 SessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+read_engine_settings = load_read_engine_settings(engine_settings)
+if _is_memory_sqlite(make_url(DATABASE_READ_URL)):
+    # Banco em memória existe só na conexão da engine principal.
+    read_engine = engine
+else:
+    read_engine = create_engine_from_settings(DATABASE_READ_URL, read_engine_settings)
+ReadSessionLocal = sessionmaker(bind=read_engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
 async def get_db():
     async with SessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+async def get_read_db():
+    """Sessão do pool somente leitura, para rotas GET."""
+    async with ReadSessionLocal() as session:
+        yield session
+
+async def begin_write(db):
+    """Abre a transação da sessão já com o lock de escrita (``BEGIN IMMEDIATE`` no SQLite).
+
+    Deve ser chamada antes do primeiro comando em fluxos que leem e depois
+    escrevem, evitando ``database is locked`` na promoção do lock. Não faz
+    nada se a sessão já estiver em uma transação.
+    """
+    if db.in_transaction():
+        return
+    await db.connection(execution_options={"sqlite_begin": "IMMEDIATE"})
+
+_UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+async def upsert(db, model):
+    """``INSERT`` do dialeto da sessão, com suporte a ``on_conflict_do_update``.
+
+    Raises:
+        RuntimeError: Se o banco não for SQLite nem Postgres.
+    """
+    dialect = (await db.connection()).dialect.name
+    if dialect not in _UPSERT_INSERTS:
+        raise RuntimeError(f"Upsert não suportado no banco {dialect} (use sqlite ou postgresql).")
+    return _UPSERT_INSERTS[dialect](model)
@@ -0,0 +1,13 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from .database import Base
+
+class IdempotencyKey(Base):
+    """Resultado gravado de uma operação enviada com o cabeçalho ``Idempotency-Key``."""
+    __tablename__ = "idempotency_keys"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # Hash da operação e dos parâmetros: a mesma chave não pode ser reutilizada com outro pedido.
+    fingerprint = Column(String(64), nullable=False)
+    outcome = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True, default=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,22 @@
+from datetime import datetime, timezone
+from sqlalchemy import BigInteger, Column, DateTime, Float, Integer, String
+from .database import Base
+
+class PostingRun(Base):
+    """Execução de lançamentos programados (tarifa ou juros) e seu checkpoint por faixa de contas."""
+    __tablename__ = "posting_runs"
+    run_id = Column(String(64), primary_key=True)
+    kind = Column(String, nullable=False)
+    # Parâmetro do lançamento: valor da tarifa em centavos ou taxa de juros em partes por milhão.
+    amount_cents = Column(BigInteger)
+    rate_ppm = Column(BigInteger)
+    status = Column(String, nullable=False, default="running")
+    # Contas com ID até ``last_account_id`` já foram processadas; a execução vai até ``through_account_id``.
+    last_account_id = Column(Integer, nullable=False, default=0)
+    through_account_id = Column(Integer, nullable=False, default=0)
+    postings = Column(Integer, nullable=False, default=0)
+    posted_cents = Column(BigInteger, nullable=False, default=0)
+    chunks = Column(Integer, nullable=False, default=0)
+    seconds = Column(Float, nullable=False, default=0.0)
+    started_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    finished_at = Column(DateTime(timezone=True))
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, DateTime, String
+from .database import Base
+
+class RevokedToken(Base):
+    """Token de acesso revogado (logout), compartilhado por todos os workers até o ``exp`` original."""
+    __tablename__ = "revoked_tokens"
+    # Hash SHA-256 do token: o token em si não fica gravado.
+    token_hash = Column(String(64), primary_key=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
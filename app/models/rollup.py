@@ -0,0 +1,32 @@
+from sqlalchemy import BigInteger, Column, Date, ForeignKey, Integer, String
+from .database import Base
+
+class _RollupColumns:
+    """Totais de um período: valores por tipo de transação (em centavos) e quantidade."""
+    account_id = Column(Integer, ForeignKey("accounts.id"), primary_key=True)
+    period = Column(Date, primary_key=True)
+    deposits = Column(BigInteger, nullable=False, default=0)
+    withdrawals = Column(BigInteger, nullable=False, default=0)
+    transfers_in = Column(BigInteger, nullable=False, default=0)
+    transfers_out = Column(BigInteger, nullable=False, default=0)
+    fees = Column(BigInteger, nullable=False, default=0)
+    interest = Column(BigInteger, nullable=False, default=0)
+    transactions = Column(Integer, nullable=False, default=0)
+
+
+class AccountDailyRollup(_RollupColumns, Base):
+    """Movimento de uma conta em um dia (UTC)."""
+    __tablename__ = "account_daily_rollup"
+
+
+class AccountMonthlyRollup(_RollupColumns, Base):
+    """Movimento de uma conta em um mês (``period`` é o primeiro dia do mês, UTC)."""
+    __tablename__ = "account_monthly_rollup"
+
+
+class RollupState(Base):
+    """Modo de manutenção dos rollups e a última transação consolidada (modo ``catchup``)."""
+    __tablename__ = "rollup_state"
+    name = Column(String, primary_key=True)
+    mode = Column(String, nullable=False)
+    last_transaction_id = Column(Integer, nullable=False, default=0)
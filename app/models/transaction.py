@@ -1,12 +1,36 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, func
+from datetime import datetime, timezone
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from .database import Base
 
+# Sinal com que cada tipo de transação entra no saldo da conta.
+TRANSACTION_SIGNS = {
+    "deposit": 1,
+    "withdraw": -1,
+    "transfer_in": 1,
+    "transfer_out": -1,
+    # Lançamentos programados (``app/services/postings.py``).
+    "fee": -1,
+    "interest": 1,
+}
+
 class Transaction(Base):
     __tablename__ = "transactions"
+    # Índice composto usado pela paginação por cursor do extrato (keyset).
+    __table_args__ = (
+        Index("ix_transactions_account_created_id", "account_id", "created_at", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     account_id = Column(Integer, ForeignKey("accounts.id"))
     type = Column(String)
-    amount = Column(Float)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Valor em centavos, sempre positivo; o efeito no saldo vem de ``TRANSACTION_SIGNS``.
+    amount_cents = Column(BigInteger)
+    # O default em Python grava sempre com microssegundos, mantendo a ordenação
+    # e a comparação do cursor consistentes (CURRENT_TIMESTAMP só tem segundos;
+    # linhas antigas nesse formato são normalizadas no startup, ver app/main.py).
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        default=lambda: datetime.now(timezone.utc),
+    )
     account = relationship("Account", back_populates="transactions")
@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from .database import Base
+
+class UserImport(Base):
+    """Progresso de uma importação em massa de usuários (checkpoint para retomar)."""
+    __tablename__ = "user_imports"
+    import_id = Column(String(64), primary_key=True)
+    source = Column(String)
+    status = Column(String, nullable=False, default="running")
+    # Registros do arquivo já processados (importados ou recusados), em ordem.
+    rows_done = Column(Integer, nullable=False, default=0)
+    imported = Column(Integer, nullable=False, default=0)
+    rejected = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+
+class UserImportError(Base):
+    """Registro recusado em uma importação (duplicado ou inválido)."""
+    __tablename__ = "user_import_errors"
+    import_id = Column(String(64), ForeignKey("user_imports.import_id"), primary_key=True)
+    row = Column(Integer, primary_key=True)
+    username = Column(String)
+    reason = Column(String, nullable=False)
@@ -1,18 +1,55 @@
+from sqlalchemy import delete
 from sqlalchemy.future import select
 from app.models.user import User
-from app.models.database import get_db
-from passlib.context import CryptContext
-from jose import jwt
-from datetime import datetime, timedelta
+from app.models.revoked_token import RevokedToken
+from app.models.database import ReadSessionLocal, get_db, upsert
+from app.services.password_pool import password_pool, pwd_context
+from app.services.profile_cache import invalidate_user
+from app.services.write_pipeline import run_write
+from app.utils.ttl_cache import TTLCache
+from jose import JWTError, jwt
+from datetime import datetime, timedelta, timezone
+import hashlib
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
-ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+
+# Claims já verificados, por hash do token: evita decodificar e consultar o banco a cada requisição.
+token_cache = TTLCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+# Revogações já vistas por este processo (hash -> exp), sem descarte por tamanho: uma
+# revogação só sai daqui depois do exp do token. A fonte da verdade é a tabela revoked_tokens.
+revoked_tokens = {}
+
+def _remember_revocation(key: str, exp: float):
+    now = time.time()
+    for expired in [k for k, until in revoked_tokens.items() if until <= now]:
+        revoked_tokens.pop(expired, None)
+    if exp > now:
+        revoked_tokens[key] = exp
+
+def _is_revoked_locally(key: str, now: float):
+    exp = revoked_tokens.get(key)
+    return exp is not None and exp > now
+
+def validate_password(password):
+    """Confere se a senha pode ser hasheada pelo bcrypt.
+
+    Raises:
+        ValueError: Se a senha não for uma string ou tiver mais de 72 caracteres.
+    """
+    if not isinstance(password, str):
+        raise ValueError(f"A senha recebida não é string, e sim {type(password)}")
+
+    if len(password.encode("utf-8")) > 72:
+        raise ValueError("A senha não pode ter mais de 72 caracteres.")
 
 def hash_password(password: str):
     """Hash a senha fornecida usando bcrypt.
@@ -24,33 +61,130 @@ def hash_password(password: str):
     Raises:
         ValueError: Se a senha não for uma string ou tiver mais de 72 caracteres.
     """
-    if not isinstance(password, str):
-        raise ValueError(f"A senha recebida não é string, e sim {type(password)}")
+    validate_password(password)
+    return pwd_context.hash(password)
 
-    if len(password.encode("utf-8")) > 72:
-        raise ValueError("A senha não pode ter mais de 72 caracteres.")
+async def hash_password_async(password: str):
+    """Versão de ``hash_password`` que roda o bcrypt no pool de workers.
 
-    return pwd_context.hash(password)
+    Raises:
+        ValueError: Se a senha não for uma string ou tiver mais de 72 caracteres.
+        PasswordPoolBusy: Se o pool de hashing estiver saturado.
+    """
+    validate_password(password)
+    return await password_pool.hash(password)
 
 def verify_password(plain_password, hashed_password):
     """Verifica se a senha em texto plano corresponde à senha hashada.
     """
     return pwd_context.verify(plain_password, hashed_password)
 
+async def verify_password_async(plain_password, hashed_password):
+    """Versão de ``verify_password`` que roda o bcrypt no pool de workers.
+    """
+    return await password_pool.verify(plain_password, hashed_password)
+
 def create_access_token(data: dict):
     """Cria um token de acesso JWT.
     """
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def _token_key(token: str):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+async def authenticate_user(db, username: str, password: str):
+    """Valida usuário e senha.
+
+    Returns:
+        User | None: O usuário autenticado, ou None se as credenciais forem inválidas.
+    """
+    result = await db.execute(select(User).filter(User.username == username))
+    user = result.scalars().first()
+    if not user or not await verify_password_async(password, user.password):
+        return None
+    return user
+
+async def get_token_user(token: str):
+    """Valida o token de acesso e retorna os dados do usuário dono dele.
+
+    O resultado fica em cache (chave: hash SHA-256 do token) até o menor entre
+    ``TOKEN_CACHE_TTL`` e o ``exp`` do token; só em cache miss o token é
+    decodificado e o usuário e a tabela ``revoked_tokens`` consultados no banco.
+
+    Args:
+        token (str): Token JWT recebido no cabeçalho ``Authorization``.
+    Returns:
+        dict: ``user_id``, ``username`` e ``exp`` do token.
+    Raises:
+        ValueError: Se o token for inválido, expirado, revogado ou de um usuário inexistente.
+    """
+    key = _token_key(token)
+    now = time.time()
+    if _is_revoked_locally(key, now):
+        raise ValueError("Token revogado.")
+    claims = token_cache.get(key)
+    if claims and claims["exp"] > now:
+        return claims
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        user_id = int(payload["sub"])
+        exp = int(payload["exp"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        raise ValueError("Token inválido ou expirado.")
+
+    async with ReadSessionLocal() as db:
+        revoked = await db.scalar(select(RevokedToken.token_hash).filter(RevokedToken.token_hash == key))
+        user = None if revoked else await db.get(User, user_id)
+    if revoked:
+        _remember_revocation(key, exp)
+        raise ValueError("Token revogado.")
+    if not user:
+        raise ValueError("Token inválido ou expirado.")
+
+    claims = {"user_id": user.id, "username": user.username, "exp": exp}
+    token_cache.set(key, claims, ttl=exp - now)
+    return claims
+
+async def revoke_token(db, token: str):
+    """Revoga o token até sua expiração original.
+
+    A revogação é gravada em ``revoked_tokens``, compartilhada por todos os
+    workers. Neste processo ela vale na hora; um worker que já tinha o token
+    no cache de claims passa a recusá-lo no próximo cache miss, ou seja, em
+    até ``TOKEN_CACHE_TTL`` segundos. Revogações expiradas são removidas a
+    cada novo logout.
+    """
+    key = _token_key(token)
+    try:
+        exp = int(jwt.get_unverified_claims(token)["exp"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        exp = time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    await run_write(db, _store_revocation, key, datetime.fromtimestamp(exp, timezone.utc))
+    token_cache.pop(key)
+    _remember_revocation(key, exp)
+
+async def _store_revocation(db, key: str, expires_at: datetime):
+    await db.execute(delete(RevokedToken).where(RevokedToken.expires_at < datetime.now(timezone.utc)))
+    stmt = await upsert(db, RevokedToken)
+    await db.execute(
+        stmt.on_conflict_do_nothing(index_elements=[RevokedToken.token_hash]),
+        [{"token_hash": key, "expires_at": expires_at}],
+    )
+
 async def create_user(db, username: str, password: str):
     """Cria um novo usuário com a senha hashada.
     """
-    hashed = hash_password(password)
+    hashed = await hash_password_async(password)
+    user = await run_write(db, _insert_user, username, hashed)
+    await invalidate_user(user.id)
+    return user
+
+async def _insert_user(db, username: str, hashed: str):
     user = User(username=username, password=hashed)
     db.add(user)
-    await db.commit()
-    await db.refresh(user)
+    await db.flush()
     return user
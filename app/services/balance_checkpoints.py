@@ -0,0 +1,228 @@
+"""Checkpoints de saldo para consultas de saldo em um instante passado.
+
+A cada ``BALANCE_CHECKPOINT_EVERY`` transações de uma conta, ou quando o
+último checkpoint tem mais de ``BALANCE_CHECKPOINT_INTERVAL`` segundos, o
+saldo do razão (soma com sinal das transações até ali) é gravado em
+``balance_checkpoints`` junto com a última transação que ele inclui. O saldo
+em um instante é o do checkpoint mais próximo anterior a ele mais as
+transações seguintes (no máximo ``BALANCE_CHECKPOINT_EVERY``), qualquer que
+seja a idade da conta.
+
+A gravação contínua e a reconstrução usam a mesma definição (o razão, não
+``accounts.balance_cents``), então a resposta não depende de qual checkpoint
+está mais perto; diferenças entre o razão e o saldo gravado ficam para a
+conciliação (``app.services.reconciliation``).
+
+``balance_checkpoint_state`` conta as transações de cada conta desde o último
+checkpoint e é atualizado na mesma transação que as insere. Para gerar os
+checkpoints do histórico já existente::
+
+    python -m app.services.balance_checkpoints --rebuild
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from sqlalchemy import and_, case, delete, func, insert, or_, update
+from sqlalchemy.future import select
+from app.models import Account, BalanceCheckpoint, BalanceCheckpointState, Transaction
+from app.models.database import ReadSessionLocal, SessionLocal, begin_write, upsert
+from app.models.transaction import TRANSACTION_SIGNS
+
+load_dotenv()
+
+BALANCE_CHECKPOINT_EVERY = int(os.getenv("BALANCE_CHECKPOINT_EVERY", "500"))
+BALANCE_CHECKPOINT_INTERVAL = float(os.getenv("BALANCE_CHECKPOINT_INTERVAL", "86400"))
+
+# Os dois gatilhos em 0 desligam a gravação (a consulta passa a repassar todo o histórico).
+CHECKPOINTS_ENABLED = BALANCE_CHECKPOINT_EVERY > 0 or BALANCE_CHECKPOINT_INTERVAL > 0
+
+
+def signed_amount():
+    """Expressão SQL do valor da transação com o sinal do seu efeito no saldo."""
+    return case(TRANSACTION_SIGNS, value=Transaction.type, else_=0) * Transaction.amount_cents
+
+
+# Início do razão para contas sem checkpoint (anterior a qualquer transação).
+_LEDGER_START = datetime(1970, 1, 1)
+
+
+async def _ledger_balances(db, last_ids):
+    """Saldo do razão de cada conta até a transação ``last_ids[conta]``, em uma consulta.
+
+    Parte do checkpoint mais recente da conta (ou de zero) e soma as
+    transações posteriores a ele, como ``get_balance_at``. Os limites de cada
+    conta são calculados uma vez (CTE materializada); a soma é correlacionada
+    por conta, e o limite em ``created_at`` a mantém na faixa do índice
+    (account_id, created_at, id); como em ``get_balance_at``, ele depende dos
+    ``created_at`` antigos já normalizados para microssegundos.
+
+    Returns:
+        dict: Saldo em centavos por ID de conta.
+    """
+    latest = (
+        select(BalanceCheckpoint.account_id, func.max(BalanceCheckpoint.transaction_id).label("transaction_id"))
+        .filter(BalanceCheckpoint.account_id.in_(list(last_ids)))
+        .group_by(BalanceCheckpoint.account_id)
+        .subquery()
+    )
+    bounds = (
+        select(
+            Account.id.label("account_id"),
+            func.coalesce(BalanceCheckpoint.transaction_id, 0).label("after_id"),
+            func.coalesce(BalanceCheckpoint.created_at, _LEDGER_START).label("after_at"),
+            func.coalesce(BalanceCheckpoint.balance, 0).label("base"),
+            case(last_ids, value=Account.id).label("through_id"),
+        )
+        .outerjoin(latest, latest.c.account_id == Account.id)
+        .outerjoin(
+            BalanceCheckpoint,
+            and_(
+                BalanceCheckpoint.account_id == latest.c.account_id,
+                BalanceCheckpoint.transaction_id == latest.c.transaction_id,
+            ),
+        )
+        .filter(Account.id.in_(list(last_ids)))
+        .cte("ledger_bounds")
+        .prefix_with("MATERIALIZED")
+    )
+    tail = (
+        select(func.coalesce(func.sum(signed_amount()), 0))
+        .filter(
+            Transaction.account_id == bounds.c.account_id,
+            Transaction.created_at >= bounds.c.after_at,
+            Transaction.id > bounds.c.after_id,
+            Transaction.id <= bounds.c.through_id,
+        )
+        .scalar_subquery()
+    )
+    result = await db.execute(select(bounds.c.account_id, bounds.c.base + tail))
+    return dict(result.all())
+
+
+async def record(db, inserted, now: datetime):
+    """Conta as transações recém-inseridas e grava os checkpoints que venceram.
+
+    Roda na transação que inseriu as transações. O saldo gravado é o do
+    razão até a última transação inserida de cada conta (checkpoint anterior
+    mais as transações seguintes), a mesma definição de ``rebuild_account``.
+
+    Args:
+        db: Sessão do banco de dados.
+        inserted: Pares ``(transaction_id, account_id)`` inseridos.
+        now (datetime): ``created_at`` das transações inseridas.
+    """
+    if not CHECKPOINTS_ENABLED or not inserted:
+        return
+    last_ids, counts = {}, {}
+    for transaction_id, account_id in inserted:
+        last_ids[account_id] = max(last_ids.get(account_id, 0), transaction_id)
+        counts[account_id] = counts.get(account_id, 0) + 1
+
+    stmt = await upsert(db, BalanceCheckpointState)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[BalanceCheckpointState.account_id],
+        set_={"since_checkpoint": BalanceCheckpointState.since_checkpoint + stmt.excluded.since_checkpoint},
+    )
+    await db.execute(
+        stmt,
+        [{"account_id": account_id, "since_checkpoint": count, "checkpoint_at": now} for account_id, count in counts.items()],
+    )
+
+    triggers = []
+    if BALANCE_CHECKPOINT_EVERY > 0:
+        triggers.append(BalanceCheckpointState.since_checkpoint >= BALANCE_CHECKPOINT_EVERY)
+    if BALANCE_CHECKPOINT_INTERVAL > 0:
+        triggers.append(BalanceCheckpointState.checkpoint_at <= now - timedelta(seconds=BALANCE_CHECKPOINT_INTERVAL))
+    result = await db.execute(
+        select(BalanceCheckpointState.account_id).filter(
+            BalanceCheckpointState.account_id.in_(list(last_ids)), or_(*triggers)
+        )
+    )
+    due = result.scalars().all()
+    if not due:
+        return
+    balances = await _ledger_balances(db, {account_id: last_ids[account_id] for account_id in due})
+    await db.execute(insert(BalanceCheckpoint), [
+        {"account_id": account_id, "transaction_id": last_ids[account_id], "created_at": now, "balance": balances[account_id]}
+        for account_id in due
+    ])
+    await db.execute(
+        update(BalanceCheckpointState)
+        .where(BalanceCheckpointState.account_id.in_(due))
+        .values(since_checkpoint=0, checkpoint_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def nearest(db, account_id: int, at: datetime):
+    """Checkpoint mais recente da conta gravado até ``at`` (UTC sem tzinfo), ou None."""
+    result = await db.execute(
+        select(BalanceCheckpoint)
+        .filter(BalanceCheckpoint.account_id == account_id, BalanceCheckpoint.created_at <= at)
+        .order_by(BalanceCheckpoint.created_at.desc(), BalanceCheckpoint.transaction_id.desc())
+        .limit(1)
+    )
+    return result.scalars().first()
+
+
+async def rebuild_account(db, account_id: int, every: int = BALANCE_CHECKPOINT_EVERY):
+    """Refaz os checkpoints de uma conta a partir do histórico, na transação corrente.
+
+    O saldo de cada checkpoint é a soma acumulada das transações desde a
+    abertura da conta.
+
+    Returns:
+        int: Quantidade de checkpoints gravados.
+    """
+    await begin_write(db)
+    await db.execute(delete(BalanceCheckpoint).where(BalanceCheckpoint.account_id == account_id))
+    result = await db.stream(
+        select(Transaction.id, Transaction.created_at, signed_amount())
+        .filter(Transaction.account_id == account_id)
+        .order_by(Transaction.id)
+        .execution_options(yield_per=1000)
+    )
+    balance, since, checkpoints = 0, 0, []
+    last_at = datetime.now(timezone.utc)
+    async for transaction_id, created_at, amount in result:
+        balance += amount
+        since += 1
+        if since >= every:
+            checkpoints.append({"account_id": account_id, "transaction_id": transaction_id, "created_at": created_at, "balance": balance})
+            since, last_at = 0, created_at
+    if checkpoints:
+        await db.execute(insert(BalanceCheckpoint), checkpoints)
+    await db.execute(delete(BalanceCheckpointState).where(BalanceCheckpointState.account_id == account_id))
+    await db.execute(insert(BalanceCheckpointState), [{"account_id": account_id, "since_checkpoint": since, "checkpoint_at": last_at}])
+    return len(checkpoints)
+
+
+async def _main(args):
+    from app.models.database import Base, engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with ReadSessionLocal() as db:
+        account_ids = (await db.execute(select(Account.id).order_by(Account.id))).scalars().all()
+    total = 0
+    for account_id in account_ids:
+        # Uma transação por conta: o lock de escrita fica preso só durante a conta corrente.
+        async with SessionLocal() as db:
+            total += await rebuild_account(db, account_id, args.every)
+            await db.commit()
+    await engine.dispose()
+    print(f"Checkpoints gravados: {total} em {len(account_ids)} contas (a cada {args.every} transações).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manutenção dos checkpoints de saldo.")
+    parser.add_argument("--rebuild", action="store_true", help="refaz os checkpoints de todas as contas")
+    parser.add_argument("--every", type=int, default=BALANCE_CHECKPOINT_EVERY or 500)
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.error("informe --rebuild")
+    if args.every < 1:
+        parser.error("--every deve ser >= 1")
+    asyncio.run(_main(args))
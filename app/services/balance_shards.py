@@ -0,0 +1,155 @@
+"""Saldo fragmentado para contas muito movimentadas (ex.: lojistas).
+
+Com o modo ligado, os créditos de uma conta vão para uma de N parcelas em
+``account_balance_slots`` (escolhida em rodízio), em vez de disputarem a mesma
+linha de ``accounts``. Débitos usam o saldo base e, se ele não bastar,
+consolidam as parcelas no saldo base antes de tentar de novo. O saldo total é
+sempre ``accounts.balance_cents + soma das parcelas`` (valores em centavos).
+
+A quantidade de parcelas de cada conta fica em cache por alguns segundos. Um
+cache desatualizado não causa erro de saldo: crédito em parcela inexistente
+volta para o saldo base, e o débito sem saldo base suficiente sempre verifica
+as parcelas no banco (só o saldo devolvido por um saque pode omitir as
+parcelas até o cache expirar).
+"""
+import itertools
+import os
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, insert, update
+from sqlalchemy.future import select
+from app.models import Account, AccountBalanceSlot
+from app.models.database import ReadSessionLocal, begin_write
+from app.utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+BALANCE_SHARD_MAX_SLOTS = int(os.getenv("BALANCE_SHARD_MAX_SLOTS", "64"))
+BALANCE_SHARD_CACHE_SIZE = int(os.getenv("BALANCE_SHARD_CACHE_SIZE", "10000"))
+BALANCE_SHARD_CACHE_TTL = float(os.getenv("BALANCE_SHARD_CACHE_TTL", "30"))
+
+# Quantidade de parcelas por conta (0 = saldo único).
+slot_counts = TTLCache(BALANCE_SHARD_CACHE_SIZE, BALANCE_SHARD_CACHE_TTL)
+_round_robin = itertools.count()
+
+
+async def slot_count(account_id: int):
+    """Quantidade de parcelas da conta (0 se o modo fragmentado estiver desligado).
+
+    Em cache miss consulta pelo pool de leitura, fora da transação de escrita
+    (uma leitura antes do UPDATE obrigaria a promover o lock no SQLite).
+    """
+    count = slot_counts.get(account_id)
+    if count is None:
+        async with ReadSessionLocal() as db:
+            count = await db.scalar(
+                select(func.count()).select_from(AccountBalanceSlot).filter(AccountBalanceSlot.account_id == account_id)
+            )
+        slot_counts.set(account_id, count)
+    return count
+
+
+def _slots_total(account_id_column):
+    return (
+        select(func.coalesce(func.sum(AccountBalanceSlot.balance), 0))
+        .filter(AccountBalanceSlot.account_id == account_id_column)
+        .scalar_subquery()
+    )
+
+
+def total_balance_column():
+    """Expressão SQL do saldo total da conta em centavos (base + parcelas), para consultas sobre ``accounts``."""
+    return Account.balance_cents + _slots_total(Account.id)
+
+
+async def total_balance(db, account_id: int):
+    """Saldo total da conta em centavos (base + parcelas), ou None se a conta não existir."""
+    return await db.scalar(
+        select(total_balance_column()).filter(Account.id == account_id)
+    )
+
+
+async def credit(db, account_id: int, cents: int, slots: int):
+    """Credita ``cents`` centavos em uma das ``slots`` parcelas da conta (em rodízio).
+
+    Returns:
+        int | None: Novo saldo total, ou None se a parcela não existir (cache
+        desatualizado); nesse caso o chamador deve creditar o saldo base.
+    """
+    slot = next(_round_robin) % slots
+    result = await db.execute(
+        update(AccountBalanceSlot)
+        .where(AccountBalanceSlot.account_id == account_id, AccountBalanceSlot.slot == slot)
+        .values(balance=AccountBalanceSlot.balance + cents)
+        .returning(AccountBalanceSlot.slot)
+        .execution_options(synchronize_session=False)
+    )
+    if result.scalar_one_or_none() is None:
+        slot_counts.pop(account_id)
+        return None
+    return await total_balance(db, account_id)
+
+
+async def consolidate(db, account_ids):
+    """Move o valor das parcelas das contas para o saldo base, na transação corrente.
+
+    Trava as contas (em ordem de ID) e depois todas as parcelas delas,
+    inclusive as zeradas: ``credit`` atualiza a parcela sem tocar na linha da
+    conta, então só o lock da parcela impede que um crédito caia nela entre a
+    leitura e o ``UPDATE`` que a zera (ou o ``DELETE`` de ``configure``).
+
+    Returns:
+        dict: Centavos movidos por conta (só as que tinham parcelas com saldo).
+    """
+    account_ids = sorted(set(account_ids))
+    await db.execute(select(Account.id).filter(Account.id.in_(account_ids)).order_by(Account.id).with_for_update())
+    result = await db.execute(
+        select(AccountBalanceSlot.account_id, AccountBalanceSlot.balance)
+        .filter(AccountBalanceSlot.account_id.in_(account_ids))
+        .order_by(AccountBalanceSlot.account_id, AccountBalanceSlot.slot)
+        .with_for_update()
+    )
+    moved = {}
+    for account_id, balance in result.all():
+        if balance:
+            moved[account_id] = moved.get(account_id, 0) + balance
+    for account_id, total in moved.items():
+        await db.execute(
+            update(Account)
+            .where(Account.id == account_id)
+            .values(balance_cents=Account.balance_cents + total)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            update(AccountBalanceSlot)
+            .where(AccountBalanceSlot.account_id == account_id, AccountBalanceSlot.balance != 0)
+            .values(balance=0)
+            .execution_options(synchronize_session=False)
+        )
+    return moved
+
+
+async def configure(db, account_id: int, slots: int):
+    """Liga (``slots`` > 0) ou desliga (``slots`` = 0) o saldo fragmentado da conta.
+
+    O saldo das parcelas atuais é consolidado antes de recriá-las, então o
+    saldo total não muda; as parcelas ficam travadas por ``consolidate`` até o
+    ``DELETE``, e um crédito que chegue depois dele volta para o saldo base.
+
+    Returns:
+        int: Saldo total da conta, em centavos.
+    Raises:
+        ValueError: Se a quantidade de parcelas for inválida ou a conta não existir.
+    """
+    if slots < 0 or slots > BALANCE_SHARD_MAX_SLOTS:
+        raise ValueError(f"A quantidade de parcelas deve estar entre 0 e {BALANCE_SHARD_MAX_SLOTS}.")
+    await begin_write(db)
+    if await db.scalar(select(Account.id).filter(Account.id == account_id)) is None:
+        raise ValueError("Conta não encontrada.")
+    await consolidate(db, [account_id])
+    await db.execute(delete(AccountBalanceSlot).where(AccountBalanceSlot.account_id == account_id))
+    if slots:
+        await db.execute(
+            insert(AccountBalanceSlot),
+            [{"account_id": account_id, "slot": slot, "balance": 0} for slot in range(slots)],
+        )
+    return await total_balance(db, account_id)
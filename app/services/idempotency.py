@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from dotenv import load_dotenv
+from sqlalchemy import delete, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+from app.models import IdempotencyKey
+from app.models.database import SessionLocal
+from app.services.write_pipeline import run_write
+from app.utils.metrics import CACHE_REQUESTS
+from app.utils.money import to_cents
+from app.utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_CACHE_TTL = float(os.getenv("IDEMPOTENCY_CACHE_TTL", "600"))
+IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "300"))
+IDEMPOTENCY_PURGE_BATCH = int(os.getenv("IDEMPOTENCY_PURGE_BATCH", "1000"))
+
+logger = logging.getLogger(__name__)
+
+# Resultados recentes por (user_id, chave): replays sem ir ao banco.
+outcome_cache = TTLCache(IDEMPOTENCY_CACHE_SIZE, min(IDEMPOTENCY_CACHE_TTL, IDEMPOTENCY_TTL))
+
+_purge_task = None
+
+
+class IdempotencyKeyReused(ValueError):
+    """A chave já foi usada com outra operação ou outros parâmetros."""
+
+
+class IdempotentRequest:
+    """Chave de idempotência de uma requisição e a impressão digital da operação.
+
+    Após ``idempotent_write``, ``replayed`` indica se o resultado veio de uma
+    execução anterior.
+
+    Args:
+        user_id (int): Usuário autenticado (as chaves são isoladas por usuário).
+        key (str): Valor do cabeçalho ``Idempotency-Key``.
+        *operation: Nome da operação e parâmetros que a identificam.
+    """
+
+    def __init__(self, user_id: int, key: str, *operation):
+        self.user_id = user_id
+        self.key = key
+        self.fingerprint = hashlib.sha256(json.dumps(operation, default=_canonical).encode("utf-8")).hexdigest()
+        self.replayed = False
+
+
+def _canonical(value):
+    # Valores monetários viram centavos inteiros (exatos): 10, 10.0 e 10.00 geram a
+    # mesma impressão digital e valores próximos nunca colidem.
+    if isinstance(value, Decimal):
+        try:
+            return to_cents(value)
+        except ValueError:
+            # Valor que a operação vai recusar; basta uma forma estável.
+            return str(value)
+    return str(value)
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _replay(request: IdempotentRequest, stored: dict):
+    if stored["fingerprint"] != request.fingerprint:
+        raise IdempotencyKeyReused("Idempotency-Key já utilizada com outra operação ou outros parâmetros.")
+    outcome = stored["outcome"]
+    if "error" in outcome:
+        raise ValueError(outcome["error"])
+    return outcome["result"]
+
+
+async def _lookup(db, request: IdempotentRequest):
+    """Busca o resultado gravado para a chave (cache e, em seguida, a tabela)."""
+    cache_key = (request.user_id, request.key)
+    stored = outcome_cache.get(cache_key)
+    if stored is not None:
+        CACHE_REQUESTS.labels("idempotency", "hit").inc()
+        return stored
+    CACHE_REQUESTS.labels("idempotency", "miss").inc()
+    row = (await db.execute(
+        select(IdempotencyKey.fingerprint, IdempotencyKey.outcome).filter(
+            IdempotencyKey.user_id == request.user_id, IdempotencyKey.key == request.key
+        )
+    )).first()
+    # Encerra a transação de leitura: a escrita seguinte abre a sua com o lock correto.
+    await db.rollback()
+    if row is None:
+        return None
+    stored = {"fingerprint": row.fingerprint, "outcome": json.loads(row.outcome)}
+    outcome_cache.set(cache_key, stored)
+    return stored
+
+
+async def _run_and_record(db, request: IdempotentRequest, op, *args):
+    # Erros de negócio também são gravados: o retry recebe a mesma resposta.
+    try:
+        async with db.begin_nested():
+            outcome = {"result": await op(db, *args)}
+    except ValueError as e:
+        outcome = {"error": str(e)}
+    db.add(IdempotencyKey(
+        user_id=request.user_id,
+        key=request.key,
+        fingerprint=request.fingerprint,
+        outcome=json.dumps(outcome, default=str),
+    ))
+    await db.flush()
+    return outcome
+
+
+async def idempotent_write(db, request: IdempotentRequest, op, *args):
+    """Executa ``op(session, *args)`` uma única vez por chave de idempotência.
+
+    O resultado (ou o erro de negócio) é gravado em ``idempotency_keys`` na
+    mesma unidade de escrita da operação. Repetições com a mesma chave recebem
+    o resultado gravado sem tocar nas contas; se duas requisições com a mesma
+    chave correrem juntas, a segunda perde na chave primária, é desfeita e
+    devolve o resultado da primeira.
+
+    Returns:
+        O resultado de ``op`` (original ou gravado).
+    Raises:
+        IdempotencyKeyReused: Se a chave já foi usada com outro pedido.
+        ValueError: O erro de negócio da execução original.
+    """
+    stored = await _lookup(db, request)
+    if stored is None:
+        try:
+            outcome = await run_write(db, _run_and_record, request, op, *args)
+        except IntegrityError:
+            stored = await _lookup(db, request)
+            if stored is None:
+                raise
+        else:
+            stored = {"fingerprint": request.fingerprint, "outcome": outcome}
+            outcome_cache.set((request.user_id, request.key), stored)
+            return _replay(request, stored)
+    request.replayed = True
+    return _replay(request, stored)
+
+
+async def purge_expired(ttl: float = IDEMPOTENCY_TTL, batch_size: int = IDEMPOTENCY_PURGE_BATCH):
+    """Remove chaves mais antigas que ``ttl`` segundos, em lotes de ``batch_size``.
+
+    Cada lote é uma transação curta, para não segurar o lock de escrita.
+
+    Returns:
+        int: Quantidade de chaves removidas.
+    """
+    cutoff = _now() - timedelta(seconds=ttl)
+    removed = 0
+    while True:
+        async with SessionLocal() as db:
+            expired = (
+                select(IdempotencyKey.user_id, IdempotencyKey.key)
+                .filter(IdempotencyKey.created_at < cutoff)
+                .limit(batch_size)
+            )
+            result = await db.execute(
+                delete(IdempotencyKey).where(tuple_(IdempotencyKey.user_id, IdempotencyKey.key).in_(expired))
+            )
+            await db.commit()
+        removed += result.rowcount
+        if result.rowcount < batch_size:
+            return removed
+        await asyncio.sleep(0)
+
+
+async def _purge_loop(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await purge_expired()
+            if removed:
+                logger.info("Chaves de idempotência expiradas removidas: %s", removed)
+        except Exception:
+            logger.exception("Falha ao remover chaves de idempotência expiradas.")
+
+
+def start_purger(interval: float = IDEMPOTENCY_PURGE_INTERVAL):
+    """Inicia a task periódica de expiração das chaves (no startup da API)."""
+    global _purge_task
+    if _purge_task is None:
+        _purge_task = asyncio.create_task(_purge_loop(interval))
+
+
+async def stop_purger():
+    global _purge_task
+    task, _purge_task = _purge_task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
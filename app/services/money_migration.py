@@ -0,0 +1,258 @@
+"""Migração online dos valores monetários de ``Float`` (reais) para centavos (``BIGINT``).
+
+Bancos criados antes da troca têm ``accounts.balance`` e
+``transactions.amount`` em ``Float``; a aplicação atual usa
+``accounts.balance_cents`` e ``transactions.amount_cents``. A migração roda
+com a versão antiga da aplicação no ar, em etapas (somente SQLite)::
+
+    python -m app.services.money_migration add        # colunas novas + triggers
+    python -m app.services.money_migration backfill   # converte as linhas antigas em lotes
+    python -m app.services.money_migration status     # progresso
+    python -m app.services.money_migration finalize   # com a aplicação antiga parada
+
+- ``add``: cria as colunas em centavos (``ALTER TABLE ... ADD COLUMN`` não
+  reescreve a tabela) e triggers que as mantêm em dia a cada ``INSERT`` ou
+  ``UPDATE`` feito pela aplicação antiga;
+- ``backfill``: preenche as linhas antigas por faixas de ID, uma transação
+  curta (``BEGIN IMMEDIATE``) por lote, com pausa entre os lotes para não
+  segurar o lock de escrita. Pode ser interrompido e retomado;
+- ``finalize``: confere que não restam linhas sem centavos e remove as
+  triggers. Depois dele, suba a versão nova da aplicação, que cria e
+  preenche as tabelas que não existiam na versão antiga (rollups,
+  checkpoints de saldo etc.).
+
+As colunas antigas continuam no banco e passam a ser ignoradas. A versão nova
+se recusa a iniciar enquanto a migração não for finalizada
+(``check_migrated``).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+from sqlalchemy import inspect
+from app.models.database import engine
+
+# (tabela, coluna antiga em reais, coluna nova em centavos)
+MONEY_COLUMNS = (("accounts", "balance", "balance_cents"), ("transactions", "amount", "amount_cents"))
+
+_TRIGGER_PREFIX = "money_cents_"
+
+
+def _cents(expression: str):
+    return f"CAST(ROUND(COALESCE({expression}, 0) * 100) AS INTEGER)"
+
+
+def _triggers(table: str, legacy: str, column: str):
+    """DDL das triggers que copiam o valor antigo para a coluna em centavos."""
+    assign = f"UPDATE {table} SET {column} = {_cents('NEW.' + legacy)} WHERE id = NEW.id;"
+    return {
+        f"{_TRIGGER_PREFIX}{table}_insert": f"AFTER INSERT ON {table} BEGIN {assign} END",
+        f"{_TRIGGER_PREFIX}{table}_update": f"AFTER UPDATE OF {legacy} ON {table} BEGIN {assign} END",
+    }
+
+
+async def _scalar(conn, sql: str, params=()):
+    return (await conn.exec_driver_sql(sql, params)).scalar()
+
+
+async def _columns(conn, table: str):
+    rows = (await conn.exec_driver_sql(f"PRAGMA table_info({table})")).all()
+    return {row[1] for row in rows}
+
+
+async def _tables(conn):
+    rows = (await conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")).all()
+    return {row[0] for row in rows}
+
+
+async def _installed_triggers(conn):
+    rows = (await conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE ?", (_TRIGGER_PREFIX + "%",)
+    )).all()
+    return {row[0] for row in rows}
+
+
+async def _legacy_columns(conn):
+    """Colunas em reais ainda presentes no banco, com a coluna em centavos correspondente."""
+    tables = await _tables(conn)
+    return [
+        (table, legacy, column)
+        for table, legacy, column in MONEY_COLUMNS
+        if table in tables and legacy in await _columns(conn, table)
+    ]
+
+
+def _check_dialect():
+    if engine.dialect.name != "sqlite":
+        raise RuntimeError(f"Migração suportada só em SQLite (banco atual: {engine.dialect.name}).")
+
+
+@contextlib.asynccontextmanager
+async def _connect_for_writes():
+    """Conexão cujas transações já abrem com o lock de escrita (``BEGIN IMMEDIATE``)."""
+    async with engine.connect() as conn:
+        await conn.execution_options(sqlite_begin="IMMEDIATE")
+        yield conn
+
+
+async def add_columns():
+    """Cria as colunas em centavos e as triggers de sincronização (idempotente).
+
+    Returns:
+        list: Tabelas preparadas.
+    """
+    _check_dialect()
+    prepared = []
+    async with _connect_for_writes() as conn:
+        async with conn.begin():
+            for table, legacy, column in await _legacy_columns(conn):
+                if column not in await _columns(conn, table):
+                    await conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} BIGINT")
+                for name, body in _triggers(table, legacy, column).items():
+                    await conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+                prepared.append(table)
+    return prepared
+
+
+async def backfill(chunk: int = 5000, pause: float = 0.05, progress=print):
+    """Converte as linhas antigas em lotes de ``chunk`` IDs, um commit por lote.
+
+    Só toca em linhas com a coluna nova nula, então pode ser repetido ou
+    retomado. Linhas gravadas pela aplicação durante o backfill já chegam
+    convertidas pelas triggers.
+
+    Returns:
+        dict: Linhas convertidas por tabela.
+    Raises:
+        ValueError: Se a etapa ``add`` ainda não foi executada.
+    """
+    _check_dialect()
+    converted = {}
+    async with _connect_for_writes() as conn:
+        for table, legacy, column in await _legacy_columns(conn):
+            if column not in await _columns(conn, table):
+                raise ValueError(f"Coluna {table}.{column} ausente: execute a etapa add antes.")
+            first_id = await _scalar(conn, f"SELECT MIN(id) FROM {table} WHERE {column} IS NULL")
+            last_id = await _scalar(conn, f"SELECT MAX(id) FROM {table} WHERE {column} IS NULL")
+            await conn.rollback()
+            converted[table] = 0
+            if first_id is None:
+                continue
+            for start in range(first_id - 1, last_id, chunk):
+                async with conn.begin():
+                    result = await conn.exec_driver_sql(
+                        f"UPDATE {table} SET {column} = {_cents(legacy)} "
+                        f"WHERE id > ? AND id <= ? AND {column} IS NULL",
+                        (start, start + chunk),
+                    )
+                converted[table] += result.rowcount
+                progress(f"{table}: até o id {min(start + chunk, last_id)} de {last_id} ({converted[table]} linhas)")
+                if pause:
+                    await asyncio.sleep(pause)
+    return converted
+
+
+async def status():
+    """Progresso da migração: linhas sem centavos por tabela e triggers instaladas."""
+    _check_dialect()
+    report = {"tables": {}, "triggers": []}
+    async with engine.connect() as conn:
+        for table, legacy, column in await _legacy_columns(conn):
+            total = await _scalar(conn, f"SELECT COUNT(*) FROM {table}")
+            if column in await _columns(conn, table):
+                missing = await _scalar(conn, f"SELECT COUNT(*) FROM {table} WHERE {column} IS NULL")
+            else:
+                missing = total
+            report["tables"][table] = {"rows": total, "missing": missing}
+        report["triggers"] = sorted(await _installed_triggers(conn))
+    return report
+
+
+async def finalize():
+    """Conclui a migração; deve rodar com a versão antiga da aplicação parada.
+
+    Em uma única transação, confere que todas as linhas têm o valor em
+    centavos e remove as triggers.
+
+    Returns:
+        bool: False se não havia migração em andamento (triggers ausentes).
+    Raises:
+        ValueError: Se ainda houver linhas sem o valor em centavos.
+    """
+    _check_dialect()
+    async with _connect_for_writes() as conn:
+        async with conn.begin():
+            triggers = await _installed_triggers(conn)
+            if not triggers:
+                return False
+            for table, legacy, column in await _legacy_columns(conn):
+                missing = await _scalar(conn, f"SELECT COUNT(*) FROM {table} WHERE {column} IS NULL")
+                if missing:
+                    raise ValueError(f"{table}: {missing} linhas sem {column}; execute o backfill antes.")
+            for name in triggers:
+                await conn.exec_driver_sql(f"DROP TRIGGER {name}")
+    return True
+
+
+def check_migrated(sync_conn):
+    """Impede a aplicação de subir sobre um banco com valores ainda em reais.
+
+    Sem isso, a primeira consulta falharia com um erro opaco de coluna
+    inexistente. Chamada no startup, antes do ``create_all``.
+
+    Raises:
+        RuntimeError: Se faltar alguma coluna em centavos ou a migração não
+            tiver sido finalizada (triggers ainda instaladas).
+    """
+    inspector = inspect(sync_conn)
+    tables = set(inspector.get_table_names())
+    pending = []
+    for table, legacy, column in MONEY_COLUMNS:
+        if table in tables:
+            columns = {info["name"] for info in inspector.get_columns(table)}
+            if legacy in columns and column not in columns:
+                pending.append(f"{table}.{legacy}")
+    if pending:
+        raise RuntimeError(
+            f"Banco com valores em reais ({', '.join(pending)}, sem a coluna em centavos). Migre antes de "
+            "subir esta versão: python -m app.services.money_migration add | backfill | finalize"
+        )
+    if sync_conn.dialect.name == "sqlite":
+        triggers = sync_conn.exec_driver_sql(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE ?", (_TRIGGER_PREFIX + "%",)
+        ).scalar()
+        if triggers:
+            raise RuntimeError(
+                "Migração para centavos não finalizada. Pare a versão antiga e execute: "
+                "python -m app.services.money_migration finalize"
+            )
+
+
+async def _main(args):
+    try:
+        if args.step in ("add", "all"):
+            print(f"Colunas em centavos prontas: {', '.join(await add_columns()) or 'nada a migrar'}.")
+        if args.step in ("backfill", "all"):
+            converted = await backfill(args.chunk, args.pause_ms / 1000)
+            print(f"Backfill concluído: {converted}.")
+        if args.step in ("finalize", "all"):
+            if await finalize():
+                print("Migração finalizada. Suba a versão nova e, depois, gere os checkpoints de saldo: "
+                      "python -m app.services.balance_checkpoints --rebuild")
+            else:
+                print("Nenhuma migração em andamento (execute add e backfill antes).")
+        if args.step == "status":
+            print(json.dumps(await status(), indent=2))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migração dos valores monetários para centavos (SQLite).")
+    parser.add_argument("step", choices=("add", "backfill", "finalize", "status", "all"))
+    parser.add_argument("--chunk", type=int, default=5000, help="IDs por lote do backfill")
+    parser.add_argument("--pause-ms", type=float, default=50, help="pausa entre lotes do backfill")
+    args = parser.parse_args()
+    if args.chunk < 1:
+        parser.error("--chunk deve ser >= 1")
+    asyncio.run(_main(args))
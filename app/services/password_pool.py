@@ -0,0 +1,140 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from passlib.context import CryptContext
+from dotenv import load_dotenv
+from app.utils.metrics import BCRYPT_LATENCY, BCRYPT_QUEUE_WAIT, BCRYPT_REJECTED
+
+load_dotenv()
+
+PASSWORD_POOL_MODE = os.getenv("PASSWORD_POOL_MODE", "thread")
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_POOL_QUEUE_SIZE = int(os.getenv("PASSWORD_POOL_QUEUE_SIZE", "64"))
+PASSWORD_POOL_TIMEOUT = float(os.getenv("PASSWORD_POOL_TIMEOUT", "5"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordPoolBusy(RuntimeError):
+    """A fila do pool de hashing está cheia e o tempo de espera esgotou."""
+
+
+def bcrypt_hash(password: str):
+    """Hash bcrypt síncrono (roda no worker; função de módulo, serializável para processos)."""
+    return pwd_context.hash(password)
+
+
+def bcrypt_verify(plain_password: str, hashed_password: str):
+    """Verificação bcrypt síncrona (roda no worker)."""
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def hash_many(passwords):
+    """Hasheia uma lista de senhas em uma única chamada ao worker (menos IPC com processos)."""
+    return [pwd_context.hash(password) for password in passwords]
+
+
+def _timed_call(fn, *args):
+    """Executa ``fn`` no worker e devolve também o instante em que começou.
+
+    ``time.monotonic`` é compartilhado entre processos da mesma máquina, então
+    o instante serve para medir a espera na fila também no modo ``process``.
+    """
+    started_at = time.monotonic()
+    result = fn(*args)
+    return started_at, time.monotonic() - started_at, result
+
+
+class PasswordPool:
+    """Pool limitado de workers para bcrypt, fora do event loop.
+
+    Admite no máximo ``workers + queue_size`` chamadas simultâneas; as demais
+    esperam por uma vaga até ``timeout`` segundos e então recebem
+    ``PasswordPoolBusy`` (backpressure em vez de fila ilimitada).
+    """
+
+    def __init__(self, mode: str, workers: int, queue_size: int, timeout: float):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"PASSWORD_POOL_MODE inválido: {mode} (use 'thread' ou 'process').")
+        if workers < 1 or queue_size < 0:
+            raise ValueError("PASSWORD_POOL_WORKERS deve ser >= 1 e PASSWORD_POOL_QUEUE_SIZE >= 0.")
+        self.mode = mode
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "rejected": 0,
+            "in_flight": 0,
+            "queue_wait_seconds_sum": 0.0,
+            "queue_wait_seconds_max": 0.0,
+            "run_seconds_sum": 0.0,
+        }
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.mode == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            return self._executor
+
+    async def run(self, fn, *args, operation: str = "call"):
+        """Executa ``fn(*args)`` em um worker do pool e aguarda o resultado.
+
+        Raises:
+            PasswordPoolBusy: Se não houver vaga no pool dentro de ``timeout``.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers + self.queue_size)
+        submitted_at = time.monotonic()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self._stats["rejected"] += 1
+            BCRYPT_REJECTED.labels().inc()
+            raise PasswordPoolBusy("Serviço de autenticação sobrecarregado. Tente novamente em instantes.")
+        self._stats["in_flight"] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            started_at, run_seconds, result = await loop.run_in_executor(
+                self._get_executor(), _timed_call, fn, *args
+            )
+        finally:
+            self._stats["in_flight"] -= 1
+            self._slots.release()
+        wait = max(0.0, started_at - submitted_at)
+        self._stats["calls"] += 1
+        self._stats["queue_wait_seconds_sum"] += wait
+        self._stats["queue_wait_seconds_max"] = max(self._stats["queue_wait_seconds_max"], wait)
+        self._stats["run_seconds_sum"] += run_seconds
+        BCRYPT_QUEUE_WAIT.labels(operation).observe(wait)
+        BCRYPT_LATENCY.labels(operation).observe(run_seconds)
+        return result
+
+    async def hash(self, password: str):
+        return await self.run(bcrypt_hash, password, operation="hash")
+
+    async def verify(self, plain_password: str, hashed_password: str):
+        return await self.run(bcrypt_verify, plain_password, hashed_password, operation="verify")
+
+    def stats(self):
+        """Retorna uma cópia dos contadores (chamadas, recusas, espera na fila)."""
+        return dict(self._stats, mode=self.mode, workers=self.workers, queue_size=self.queue_size)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+password_pool = PasswordPool(
+    PASSWORD_POOL_MODE, PASSWORD_POOL_WORKERS, PASSWORD_POOL_QUEUE_SIZE, PASSWORD_POOL_TIMEOUT
+)
@@ -0,0 +1,350 @@
+"""Lançamentos programados em todas as contas: tarifa de manutenção e juros.
+
+Uma execução percorre as contas por faixas de ``POSTING_CHUNK_SIZE`` IDs e,
+para cada faixa, em uma única transação:
+
+1. trava as contas da faixa (em ordem de ID) e consolida no saldo base as
+   parcelas das contas com saldo fragmentado, de modo que o saldo base é o
+   saldo total e nenhum saque concorrente muda o saldo lido;
+2. insere as transações da faixa com um ``INSERT ... SELECT`` sobre
+   ``accounts`` (tarifa: contas com saldo suficiente; juros: saldo x taxa,
+   truncado no centavo, para contas com saldo positivo);
+3. aplica os valores aos saldos com um ``UPDATE ... FROM`` sobre as
+   transações inseridas;
+4. atualiza rollups e checkpoints de saldo, como nas demais escritas;
+5. avança o checkpoint da execução em ``posting_runs``.
+
+Como o checkpoint é confirmado junto com os lançamentos, uma execução
+interrompida retoma da primeira faixa não gravada, e repetir uma execução
+concluída (o mesmo ``run_id``) não lança nada de novo. O ``run_id`` padrão é
+o tipo e o mês corrente (ex.: ``fee-2026-10``), então um agendamento mensal
+pode ser repetido sem cobrar duas vezes. Contas abertas depois do início da
+execução ficam de fora.
+
+Uso pela linha de comando::
+
+    python -m app.services.postings fee --amount 12.90
+    python -m app.services.postings interest --rate 0.005 --chunk-size 5000
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from dotenv import load_dotenv
+from sqlalchemy import func, insert, literal, update
+from sqlalchemy.future import select
+from app.models import Account, AccountBalanceSlot, PostingRun, Transaction
+from app.models.database import begin_write
+from app.models.transaction import TRANSACTION_SIGNS
+from app.services import balance_checkpoints, balance_shards, rollups
+from app.services.write_pipeline import run_write
+from app.utils.audit import get_journal
+from app.utils.log_config import request_id_var
+from app.utils.money import from_cents, to_cents
+
+load_dotenv()
+
+POSTING_CHUNK_SIZE = int(os.getenv("POSTING_CHUNK_SIZE", "1000"))
+POSTING_MAX_CHUNK_SIZE = int(os.getenv("POSTING_MAX_CHUNK_SIZE", "50000"))
+
+KINDS = ("fee", "interest")
+PPM = 1_000_000
+
+
+def default_run_id(kind: str, now: datetime = None):
+    """``run_id`` mensal padrão: tipo e mês em UTC (ex.: ``interest-2026-10``)."""
+    now = now or datetime.now(timezone.utc)
+    return f"{kind}-{now:%Y-%m}"
+
+
+def rate_to_ppm(rate):
+    """Converte a taxa de juros (fração, ex.: ``0.005``) para partes por milhão.
+
+    Raises:
+        ValueError: Se a taxa não estiver em (0, 1] ou tiver mais de 6 casas decimais.
+    """
+    try:
+        value = Decimal(str(rate).strip())
+    except InvalidOperation:
+        raise ValueError("Taxa de juros inválida.")
+    if not value.is_finite() or value <= 0 or value > 1:
+        raise ValueError("A taxa de juros deve estar entre 0 e 1 (ex.: 0.005 para 0,5%).")
+    ppm = value * PPM
+    if ppm != ppm.to_integral_value():
+        raise ValueError("A taxa de juros deve ter no máximo 6 casas decimais.")
+    return int(ppm)
+
+
+def _posting_amount(kind: str, amount_cents: int, rate_ppm: int):
+    """Valor (SQL) do lançamento por conta e a condição para a conta recebê-lo.
+
+    Usa só o saldo base: ``_post_chunk`` consolida as parcelas antes, e o
+    débito da tarifa é aplicado ao saldo base.
+    """
+    if kind == "fee":
+        return literal(amount_cents), Account.balance_cents >= amount_cents
+    # Divisão inteira: o juro é truncado no centavo.
+    interest = Account.balance_cents * rate_ppm // PPM
+    return interest, interest >= 1
+
+
+async def _lock_range(db, last_account_id: int, end: int):
+    """Trava as contas da faixa e move as parcelas das contas fragmentadas para o saldo base."""
+    in_range = (Account.id > last_account_id, Account.id <= end)
+    await db.execute(select(Account.id).filter(*in_range).order_by(Account.id).with_for_update())
+    sharded = await db.execute(
+        select(AccountBalanceSlot.account_id)
+        .filter(AccountBalanceSlot.account_id > last_account_id, AccountBalanceSlot.account_id <= end)
+        .distinct()
+    )
+    sharded = sharded.scalars().all()
+    if sharded:
+        await balance_shards.consolidate(db, sharded)
+
+
+async def _start_run(db, run_id: str, kind: str, amount_cents: int, rate_ppm: int):
+    await begin_write(db)
+    run = await db.get(PostingRun, run_id)
+    if run is None:
+        through = await db.scalar(select(func.coalesce(func.max(Account.id), 0)))
+        run = PostingRun(
+            run_id=run_id,
+            kind=kind,
+            amount_cents=amount_cents,
+            rate_ppm=rate_ppm,
+            status="running",
+            last_account_id=0,
+            through_account_id=through,
+            postings=0,
+            posted_cents=0,
+            chunks=0,
+            seconds=0.0,
+        )
+        db.add(run)
+        await db.flush()
+    elif (run.kind, run.amount_cents, run.rate_ppm) != (kind, amount_cents, rate_ppm):
+        raise ValueError(f"A execução {run_id} já foi iniciada com outro lançamento ou outro valor.")
+    return _run_report(run)
+
+
+def _run_report(run):
+    return {
+        "run_id": run.run_id,
+        "kind": run.kind,
+        "status": run.status,
+        "last_account_id": run.last_account_id,
+        "through_account_id": run.through_account_id,
+        "postings": run.postings,
+        "posted": from_cents(run.posted_cents),
+        "chunks": run.chunks,
+        "seconds": run.seconds,
+    }
+
+
+async def _post_chunk(db, run_id: str, kind: str, amount_cents: int, rate_ppm: int, last_account_id: int, end: int):
+    """Lança a faixa de contas ``(last_account_id, end]`` e avança o checkpoint, na mesma transação.
+
+    Returns:
+        dict: Lançamentos e centavos da faixa e os totais da execução.
+    Raises:
+        ValueError: Se o checkpoint não estiver onde a faixa começou (a mesma
+            execução rodando em paralelo).
+    """
+    started = time.perf_counter()
+    await begin_write(db)
+    await _lock_range(db, last_account_id, end)
+    now = datetime.now(timezone.utc)
+    amount, eligible = _posting_amount(kind, amount_cents, rate_ppm)
+    accounts = select(
+        Account.id, literal(kind), amount, literal(now, Transaction.created_at.type)
+    ).filter(Account.id > last_account_id, Account.id <= end, eligible)
+    result = await db.execute(
+        insert(Transaction)
+        .from_select(["account_id", "type", "amount_cents", "created_at"], accounts)
+        .returning(Transaction.id, Transaction.account_id, Transaction.amount_cents)
+    )
+    posted = result.all()
+    if posted:
+        await db.execute(
+            update(Account)
+            .where(
+                Account.id == Transaction.account_id,
+                Transaction.id.between(min(row.id for row in posted), max(row.id for row in posted)),
+                Transaction.type == kind,
+                Transaction.account_id > last_account_id,
+                Transaction.account_id <= end,
+            )
+            .values(balance_cents=Account.balance_cents + TRANSACTION_SIGNS[kind] * Transaction.amount_cents)
+            .execution_options(synchronize_session=False)
+        )
+        await rollups.record(db, [
+            {"account_id": row.account_id, "type": kind, "amount_cents": row.amount_cents, "created_at": now}
+            for row in posted
+        ])
+        await balance_checkpoints.record(db, [(row.id, row.account_id) for row in posted], now)
+
+    cents = sum(row.amount_cents for row in posted)
+    result = await db.execute(
+        update(PostingRun)
+        .where(PostingRun.run_id == run_id, PostingRun.last_account_id == last_account_id)
+        .values(
+            last_account_id=end,
+            postings=PostingRun.postings + len(posted),
+            posted_cents=PostingRun.posted_cents + cents,
+            chunks=PostingRun.chunks + 1,
+            seconds=PostingRun.seconds + (time.perf_counter() - started),
+        )
+        .returning(PostingRun.postings, PostingRun.posted_cents, PostingRun.seconds)
+        .execution_options(synchronize_session=False)
+    )
+    totals = result.first()
+    if totals is None:
+        raise ValueError(f"A execução {run_id} já está sendo processada por outra chamada.")
+    return {
+        "chunk_postings": len(posted),
+        "chunk_cents": cents,
+        "postings": totals.postings,
+        "posted_cents": totals.posted_cents,
+        "seconds": totals.seconds,
+    }
+
+
+async def _finish_run(db, run_id: str):
+    await db.execute(
+        update(PostingRun)
+        .where(PostingRun.run_id == run_id)
+        .values(status="done", finished_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def post(
+    db,
+    kind: str,
+    amount=None,
+    rate=None,
+    run_id: str = None,
+    chunk_size: int = POSTING_CHUNK_SIZE,
+    progress=None,
+):
+    """Executa (ou retoma) um lançamento programado em todas as contas.
+
+    Args:
+        db: Sessão de escrita (não usada com o pipeline de escrita ativo).
+        kind (str): ``fee`` (tarifa, debitada) ou ``interest`` (juros, creditados).
+        amount: Valor da tarifa em reais (só ``fee``).
+        rate: Taxa de juros por execução, como fração (só ``interest``).
+        run_id (str): Identificador da execução; padrão: tipo e mês corrente.
+        chunk_size (int): Contas (IDs) por faixa, uma transação cada.
+        progress: Função chamada com o resumo parcial após cada faixa.
+    Returns:
+        dict: Situação da execução, lançamentos, valor total, faixas,
+        duração e vazão (lançamentos por segundo).
+    Raises:
+        ValueError: Se o tipo, o valor, a taxa ou a faixa forem inválidos, ou
+            se o ``run_id`` já tiver sido usado com outros parâmetros.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Lançamento inválido: {kind} (use 'fee' ou 'interest').")
+    if chunk_size < 1 or chunk_size > POSTING_MAX_CHUNK_SIZE:
+        raise ValueError(f"O tamanho da faixa deve estar entre 1 e {POSTING_MAX_CHUNK_SIZE}.")
+    amount_cents = rate_ppm = None
+    if kind == "fee":
+        amount_cents = 0 if amount is None else to_cents(amount)
+        if amount_cents <= 0:
+            raise ValueError("Valor de tarifa inválido.")
+    else:
+        rate_ppm = rate_to_ppm(rate)
+    run_id = run_id or default_run_id(kind)
+
+    report = await run_write(db, _start_run, run_id, kind, amount_cents, rate_ppm)
+    # Só é retomada uma execução interrompida; repetir uma concluída não lança nada.
+    resumed = report["status"] != "done" and report["last_account_id"] > 0
+    report["resumed_from"] = report["last_account_id"] if resumed else None
+    previous_postings = report["postings"]
+    started = time.perf_counter()
+    if report["status"] != "done":
+        last = report["last_account_id"]
+        while last < report["through_account_id"]:
+            end = min(last + chunk_size, report["through_account_id"])
+            chunk_started = time.perf_counter()
+            totals = await run_write(db, _post_chunk, run_id, kind, amount_cents, rate_ppm, last, end)
+            report.update(
+                last_account_id=end,
+                postings=totals["postings"],
+                posted=from_cents(totals["posted_cents"]),
+                chunks=report["chunks"] + 1,
+                seconds=totals["seconds"],
+            )
+            get_journal().append(
+                "posting_chunk",
+                request_id=request_id_var.get(),
+                run_id=run_id,
+                kind=kind,
+                first_account_id=last + 1,
+                last_account_id=end,
+                postings=totals["chunk_postings"],
+                amount=from_cents(totals["chunk_cents"]),
+            )
+            if progress is not None:
+                progress(dict(report, chunk_postings=totals["chunk_postings"], chunk_seconds=time.perf_counter() - chunk_started))
+            last = end
+        await run_write(db, _finish_run, run_id)
+        report["status"] = "done"
+    elapsed = time.perf_counter() - started
+    report["elapsed"] = round(elapsed, 3)
+    # Vazão só dos lançamentos feitos nesta chamada.
+    report["postings_per_second"] = round((report["postings"] - previous_postings) / elapsed) if elapsed else None
+    return report
+
+
+async def _main(args):
+    from app.models.database import Base, SessionLocal, engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    # Os lançamentos entram nos rollups: garante as tabelas com as colunas de tarifa e juros.
+    await rollups.ensure_rollups()
+
+    def show(partial):
+        print(
+            f"contas até {partial['last_account_id']}/{partial['through_account_id']}: "
+            f"{partial['chunk_postings']} lançamentos em {partial['chunk_seconds'] * 1000:.1f} ms",
+            flush=True,
+        )
+
+    async with SessionLocal() as db:
+        report = await post(
+            db,
+            args.kind,
+            amount=args.amount,
+            rate=args.rate,
+            run_id=args.run_id,
+            chunk_size=args.chunk_size,
+            progress=show if args.verbose else None,
+        )
+    await engine.dispose()
+    if report["resumed_from"] is not None:
+        print(f"Retomada a partir da conta {report['resumed_from'] + 1}.")
+    print(
+        f"Execução {report['run_id']} ({report['status']}): {report['postings']} lançamentos, "
+        f"total {report['posted']}, {report['chunks']} faixas."
+    )
+    print(f"Nesta chamada: {report['elapsed']} s ({report['postings_per_second']} lançamentos/s).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lançamentos programados: tarifa de manutenção e juros.")
+    parser.add_argument("kind", choices=KINDS)
+    parser.add_argument("--amount", help="valor da tarifa em reais (fee)")
+    parser.add_argument("--rate", help="taxa de juros por execução, como fração (interest), ex.: 0.005")
+    parser.add_argument("--run-id", help="padrão: tipo e mês corrente (ex.: fee-2026-10)")
+    parser.add_argument("--chunk-size", type=int, default=POSTING_CHUNK_SIZE, help="contas por transação")
+    parser.add_argument("--verbose", action="store_true", help="mostra o tempo de cada faixa")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_main(args))
+    except ValueError as e:
+        parser.exit(1, f"Erro: {e}\n")
@@ -0,0 +1,261 @@
+"""Cache read-through dos perfis de usuário (dados + IDs das contas).
+
+O backend é escolhido por ``PROFILE_CACHE_BACKEND``:
+
+- ``local`` (padrão): ``TTLCache`` no próprio processo;
+- ``socket``: servidor de cache local em um socket Unix, compartilhado por
+  todos os workers da máquina. Para subir o servidor::
+
+      python -m app.services.profile_cache --socket /tmp/bank-profile-cache.sock
+
+``create_user`` e ``create_account`` invalidam a entrada do usuário. Cada
+invalidação incrementa uma versão global; uma leitura só grava no cache se a
+versão não mudou desde o início da consulta ao banco, então uma escrita
+concorrente nunca é sobrescrita por um perfil antigo.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from dotenv import load_dotenv
+from sqlalchemy.future import select
+from app.models import Account, User
+from app.models.database import ReadSessionLocal
+from app.utils.metrics import CACHE_HIT_RATIO, CACHE_REQUESTS, register_collector
+from app.utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+PROFILE_CACHE_BACKEND = os.getenv("PROFILE_CACHE_BACKEND", "local")
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "60"))
+PROFILE_CACHE_SOCKET = os.getenv("PROFILE_CACHE_SOCKET", "/tmp/bank-profile-cache.sock")
+PROFILE_CACHE_SOCKET_TIMEOUT = float(os.getenv("PROFILE_CACHE_SOCKET_TIMEOUT", "0.5"))
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBackend:
+    """Backend em memória do processo (``TTLCache`` + versão de invalidação)."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize, ttl)
+        self.version = 0
+
+    async def get(self, key):
+        return self._cache.get(key), self.version
+
+    async def set(self, key, value, version: int):
+        if version == self.version:
+            self._cache.set(key, value)
+
+    async def invalidate(self, key):
+        self.version += 1
+        self._cache.pop(key)
+
+    async def close(self):
+        pass
+
+
+class SocketBackend:
+    """Cliente do servidor de cache em socket Unix (uma conexão por processo).
+
+    Falhas de comunicação nunca chegam à requisição: a leitura vira cache miss
+    e a invalidação é registrada no log (a entrada expira pelo TTL do servidor).
+    """
+
+    def __init__(self, path: str, timeout: float):
+        self.path = path
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+        self._lock = None
+
+    async def _call(self, request: dict):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            try:
+                if self._writer is None:
+                    self._reader, self._writer = await asyncio.wait_for(
+                        asyncio.open_unix_connection(self.path), self.timeout
+                    )
+                self._writer.write(json.dumps(request).encode("utf-8") + b"\n")
+                await self._writer.drain()
+                line = await asyncio.wait_for(self._reader.readline(), self.timeout)
+                if not line:
+                    raise ConnectionError("conexão encerrada pelo servidor de cache")
+                return json.loads(line)
+            except (OSError, asyncio.TimeoutError, ValueError) as e:
+                await self._disconnect()
+                raise ConnectionError(str(e) or type(e).__name__)
+
+    async def _disconnect(self):
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def get(self, key):
+        try:
+            response = await self._call({"op": "get", "key": key})
+        except ConnectionError as e:
+            logger.warning("Cache de perfis indisponível (%s): consultando o banco.", e)
+            return None, None
+        return response["value"], response["version"]
+
+    async def set(self, key, value, version: int):
+        if version is None:
+            return
+        try:
+            await self._call({"op": "set", "key": key, "value": value, "version": version})
+        except ConnectionError:
+            pass
+
+    async def invalidate(self, key):
+        try:
+            await self._call({"op": "invalidate", "key": key})
+        except ConnectionError as e:
+            logger.warning("Falha ao invalidar %s no cache de perfis (%s); expira em até %ss.", key, e, PROFILE_CACHE_TTL)
+
+    async def close(self):
+        await self._disconnect()
+
+
+def create_backend(kind: str = PROFILE_CACHE_BACKEND):
+    """Cria o backend configurado.
+
+    Raises:
+        ValueError: Se o backend for desconhecido.
+    """
+    if kind == "local":
+        return LocalBackend(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL)
+    if kind == "socket":
+        return SocketBackend(PROFILE_CACHE_SOCKET, PROFILE_CACHE_SOCKET_TIMEOUT)
+    raise ValueError(f"PROFILE_CACHE_BACKEND inválido: {kind} (use 'local' ou 'socket').")
+
+
+backend = create_backend()
+_counts = {"hit": 0, "miss": 0}
+
+
+@register_collector
+def _hit_ratio():
+    total = _counts["hit"] + _counts["miss"]
+    CACHE_HIT_RATIO.labels("profile").set(_counts["hit"] / total if total else 0.0)
+
+
+def _key(user_id: int):
+    return f"user:{user_id}"
+
+
+async def _load_profile(user_id: int):
+    # Uma única consulta (usuário + contas) em vez do get + selectin do relacionamento.
+    async with ReadSessionLocal() as db:
+        result = await db.execute(
+            select(User.id, User.username, Account.id)
+            .outerjoin(Account, Account.user_id == User.id)
+            .filter(User.id == user_id)
+            .order_by(Account.id)
+        )
+        rows = result.all()
+    if not rows:
+        return None
+    return {
+        "user_id": rows[0][0],
+        "username": rows[0][1],
+        "accounts": [account_id for _, _, account_id in rows if account_id is not None],
+    }
+
+
+async def get_user_profile(user_id: int):
+    """Retorna o perfil do usuário, do cache ou (em cache miss) do banco.
+
+    No acerto nenhuma sessão de banco é aberta; no miss é usada uma sessão do
+    pool somente leitura.
+
+    Args:
+        user_id (int): ID do usuário.
+    Returns:
+        dict | None: ``user_id``, ``username`` e ``accounts`` (IDs), ou None se o usuário não existir.
+    """
+    key = _key(user_id)
+    profile, version = await backend.get(key)
+    if profile is not None:
+        _counts["hit"] += 1
+        CACHE_REQUESTS.labels("profile", "hit").inc()
+        return profile
+    _counts["miss"] += 1
+    CACHE_REQUESTS.labels("profile", "miss").inc()
+    profile = await _load_profile(user_id)
+    if profile is not None:
+        await backend.set(key, profile, version)
+    return profile
+
+
+async def invalidate_user(user_id: int):
+    """Descarta o perfil em cache do usuário (após criar usuário ou conta)."""
+    await backend.invalidate(_key(user_id))
+
+
+def stats():
+    """Acertos, falhas e taxa de acerto do cache de perfis neste processo."""
+    total = _counts["hit"] + _counts["miss"]
+    return dict(_counts, backend=PROFILE_CACHE_BACKEND, hit_ratio=_counts["hit"] / total if total else 0.0)
+
+
+async def close():
+    await backend.close()
+
+
+async def serve(path: str, maxsize: int = PROFILE_CACHE_SIZE, ttl: float = PROFILE_CACHE_TTL):
+    """Servidor do backend ``socket``: um ``LocalBackend`` atendido por JSON em linhas."""
+    cache = LocalBackend(maxsize, ttl)
+
+    async def handle(reader, writer):
+        try:
+            while line := await reader.readline():
+                request = json.loads(line)
+                op = request.get("op")
+                if op == "get":
+                    value, version = await cache.get(request["key"])
+                    response = {"value": value, "version": version}
+                elif op == "set":
+                    await cache.set(request["key"], request["value"], request["version"])
+                    response = {"ok": True}
+                elif op == "invalidate":
+                    await cache.invalidate(request["key"])
+                    response = {"version": cache.version}
+                elif op == "stats":
+                    response = dict(cache._cache.stats(), version=cache.version)
+                else:
+                    response = {"error": f"operação desconhecida: {op}"}
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError, KeyError):
+            pass
+        finally:
+            writer.close()
+
+    if os.path.exists(path):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(handle, path=path)
+    print(f"Cache de perfis escutando em {path} (maxsize={maxsize}, ttl={ttl}s)")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local do cache de perfis (backend 'socket').")
+    parser.add_argument("--socket", default=PROFILE_CACHE_SOCKET)
+    parser.add_argument("--size", type=int, default=PROFILE_CACHE_SIZE)
+    parser.add_argument("--ttl", type=float, default=PROFILE_CACHE_TTL)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.socket, args.size, args.ttl))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,241 @@
+"""Conciliação offline do razão: saldo de cada conta x soma das suas transações.
+
+Para cada conta, o saldo gravado (``accounts.balance_cents`` + parcelas do
+saldo fragmentado) deve ser igual à soma das transações com o sinal de
+``TRANSACTION_SIGNS``. Em vez de carregar objetos do ORM, as transações são
+lidas em blocos de ``RECONCILIATION_CHUNK_ROWS`` linhas direto para arrays
+NumPy ``int64`` (conta, valor com sinal) e somadas por conta com
+``np.add.reduceat``; a aritmética é inteira e exata.
+
+O espaço de IDs de conta é dividido em faixas de ``RECONCILIATION_RANGE_SIZE``
+contas, distribuídas em um pool de processos. Cada faixa é lida em uma única
+transação de leitura (snapshot do WAL): saldos e transações de uma conta são
+sempre vistos no mesmo instante, então a conciliação pode rodar com a API no
+ar sem falsos alarmes nem bloquear as escritas. Somente SQLite (em WAL, para
+não bloquear os escritores).
+
+Uso pela linha de comando (código de saída 1 se houver divergências)::
+
+    python -m app.services.reconciliation --report conciliacao.csv --workers 8
+"""
+import argparse
+import csv
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
+from app.models.database import DATABASE_URL, engine_settings
+from app.models.transaction import TRANSACTION_SIGNS
+
+load_dotenv()
+
+RECONCILIATION_WORKERS = int(os.getenv("RECONCILIATION_WORKERS", str(os.cpu_count() or 1)))
+RECONCILIATION_RANGE_SIZE = int(os.getenv("RECONCILIATION_RANGE_SIZE", "100000"))
+RECONCILIATION_CHUNK_ROWS = int(os.getenv("RECONCILIATION_CHUNK_ROWS", "200000"))
+
+REPORT_FIELDS = ("account_id", "balance", "ledger", "difference", "transactions", "problem")
+
+_SIGNED_AMOUNT = "CASE type {} ELSE 0 END * COALESCE(amount_cents, 0)".format(
+    " ".join(f"WHEN '{kind}' THEN {sign}" for kind, sign in TRANSACTION_SIGNS.items())
+)
+
+
+def database_path(url: str = DATABASE_URL):
+    """Caminho do arquivo SQLite de ``DB_URL``.
+
+    Raises:
+        RuntimeError: Se o banco não for um arquivo SQLite.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:"):
+        raise RuntimeError("A conciliação lê o arquivo do banco diretamente: use um DB_URL SQLite em arquivo.")
+    return parsed.database
+
+
+def _connect(path: str):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute(f"PRAGMA busy_timeout={int(engine_settings['pragmas'].get('busy_timeout', 5000))}")
+    conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+def _ledger_sums(cursor, start: int, size: int, chunk_rows: int):
+    """Soma por conta (exata, ``int64``) das transações devolvidas pelo cursor.
+
+    As linhas chegam ordenadas por conta (ordem do índice), então cada bloco
+    é somado com ``np.add.reduceat`` nos pontos em que a conta muda; uma conta
+    dividida entre dois blocos só recebe duas parcelas.
+
+    Returns:
+        tuple: ``(somas, quantidades)``, arrays indexados por ``account_id - start``.
+    """
+    sums = np.zeros(size, dtype=np.int64)
+    counts = np.zeros(size, dtype=np.int64)
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        block = np.array(rows, dtype=np.int64)
+        accounts, amounts = block[:, 0] - start, block[:, 1]
+        starts = np.flatnonzero(np.r_[True, accounts[1:] != accounts[:-1]])
+        sums[accounts[starts]] += np.add.reduceat(amounts, starts)
+        counts += np.bincount(accounts, minlength=size)
+    return sums, counts
+
+
+def reconcile_range(path: str, start: int, stop: int, chunk_rows: int = RECONCILIATION_CHUNK_ROWS):
+    """Concilia as contas com ID em ``[start, stop)`` em um único snapshot.
+
+    Roda nos processos do pool: abre a própria conexão somente leitura.
+
+    Returns:
+        dict: ``accounts`` e ``transactions`` lidos e a lista ``mismatches``
+        (contas divergentes e transações de contas inexistentes).
+    """
+    size = stop - start
+    conn = _connect(path)
+    try:
+        conn.execute("BEGIN")
+        accounts = np.array(conn.execute(
+            "SELECT a.id, a.balance_cents + COALESCE("
+            "(SELECT SUM(s.balance) FROM account_balance_slots s WHERE s.account_id = a.id), 0) "
+            "FROM accounts a WHERE a.id >= ? AND a.id < ?",
+            (start, stop),
+        ).fetchall(), dtype=np.int64).reshape(-1, 2)
+        cursor = conn.execute(
+            f"SELECT account_id, {_SIGNED_AMOUNT} FROM transactions "
+            "WHERE account_id >= ? AND account_id < ? ORDER BY account_id",
+            (start, stop),
+        )
+        sums, counts = _ledger_sums(cursor, start, size, chunk_rows)
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+    exists = np.zeros(size, dtype=bool)
+    balances = np.zeros(size, dtype=np.int64)
+    exists[accounts[:, 0] - start] = True
+    balances[accounts[:, 0] - start] = accounts[:, 1]
+    mismatches = []
+    for index in np.flatnonzero(exists & (balances != sums)):
+        mismatches.append(_mismatch(start + index, balances[index], sums[index], counts[index], "saldo divergente"))
+    for index in np.flatnonzero(~exists & (counts > 0)):
+        mismatches.append(_mismatch(start + index, None, sums[index], counts[index], "conta inexistente"))
+    return {"accounts": len(accounts), "transactions": int(counts.sum()), "mismatches": mismatches}
+
+
+def _mismatch(account_id, balance, ledger, transactions, problem):
+    return {
+        "account_id": int(account_id),
+        "balance": None if balance is None else int(balance),
+        "ledger": int(ledger),
+        "difference": int(ledger) - (0 if balance is None else int(balance)),
+        "transactions": int(transactions),
+        "problem": problem,
+    }
+
+
+def account_ranges(path: str, range_size: int = RECONCILIATION_RANGE_SIZE):
+    """Faixas ``(start, stop)`` que cobrem os IDs de contas e de transações."""
+    conn = _connect(path)
+    try:
+        low, high = conn.execute(
+            "SELECT MIN(low), MAX(high) FROM ("
+            "SELECT MIN(id) AS low, MAX(id) AS high FROM accounts "
+            "UNION ALL SELECT MIN(account_id), MAX(account_id) FROM transactions)"
+        ).fetchone()
+    finally:
+        conn.close()
+    if low is None:
+        return []
+    return [(start, min(start + range_size, high + 1)) for start in range(low, high + 1, range_size)]
+
+
+def reconcile(
+    path: str = None,
+    workers: int = RECONCILIATION_WORKERS,
+    range_size: int = RECONCILIATION_RANGE_SIZE,
+    chunk_rows: int = RECONCILIATION_CHUNK_ROWS,
+    progress=None,
+):
+    """Concilia todas as contas, com as faixas de IDs distribuídas em ``workers`` processos.
+
+    Args:
+        path (str): Arquivo do banco (padrão: o de ``DB_URL``).
+        workers (int): Processos do pool (1 roda no processo atual).
+        range_size (int): Contas por faixa (uma transação de leitura por faixa).
+        chunk_rows (int): Linhas de ``transactions`` por bloco lido.
+        progress: Função chamada com o resumo parcial após cada faixa.
+    Returns:
+        dict: Totais, divergências (ordenadas por conta), duração e vazão.
+    """
+    path = path or database_path()
+    started = time.perf_counter()
+    ranges = account_ranges(path, range_size)
+    summary = {"ranges": len(ranges), "accounts": 0, "transactions": 0, "mismatches": []}
+
+    def collect(result):
+        summary["accounts"] += result["accounts"]
+        summary["transactions"] += result["transactions"]
+        summary["mismatches"].extend(result["mismatches"])
+        if progress:
+            progress(summary)
+
+    if workers <= 1 or len(ranges) <= 1:
+        for start, stop in ranges:
+            collect(reconcile_range(path, start, stop, chunk_rows))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+            futures = [executor.submit(reconcile_range, path, start, stop, chunk_rows) for start, stop in ranges]
+            for future in futures:
+                collect(future.result())
+
+    elapsed = time.perf_counter() - started
+    summary["mismatches"].sort(key=lambda item: item["account_id"])
+    summary["seconds"] = round(elapsed, 3)
+    summary["transactions_per_second"] = round(summary["transactions"] / elapsed) if elapsed else None
+    return summary
+
+
+def write_report(mismatches, report_path: str):
+    """Grava as divergências em CSV (valores em centavos)."""
+    with open(report_path, "w", newline="", encoding="utf-8") as report:
+        writer = csv.DictWriter(report, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(mismatches)
+
+
+def _main(args):
+    def progress(summary):
+        print(f"  {summary['accounts']} contas, {summary['transactions']} transações, "
+              f"{len(summary['mismatches'])} divergências", flush=True)
+
+    summary = reconcile(
+        workers=args.workers,
+        range_size=args.range_size,
+        chunk_rows=args.chunk_rows,
+        progress=progress if args.verbose else None,
+    )
+    write_report(summary["mismatches"], args.report)
+    print(
+        f"Conciliadas {summary['accounts']} contas e {summary['transactions']} transações "
+        f"em {summary['ranges']} faixas ({summary['seconds']} s, {summary['transactions_per_second']} transações/s)."
+    )
+    print(f"Divergências: {len(summary['mismatches'])} (relatório em {args.report}).")
+    return 1 if summary["mismatches"] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conciliação dos saldos com o histórico de transações.")
+    parser.add_argument("--report", default="conciliacao.csv", help="CSV com as divergências")
+    parser.add_argument("--workers", type=int, default=RECONCILIATION_WORKERS)
+    parser.add_argument("--range-size", type=int, default=RECONCILIATION_RANGE_SIZE, help="contas por faixa")
+    parser.add_argument("--chunk-rows", type=int, default=RECONCILIATION_CHUNK_ROWS, help="transações por bloco")
+    parser.add_argument("--verbose", action="store_true", help="mostra o progresso a cada faixa")
+    args = parser.parse_args()
+    if args.range_size < 1 or args.chunk_rows < 1:
+        parser.error("--range-size e --chunk-rows devem ser >= 1")
+    raise SystemExit(_main(args))
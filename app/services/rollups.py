@@ -0,0 +1,389 @@
+"""Rollups diários e mensais do movimento das contas (resumos de extrato).
+
+``account_daily_rollup`` e ``account_monthly_rollup`` guardam, por conta e
+período (UTC), o total de cada tipo de transação. O modo de manutenção vem de
+``ROLLUP_MODE``:
+
+- ``inline`` (padrão): os rollups são atualizados (upsert) na mesma transação
+  que insere as transações;
+- ``catchup``: uma task periódica consolida as transações novas em lotes, a
+  partir da última consolidada (``rollup_state.last_transaction_id``), sem
+  tocar nas linhas de rollup no caminho de escrita. Os resumos ficam
+  atrasados em até ``ROLLUP_INTERVAL`` segundos.
+
+Ao iniciar, se os rollups nunca foram montados ou o modo mudou, eles são
+reconstruídos a partir de ``transactions`` (``ensure_rollups``). Para
+reconstruir manualmente::
+
+    python -m app.services.rollups --rebuild
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timezone
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, inspect
+from sqlalchemy.future import select
+from app.models import AccountDailyRollup, AccountMonthlyRollup, RollupState, Transaction
+from app.models.database import SessionLocal, begin_write, engine, upsert
+from app.models.transaction import TRANSACTION_SIGNS
+from app.utils.money import from_cents
+
+load_dotenv()
+
+ROLLUP_MODE = os.getenv("ROLLUP_MODE", "inline")
+ROLLUP_INTERVAL = float(os.getenv("ROLLUP_INTERVAL", "5"))
+ROLLUP_BATCH = int(os.getenv("ROLLUP_BATCH", "5000"))
+
+MODES = ("inline", "catchup")
+GRANULARITIES = {"dia": AccountDailyRollup, "mes": AccountMonthlyRollup}
+
+# Coluna do rollup por tipo de transação (o sinal no fluxo líquido vem de ``TRANSACTION_SIGNS``).
+TYPE_COLUMNS = {
+    "deposit": "deposits",
+    "withdraw": "withdrawals",
+    "transfer_in": "transfers_in",
+    "transfer_out": "transfers_out",
+    "fee": "fees",
+    "interest": "interest",
+}
+TOTAL_COLUMNS = (*TYPE_COLUMNS.values(), "transactions")
+
+_STATE_NAME = "rollups"
+
+logger = logging.getLogger(__name__)
+
+_catchup_task = None
+
+if ROLLUP_MODE not in MODES:
+    raise ValueError(f"ROLLUP_MODE inválido: {ROLLUP_MODE} (use 'inline' ou 'catchup').")
+
+
+def _net(model):
+    """Expressão SQL do fluxo líquido de uma linha de rollup."""
+    return model.deposits + model.transfers_in + model.interest - model.withdrawals - model.transfers_out - model.fees
+
+
+def _day(created_at: datetime):
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+
+def aggregate(rows, daily=None, monthly=None):
+    """Soma as transações por (conta, dia) e (conta, mês).
+
+    Args:
+        rows: Transações (mapeamentos) com ``account_id``, ``type``, ``amount_cents`` e ``created_at``.
+        daily (dict), monthly (dict): Acumuladores a completar (opcionais).
+    Returns:
+        tuple[dict, dict]: Totais diários e mensais por ``(account_id, período)``.
+    """
+    daily = {} if daily is None else daily
+    monthly = {} if monthly is None else monthly
+    for row in rows:
+        day = _day(row["created_at"])
+        column = TYPE_COLUMNS[row["type"]]
+        for buckets, period in ((daily, day), (monthly, day.replace(day=1))):
+            totals = buckets.setdefault((row["account_id"], period), dict.fromkeys(TOTAL_COLUMNS, 0))
+            totals[column] += row["amount_cents"]
+            totals["transactions"] += 1
+    return daily, monthly
+
+
+async def _upsert(db, model, buckets):
+    """Soma os totais às linhas de rollup existentes (ou as cria)."""
+    if not buckets:
+        return
+    stmt = await upsert(db, model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[model.account_id, model.period],
+        set_={column: getattr(model, column) + getattr(stmt.excluded, column) for column in TOTAL_COLUMNS},
+    )
+    await db.execute(
+        stmt,
+        [dict(totals, account_id=account_id, period=period) for (account_id, period), totals in buckets.items()],
+    )
+
+
+async def _apply(db, daily, monthly):
+    await _upsert(db, AccountDailyRollup, daily)
+    await _upsert(db, AccountMonthlyRollup, monthly)
+
+
+async def record(db, rows):
+    """Atualiza os rollups com as transações recém-inseridas, na transação corrente.
+
+    Não faz nada no modo ``catchup`` (a task de consolidação cuida delas).
+    """
+    if ROLLUP_MODE == "inline" and rows:
+        await _apply(db, *aggregate(rows))
+
+
+async def rebuild(db, mode: str = ROLLUP_MODE):
+    """Reconstrói os rollups a partir de todas as transações, na transação corrente.
+
+    Lê as transações em fluxo e grava os totais de uma vez; o lock de escrita
+    é mantido durante toda a reconstrução, para que nenhuma transação nova
+    fique de fora (ou seja contada duas vezes).
+
+    Returns:
+        int: Quantidade de transações consolidadas.
+    Raises:
+        RuntimeError: Se o modo for ``catchup`` e o banco não for SQLite.
+    """
+    _check_mode(mode)
+    await begin_write(db)
+    await db.execute(delete(AccountDailyRollup))
+    await db.execute(delete(AccountMonthlyRollup))
+    daily, monthly = {}, {}
+    last_id = count = 0
+    result = await db.stream(
+        select(Transaction.id, Transaction.account_id, Transaction.type, Transaction.amount_cents, Transaction.created_at)
+        .order_by(Transaction.id)
+        .execution_options(yield_per=ROLLUP_BATCH)
+    )
+    async for partition in result.partitions():
+        aggregate([row._mapping for row in partition], daily, monthly)
+        last_id = partition[-1].id
+        count += len(partition)
+    await _apply(db, daily, monthly)
+    state = await db.get(RollupState, _STATE_NAME)
+    if state is None:
+        db.add(RollupState(name=_STATE_NAME, mode=mode, last_transaction_id=last_id))
+    else:
+        state.mode, state.last_transaction_id = mode, last_id
+    await db.flush()
+    return count
+
+
+def _check_mode(mode: str):
+    """Recusa o modo ``catchup`` fora do SQLite.
+
+    A marca de consolidação supõe que os IDs são confirmados em ordem, o que
+    só o escritor único do SQLite garante: no Postgres, transações
+    concorrentes confirmam IDs fora de ordem e o catch-up pularia linhas.
+
+    Raises:
+        RuntimeError: Se o modo for ``catchup`` e o banco não for SQLite.
+    """
+    if mode == "catchup" and engine.dialect.name != "sqlite":
+        raise RuntimeError(
+            f"ROLLUP_MODE=catchup é suportado só em SQLite (banco atual: {engine.dialect.name}); use o modo inline."
+        )
+
+
+def _outdated_tables(sync_conn):
+    """Tabelas de rollup criadas antes de alguma coluna de ``TOTAL_COLUMNS`` existir."""
+    inspector = inspect(sync_conn)
+    tables = []
+    for model in GRANULARITIES.values():
+        columns = {column["name"] for column in inspector.get_columns(model.__tablename__)}
+        if not columns.issuperset(TOTAL_COLUMNS):
+            tables.append(model.__table__)
+    return tables
+
+
+def _recreate(sync_conn, tables):
+    for table in tables:
+        table.drop(sync_conn)
+        table.create(sync_conn)
+
+
+async def ensure_rollups(mode: str = ROLLUP_MODE):
+    """Reconstrói os rollups se nunca foram montados, se o modo mudou ou se
+    as tabelas não têm as colunas de um tipo de transação novo (no startup).
+
+    Raises:
+        RuntimeError: Se o modo for ``catchup`` e o banco não for SQLite.
+    """
+    _check_mode(mode)
+    async with SessionLocal() as db:
+        await begin_write(db)
+        conn = await db.connection()
+        outdated = await conn.run_sync(_outdated_tables)
+        state = await db.get(RollupState, _STATE_NAME)
+        if state is not None and state.mode == mode and not outdated:
+            await db.rollback()
+            return
+        # Os rollups são derivados de ``transactions``: tabelas antigas são recriadas.
+        await conn.run_sync(_recreate, outdated)
+        count = await rebuild(db, mode)
+        await db.commit()
+    logger.info("Rollups reconstruídos (modo %s): %s transações.", mode, count)
+
+
+async def catch_up(batch_size: int = ROLLUP_BATCH):
+    """Consolida as transações posteriores à última consolidada, em lotes.
+
+    Cada lote é uma transação curta que grava os totais e avança
+    ``last_transaction_id``. No SQLite os IDs são atribuídos sob o lock de
+    escrita, então nenhuma transação confirmada fica com ID abaixo da marca.
+
+    Returns:
+        int: Quantidade de transações consolidadas.
+    Raises:
+        RuntimeError: Se o banco não for SQLite.
+    """
+    _check_mode("catchup")
+    done = 0
+    while True:
+        async with SessionLocal() as db:
+            await begin_write(db)
+            state = await db.get(RollupState, _STATE_NAME)
+            if state is None:
+                await db.rollback()
+                return done
+            result = await db.execute(
+                select(Transaction.account_id, Transaction.type, Transaction.amount_cents, Transaction.created_at, Transaction.id)
+                .filter(Transaction.id > state.last_transaction_id)
+                .order_by(Transaction.id)
+                .limit(batch_size)
+            )
+            rows = result.mappings().all()
+            if rows:
+                await _apply(db, *aggregate(rows))
+                state.last_transaction_id = rows[-1]["id"]
+            await db.commit()
+        done += len(rows)
+        if len(rows) < batch_size:
+            return done
+        await asyncio.sleep(0)
+
+
+async def _catchup_loop(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await catch_up()
+        except Exception:
+            logger.exception("Falha ao consolidar os rollups.")
+
+
+def start_catchup(interval: float = ROLLUP_INTERVAL):
+    """Inicia a task periódica de consolidação (só no modo ``catchup``)."""
+    global _catchup_task
+    if ROLLUP_MODE == "catchup" and _catchup_task is None:
+        _catchup_task = asyncio.create_task(_catchup_loop(interval))
+
+
+async def stop_catchup():
+    global _catchup_task
+    task, _catchup_task = _catchup_task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+def _in_reais(values: dict):
+    return {column: value if column == "transactions" else from_cents(value) for column, value in values.items()}
+
+
+def _month_start(value: date):
+    return value.replace(day=1)
+
+
+async def summary(db, account_id: int, start: date = None, end: date = None, granularity: str = "mes"):
+    """Resumo do movimento da conta por dia ou por mês, lido dos rollups.
+
+    O saldo de fechamento de cada período é o fluxo líquido acumulado desde a
+    abertura da conta (toda alteração de saldo gera uma transação); o saldo
+    anterior a ``start`` vem de uma soma sobre os rollups mensais.
+
+    Args:
+        db: Sessão do banco de dados.
+        account_id (int): ID da conta.
+        start (date): Primeiro dia do resumo (no mensal, o mês que o contém).
+        end (date): Dia final, exclusivo (no mensal, entram os meses com algum
+            dia antes dele: ``fim=2026-01-01`` termina em dezembro de 2025).
+        granularity (str): ``dia`` ou ``mes``.
+    Returns:
+        dict: ``periods`` (totais, ``net`` e ``closing_balance`` por período),
+        ``totals``, ``opening_balance`` e a marca de consolidação.
+    Raises:
+        ValueError: Se a granularidade ou o intervalo forem inválidos.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError("Granularidade inválida (use 'dia' ou 'mes').")
+    if start is not None and end is not None and end <= start:
+        raise ValueError("O fim do período deve ser posterior ao início.")
+    model = GRANULARITIES[granularity]
+    opening = 0
+    if start is not None:
+        if granularity == "mes":
+            start = _month_start(start)
+        opening = await db.scalar(
+            select(func.coalesce(func.sum(_net(AccountMonthlyRollup)), 0))
+            .filter(AccountMonthlyRollup.account_id == account_id, AccountMonthlyRollup.period < _month_start(start))
+        )
+        if start.day != 1:
+            opening += await db.scalar(
+                select(func.coalesce(func.sum(_net(AccountDailyRollup)), 0)).filter(
+                    AccountDailyRollup.account_id == account_id,
+                    AccountDailyRollup.period >= _month_start(start),
+                    AccountDailyRollup.period < start,
+                )
+            )
+
+    query = select(model).filter(model.account_id == account_id)
+    if start is not None:
+        query = query.filter(model.period >= start)
+    if end is not None:
+        # Períodos mensais são o dia 1 do mês: ``period < end`` mantém só os meses que começam antes do fim exclusivo.
+        query = query.filter(model.period < end)
+    rollups = (await db.execute(query.order_by(model.period))).scalars().all()
+
+    # Somas exatas em centavos; convertidas para reais só na saída.
+    balance = opening
+    totals = dict.fromkeys(TOTAL_COLUMNS, 0)
+    periods = []
+    for rollup in rollups:
+        values = {column: getattr(rollup, column) for column in TOTAL_COLUMNS}
+        net = sum(values[column] * TRANSACTION_SIGNS[kind] for kind, column in TYPE_COLUMNS.items())
+        balance += net
+        for column in TOTAL_COLUMNS:
+            totals[column] += values[column]
+        periods.append(dict(_in_reais(values), period=rollup.period.isoformat(), net=from_cents(net), closing_balance=from_cents(balance)))
+
+    state = await db.get(RollupState, _STATE_NAME)
+    return {
+        "account_id": account_id,
+        "granularity": granularity,
+        "opening_balance": from_cents(opening),
+        "closing_balance": from_cents(balance),
+        "totals": dict(_in_reais(totals), net=from_cents(balance - opening)),
+        "periods": periods,
+        # No modo catchup, transações com ID acima desta marca ainda não entraram no resumo.
+        "consolidated_through": state.last_transaction_id if state is not None and state.mode == "catchup" else None,
+    }
+
+
+async def _main(args):
+    from app.models.database import Base, engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if args.rebuild:
+            await conn.run_sync(lambda sync_conn: _recreate(sync_conn, _outdated_tables(sync_conn)))
+    async with SessionLocal() as db:
+        if args.rebuild:
+            count = await rebuild(db, ROLLUP_MODE)
+            await db.commit()
+            print(f"Rollups reconstruídos (modo {ROLLUP_MODE}): {count} transações.")
+    if args.catch_up:
+        print(f"Transações consolidadas: {await catch_up()}.")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manutenção dos rollups diários/mensais.")
+    parser.add_argument("--rebuild", action="store_true", help="reconstrói a partir de todas as transações")
+    parser.add_argument("--catch-up", action="store_true", help="consolida as transações pendentes (modo catchup)")
+    args = parser.parse_args()
+    if not (args.rebuild or args.catch_up):
+        parser.error("informe --rebuild e/ou --catch-up")
+    asyncio.run(_main(args))
@@ -0,0 +1,397 @@
+"""Importação em massa de usuários a partir de CSV ou NDJSON.
+
+O arquivo é lido em fluxo, em lotes de ``USER_IMPORT_BATCH_SIZE`` registros.
+Em cada lote:
+
+1. registros inválidos, repetidos no arquivo ou já cadastrados são separados
+   como erros (sem gastar bcrypt com eles);
+2. as senhas restantes são hasheadas em um pool de processos próprio;
+3. usuários, erros do lote e o checkpoint (``user_imports.rows_done``) são
+   gravados em uma única transação, com ``executemany``.
+
+Como o checkpoint é confirmado junto com os usuários, uma importação
+interrompida retoma do primeiro registro ainda não gravado ao ser executada de
+novo com o mesmo ``import_id`` (por padrão, derivado do conteúdo do arquivo).
+
+Uso pela linha de comando::
+
+    python -m app.services.user_import usuarios.csv --batch-size 1000
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import hashlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from sqlalchemy import insert, update
+from sqlalchemy.future import select
+from app.models import User, UserImport, UserImportError
+from app.models.database import ReadSessionLocal, begin_write
+from app.services.auth_service import validate_password
+from app.services.password_pool import hash_many
+from app.services.write_pipeline import run_write
+from app.utils.audit import get_journal
+from app.utils.log_config import request_id_var
+
+load_dotenv()
+
+USER_IMPORT_BATCH_SIZE = int(os.getenv("USER_IMPORT_BATCH_SIZE", "500"))
+USER_IMPORT_MAX_BATCH_SIZE = int(os.getenv("USER_IMPORT_MAX_BATCH_SIZE", "5000"))
+USER_IMPORT_WORKERS = int(os.getenv("USER_IMPORT_WORKERS", str(os.cpu_count() or 1)))
+USER_IMPORT_ERROR_LIMIT = int(os.getenv("USER_IMPORT_ERROR_LIMIT", "100"))
+
+FORMATS = ("csv", "ndjson")
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # spawn: um fork do processo da API copiaria o event loop, as conexões e a
+        # thread de log em andamento. Os workers importam só ``password_pool``.
+        _executor = ProcessPoolExecutor(
+            max_workers=USER_IMPORT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown():
+    """Encerra o pool de processos de hashing da importação (se foi criado)."""
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def detect_format(filename: str):
+    """Formato pelo nome do arquivo: ``.ndjson``/``.jsonl`` são NDJSON, o resto é CSV."""
+    return "ndjson" if (filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv"
+
+
+def file_digest(binary_file):
+    """Identificador padrão da importação: SHA-256 do conteúdo (16 dígitos hex).
+
+    Lê o arquivo em blocos e volta ao início.
+    """
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: binary_file.read(1 << 20), b""):
+        digest.update(chunk)
+    binary_file.seek(0)
+    return digest.hexdigest()[:16]
+
+
+def iter_rows(binary_file, fmt: str):
+    """Lê os registros do arquivo em fluxo.
+
+    CSV precisa das colunas ``username`` e ``password``; NDJSON, de um objeto
+    com essas chaves por linha (linhas em branco são ignoradas).
+
+    Yields:
+        tuple: ``(linha, username, password, erro)``; ``erro`` é None nos
+        registros que puderam ser lidos. ``linha`` começa em 1 e não conta o
+        cabeçalho do CSV.
+    Raises:
+        ValueError: Se o formato for desconhecido ou faltar coluna no CSV.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato inválido: {fmt} (use 'csv' ou 'ndjson').")
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            if not {"username", "password"} <= set(reader.fieldnames or ()):
+                raise ValueError("O CSV precisa das colunas 'username' e 'password'.")
+            for number, record in enumerate(reader, start=1):
+                yield number, record.get("username"), record.get("password"), None
+        else:
+            number = 0
+            for line in text:
+                if not line.strip():
+                    continue
+                number += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    yield number, None, None, "JSON inválido."
+                    continue
+                if not isinstance(record, dict):
+                    yield number, None, None, "Registro deve ser um objeto JSON."
+                    continue
+                yield number, record.get("username"), record.get("password"), None
+    finally:
+        # Não fecha o arquivo do chamador junto com o wrapper.
+        text.detach()
+
+
+def _read_batch(rows, size: int):
+    """Próximos ``size`` registros de ``iter_rows`` (leitura bloqueante: roda em uma thread)."""
+    return list(itertools.islice(rows, size))
+
+
+def _skip_rows(rows, count: int):
+    for _ in itertools.islice(rows, count):
+        pass
+
+
+def _validate_record(username, password):
+    """Motivo da recusa do registro, ou None se ele for válido."""
+    if not isinstance(username, str) or not username.strip():
+        return "Usuário é obrigatório."
+    if not password:
+        return "Senha é obrigatória."
+    try:
+        validate_password(password)
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+async def _existing_usernames(db, usernames):
+    result = await db.execute(select(User.username).filter(User.username.in_(usernames)))
+    return set(result.scalars().all())
+
+
+async def _start_import(db, import_id: str, source: str):
+    await begin_write(db)
+    state = await db.get(UserImport, import_id)
+    if state is None:
+        state = UserImport(import_id=import_id, source=source, status="running", rows_done=0, imported=0, rejected=0)
+        db.add(state)
+        await db.flush()
+    return {"status": state.status, "rows_done": state.rows_done, "imported": state.imported, "rejected": state.rejected}
+
+
+async def _write_batch(db, import_id: str, rows_done: int, rows_after: int, users, errors):
+    """Grava os usuários e os erros do lote e avança o checkpoint, na mesma transação.
+
+    Os nomes são conferidos de novo já com o lock de escrita: um cadastro feito
+    entre a pré-checagem e a gravação vira erro de duplicado, não falha do lote.
+
+    Raises:
+        ValueError: Se o checkpoint não estiver onde o lote começou (a mesma
+            importação rodando em paralelo).
+    """
+    await begin_write(db)
+    taken = await _existing_usernames(db, [user["username"] for user in users]) if users else set()
+    if taken:
+        errors = errors + [
+            {"row": user["row"], "username": user["username"], "reason": "Nome de usuário já existe."}
+            for user in users if user["username"] in taken
+        ]
+        users = [user for user in users if user["username"] not in taken]
+    if users:
+        await db.execute(insert(User), [{"username": user["username"], "password": user["password"]} for user in users])
+    if errors:
+        await db.execute(insert(UserImportError), [dict(error, import_id=import_id) for error in errors])
+    result = await db.execute(
+        update(UserImport)
+        .where(UserImport.import_id == import_id, UserImport.rows_done == rows_done)
+        .values(
+            rows_done=rows_after,
+            imported=UserImport.imported + len(users),
+            rejected=UserImport.rejected + len(errors),
+            updated_at=datetime.now(timezone.utc),
+        )
+        .returning(UserImport.imported, UserImport.rejected)
+        .execution_options(synchronize_session=False)
+    )
+    totals = result.first()
+    if totals is None:
+        raise ValueError(f"A importação {import_id} já está sendo processada por outra execução.")
+    return {"imported": totals.imported, "rejected": totals.rejected, "batch_imported": len(users), "batch_rejected": len(errors)}
+
+
+async def _finish_import(db, import_id: str):
+    await db.execute(
+        update(UserImport)
+        .where(UserImport.import_id == import_id)
+        .values(status="done", updated_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _hash_passwords(executor, passwords, workers: int):
+    loop = asyncio.get_running_loop()
+    size = max(1, -(-len(passwords) // workers))
+    chunks = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+    hashed = await asyncio.gather(*(loop.run_in_executor(executor, hash_many, chunk) for chunk in chunks))
+    return list(itertools.chain.from_iterable(hashed))
+
+
+async def _prepare_batch(batch, seen: set, executor, workers: int):
+    """Separa os erros do lote e hasheia as senhas dos registros aceitos."""
+    errors, accepted = [], []
+    for number, username, password, error in batch:
+        username = username.strip() if isinstance(username, str) else username
+        error = error or _validate_record(username, password)
+        if error is None and username in seen:
+            error = "Usuário repetido no arquivo."
+        if error is not None:
+            errors.append({"row": number, "username": username if isinstance(username, str) else None, "reason": error})
+            continue
+        seen.add(username)
+        accepted.append((number, username, password))
+    if accepted:
+        async with ReadSessionLocal() as db:
+            taken = await _existing_usernames(db, [username for _, username, _ in accepted])
+        errors += [
+            {"row": number, "username": username, "reason": "Nome de usuário já existe."}
+            for number, username, _ in accepted if username in taken
+        ]
+        accepted = [record for record in accepted if record[1] not in taken]
+    hashed = await _hash_passwords(executor, [password for _, _, password in accepted], workers) if accepted else []
+    users = [
+        {"row": number, "username": username, "password": password_hash}
+        for (number, username, _), password_hash in zip(accepted, hashed)
+    ]
+    return users, sorted(errors, key=lambda error: error["row"])
+
+
+async def import_errors(import_id: str, limit: int = USER_IMPORT_ERROR_LIMIT):
+    """Primeiros ``limit`` erros registrados na importação, em ordem de linha."""
+    async with ReadSessionLocal() as db:
+        result = await db.execute(
+            select(UserImportError.row, UserImportError.username, UserImportError.reason)
+            .filter(UserImportError.import_id == import_id)
+            .order_by(UserImportError.row)
+            .limit(limit)
+        )
+        return [{"row": row, "username": username, "reason": reason} for row, username, reason in result.all()]
+
+
+async def import_users(
+    db,
+    binary_file,
+    fmt: str = "csv",
+    import_id: str = None,
+    source: str = None,
+    batch_size: int = USER_IMPORT_BATCH_SIZE,
+    executor=None,
+    workers: int = USER_IMPORT_WORKERS,
+    progress=None,
+):
+    """Importa os usuários do arquivo, retomando do checkpoint se já foi iniciado.
+
+    Registros inválidos ou duplicados não interrompem a importação: ficam em
+    ``user_import_errors`` com a linha e o motivo.
+
+    Args:
+        db: Sessão de escrita (não usada com o pipeline de escrita ativo).
+        binary_file: Arquivo aberto em modo binário, com ``seek``; lido em
+            uma thread, lote a lote, para não bloquear o event loop.
+        fmt (str): ``csv`` ou ``ndjson``.
+        import_id (str): Identificador da importação; padrão: hash do conteúdo.
+        source (str): Nome do arquivo, só para registro.
+        batch_size (int): Registros por lote (uma transação cada).
+        executor: Pool para o bcrypt; padrão: o pool de processos do módulo.
+        workers (int): Em quantas partes cada lote é dividido para o hashing.
+        progress: Função chamada com o resumo parcial após cada lote.
+    Returns:
+        dict: ``import_id``, ``status``, ``rows``, ``imported``, ``rejected``,
+        ``resumed_from`` e os primeiros ``errors``.
+    Raises:
+        ValueError: Se o formato, o tamanho do lote ou o arquivo forem inválidos.
+    """
+    if batch_size < 1 or batch_size > USER_IMPORT_MAX_BATCH_SIZE:
+        raise ValueError(f"O tamanho do lote deve estar entre 1 e {USER_IMPORT_MAX_BATCH_SIZE}.")
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato inválido: {fmt} (use 'csv' ou 'ndjson').")
+    # O arquivo é lido com chamadas bloqueantes (no upload, um arquivo temporário): fora do event loop.
+    import_id = import_id or await asyncio.to_thread(file_digest, binary_file)
+    executor = executor or _get_executor()
+    state = await run_write(db, _start_import, import_id, source)
+    report = {
+        "import_id": import_id,
+        "status": state["status"],
+        "rows": state["rows_done"],
+        "imported": state["imported"],
+        "rejected": state["rejected"],
+        "resumed_from": state["rows_done"],
+    }
+    if state["status"] != "done":
+        with contextlib.closing(iter_rows(binary_file, fmt)) as rows:
+            # Registros já confirmados em uma execução anterior.
+            await asyncio.to_thread(_skip_rows, rows, state["rows_done"])
+            seen = set()
+            while batch := await asyncio.to_thread(_read_batch, rows, batch_size):
+                started = time.perf_counter()
+                users, errors = await _prepare_batch(batch, seen, executor, workers)
+                rows_after = batch[-1][0]
+                totals = await run_write(db, _write_batch, import_id, report["rows"], rows_after, users, errors)
+                report.update(rows=rows_after, imported=totals["imported"], rejected=totals["rejected"])
+                get_journal().append(
+                    "user_import_batch",
+                    request_id=request_id_var.get(),
+                    import_id=import_id,
+                    rows=rows_after,
+                    imported=totals["batch_imported"],
+                    rejected=totals["batch_rejected"],
+                )
+                if progress is not None:
+                    progress(dict(report, seconds=time.perf_counter() - started))
+        await run_write(db, _finish_import, import_id)
+        report["status"] = "done"
+    report["errors"] = await import_errors(import_id)
+    return report
+
+
+async def _main(args):
+    from app.models.database import Base, SessionLocal, engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    def show(partial):
+        print(
+            f"linhas={partial['rows']} importados={partial['imported']} "
+            f"recusados={partial['rejected']} lote={partial['seconds']:.2f}s",
+            flush=True,
+        )
+
+    started = time.perf_counter()
+    with open(args.arquivo, "rb") as f, ProcessPoolExecutor(max_workers=args.workers) as executor:
+        async with SessionLocal() as db:
+            report = await import_users(
+                db,
+                f,
+                fmt=args.format or detect_format(args.arquivo),
+                import_id=args.import_id,
+                source=os.path.basename(args.arquivo),
+                batch_size=args.batch_size,
+                executor=executor,
+                workers=args.workers,
+                progress=show,
+            )
+    await engine.dispose()
+    elapsed = time.perf_counter() - started
+    if report["resumed_from"]:
+        print(f"Retomada a partir da linha {report['resumed_from'] + 1}.")
+    print(
+        f"Importação {report['import_id']} ({report['status']}): {report['imported']} importados, "
+        f"{report['rejected']} recusados em {report['rows']} linhas ({elapsed:.1f}s)."
+    )
+    for error in report["errors"]:
+        print(f"  linha {error['row']}: {error['username'] or '-'}: {error['reason']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importação em massa de usuários (CSV ou NDJSON).")
+    parser.add_argument("arquivo")
+    parser.add_argument("--format", choices=FORMATS, help="padrão: pela extensão do arquivo")
+    parser.add_argument("--import-id", help="padrão: hash do conteúdo do arquivo")
+    parser.add_argument("--batch-size", type=int, default=USER_IMPORT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=USER_IMPORT_WORKERS)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_main(args))
+    except ValueError as e:
+        parser.exit(1, f"Erro: {e}\n")
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import os
+import time
+from dotenv import load_dotenv
+from app.models.database import SessionLocal, begin_write
+
+load_dotenv()
+
+WRITE_PIPELINE = os.getenv("WRITE_PIPELINE", "0").lower() in ("1", "true", "yes", "on")
+WRITE_PIPELINE_BATCH_SIZE = int(os.getenv("WRITE_PIPELINE_BATCH_SIZE", "64"))
+WRITE_PIPELINE_LINGER_MS = float(os.getenv("WRITE_PIPELINE_LINGER_MS", "2"))
+WRITE_PIPELINE_QUEUE_SIZE = int(os.getenv("WRITE_PIPELINE_QUEUE_SIZE", "1000"))
+
+logger = logging.getLogger(__name__)
+
+
+class WritePipeline:
+    """Escritor único com group commit para as operações que alteram o banco.
+
+    As operações enfileiradas são executadas, em micro-lotes, por uma única
+    task que mantém uma sessão própria. Cada operação roda dentro de um
+    SAVEPOINT (a falha de uma não desfaz as outras) e o lote inteiro é
+    confirmado com um único COMMIT; só então o futuro de cada chamador é
+    resolvido com o próprio resultado ou erro.
+
+    Args:
+        batch_size (int): Máximo de operações por commit.
+        linger_ms (float): Quanto esperar por mais operações antes de fechar o lote.
+        queue_size (int): Capacidade da fila; ``submit`` aguarda quando ela enche.
+    """
+
+    def __init__(self, batch_size: int, linger_ms: float, queue_size: int):
+        if batch_size < 1 or linger_ms < 0 or queue_size < 1:
+            raise ValueError("Configuração inválida do pipeline de escrita.")
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000
+        self.queue_size = queue_size
+        self._queue = None
+        self._task = None
+        self._stats = {
+            "submitted": 0,
+            "batches": 0,
+            "ops_ok": 0,
+            "ops_failed": 0,
+            "commit_failures": 0,
+            "batch_size_max": 0,
+            "queue_wait_seconds_sum": 0.0,
+            "commit_seconds_sum": 0.0,
+        }
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run(), name="write-pipeline")
+        logger.info(
+            "pipeline de escrita ativo: batch_size=%s linger_ms=%s queue_size=%s",
+            self.batch_size, self.linger * 1000, self.queue_size,
+        )
+
+    async def stop(self):
+        """Processa o que já está na fila e encerra o escritor."""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, op, *args):
+        """Enfileira ``op(session, *args)`` e aguarda o resultado após o commit do lote."""
+        future = asyncio.get_running_loop().create_future()
+        self._stats["submitted"] += 1
+        await self._queue.put((op, args, future, time.monotonic()))
+        return await future
+
+    async def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if item is None:
+                # Sinal de parada: recoloca para encerrar depois deste lote.
+                self._queue.put_nowait(None)
+                break
+            batch.append(item)
+        return batch
+
+    async def _run(self):
+        async with SessionLocal() as session:
+            while True:
+                first = await self._queue.get()
+                if first is None:
+                    return
+                batch = await self._collect(first)
+                try:
+                    await self._apply(session, batch)
+                except Exception:
+                    logger.exception("falha inesperada no pipeline de escrita")
+                    for _, _, future, _ in batch:
+                        if not future.done():
+                            future.set_exception(RuntimeError("Falha no pipeline de escrita."))
+                finally:
+                    session.expunge_all()
+
+    async def _apply(self, session, batch):
+        now = time.monotonic()
+        outcomes = []
+        await begin_write(session)
+        for op, args, future, enqueued_at in batch:
+            self._stats["queue_wait_seconds_sum"] += now - enqueued_at
+            try:
+                async with session.begin_nested():
+                    outcomes.append((future, True, await op(session, *args)))
+            except Exception as e:
+                outcomes.append((future, False, e))
+
+        started = time.monotonic()
+        try:
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            self._stats["commit_failures"] += 1
+            outcomes = [(future, False, e) for future, _, _ in outcomes]
+        self._stats["commit_seconds_sum"] += time.monotonic() - started
+        self._stats["batches"] += 1
+        self._stats["batch_size_max"] = max(self._stats["batch_size_max"], len(batch))
+
+        for future, ok, value in outcomes:
+            if future.done():
+                continue
+            if ok:
+                self._stats["ops_ok"] += 1
+                future.set_result(value)
+            else:
+                self._stats["ops_failed"] += 1
+                future.set_exception(value)
+
+    def stats(self):
+        """Retorna os contadores do pipeline (lotes, operações, tempos, fila)."""
+        return dict(
+            self._stats,
+            running=self.running,
+            queue_depth=self._queue.qsize() if self._queue else 0,
+        )
+
+
+write_pipeline = WritePipeline(WRITE_PIPELINE_BATCH_SIZE, WRITE_PIPELINE_LINGER_MS, WRITE_PIPELINE_QUEUE_SIZE)
+
+
+async def run_write(db, op, *args):
+    """Executa uma unidade de escrita ``op(session, *args)`` e confirma.
+
+    Com o pipeline ativo, a operação vai para o escritor único (group commit) e
+    ``db`` não é usada; caso contrário roda na sessão da requisição, com commit
+    próprio e rollback em caso de erro. ``op`` nunca deve fazer commit/rollback.
+    """
+    if write_pipeline.running:
+        return await write_pipeline.submit(op, *args)
+    try:
+        result = await op(db, *args)
+        await db.commit()
+        return result
+    except Exception:
+        await db.rollback()
+        raise
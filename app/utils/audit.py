@@ -0,0 +1,171 @@
+"""Diário de auditoria append-only, compartilhado pela API e pelas versões CLI.
+
+Cada registro é gravado como ``<tamanho:uint32><crc32:uint32><json utf-8>``
+(big-endian). Os registros ficam em memória e são gravados em lote por uma
+thread, com um único ``fsync`` por lote, ao atingir ``AUDIT_BATCH_SIZE``
+registros ou a cada ``AUDIT_FLUSH_INTERVAL`` segundos.
+
+Só usa a biblioteca padrão, para poder ser importado por ``system.py`` e
+``system_poo.py`` sem as dependências da API.
+
+Uso para reprocessar um diário::
+
+    python -m app.utils.audit audit.journal
+"""
+import atexit
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+AUDIT_JOURNAL_PATH = os.getenv("AUDIT_JOURNAL_PATH", "audit.journal")
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "256"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+
+_HEADER = struct.Struct(">II")
+
+
+def encode_record(record: dict):
+    """Serializa um registro no formato do diário (cabeçalho + JSON)."""
+    payload = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def replay(path):
+    """Lê os registros de um diário, na ordem em que foram gravados.
+
+    Um registro final incompleto (gravação interrompida) é ignorado.
+
+    Yields:
+        dict: Cada registro do diário.
+    Raises:
+        ValueError: Se algum registro completo tiver checksum inválido.
+    """
+    with open(path, "rb") as f:
+        offset = 0
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            length, checksum = _HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            if zlib.crc32(payload) != checksum:
+                raise ValueError(f"Registro corrompido no diário {path} (offset {offset}).")
+            yield json.loads(payload)
+            offset += _HEADER.size + length
+
+
+class AuditJournal:
+    """Diário com buffer em memória e gravação em lote.
+
+    ``append`` apenas serializa e enfileira o registro (microssegundos); a
+    gravação e o ``fsync`` acontecem na thread do diário.
+
+    Args:
+        path (str): Arquivo do diário (aberto em modo append).
+        batch_size (int): Quantidade de registros que dispara uma gravação.
+        flush_interval (float): Intervalo máximo, em segundos, entre gravações.
+    """
+
+    def __init__(self, path, batch_size: int = AUDIT_BATCH_SIZE, flush_interval: float = AUDIT_FLUSH_INTERVAL):
+        if batch_size < 1 or flush_interval <= 0:
+            raise ValueError("batch_size deve ser >= 1 e flush_interval deve ser positivo.")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._file = None
+        self._thread = None
+        self._closed = False
+
+    def append(self, event: str, **fields):
+        """Registra um evento no diário.
+
+        Args:
+            event (str): Tipo do evento (ex.: ``deposit``).
+            **fields: Dados do evento; valores não serializáveis viram ``str``.
+        """
+        data = encode_record({"ts": time.time(), "event": event, **fields})
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("O diário de auditoria já foi fechado.")
+            self._buffer.append(data)
+            pending = len(self._buffer)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-journal", daemon=True)
+                self._thread.start()
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def flush(self):
+        """Grava o que estiver no buffer, com um único ``fsync``."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._buffer = self._buffer, []
+            if not pending:
+                return
+            if self._file is None:
+                self._file = open(self.path, "ab")
+            self._file.write(b"".join(pending))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """Grava o buffer pendente e encerra a thread do diário."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal(path=None):
+    """Retorna o diário do arquivo informado (padrão: ``AUDIT_JOURNAL_PATH``), criando-o se preciso."""
+    path = os.fspath(path or AUDIT_JOURNAL_PATH)
+    with _journals_lock:
+        journal = _journals.get(path)
+        if journal is None:
+            journal = _journals[path] = AuditJournal(path)
+        return journal
+
+
+@atexit.register
+def close_journals():
+    """Grava e fecha todos os diários abertos (chamado também ao encerrar o processo)."""
+    with _journals_lock:
+        journals = list(_journals.values())
+        _journals.clear()
+    for journal in journals:
+        journal.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python -m app.utils.audit <arquivo.journal>")
+        sys.exit(2)
+    for entry in replay(sys.argv[1]):
+        print(json.dumps(entry, ensure_ascii=False))
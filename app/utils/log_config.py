@@ -0,0 +1,118 @@
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_FILE = os.getenv("LOG_FILE", "log.txt")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_ROTATION = os.getenv("LOG_ROTATION", "size")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")
+
+# ID de correlação da requisição atual (preenchido pelo middleware em app/main.py).
+request_id_var = ContextVar("request_id", default="-")
+
+_listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Anota cada registro com o ID da requisição em curso.
+
+    Precisa rodar no handler da fila (thread do chamador), onde o contexto da
+    requisição ainda está disponível.
+    """
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como uma linha JSON."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _StructuredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que mantém o traceback separado da mensagem."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _file_handler():
+    if LOG_ROTATION == "size":
+        return logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    if LOG_ROTATION == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", utc=True
+        )
+    raise ValueError(f"LOG_ROTATION inválido: {LOG_ROTATION} (use 'size' ou 'time').")
+
+
+def setup_logging():
+    """Configura o logging da aplicação uma única vez.
+
+    Os registros são apenas enfileirados no event loop; a escrita em disco
+    (JSON por linha, com rotação por tamanho ou tempo) fica a cargo de uma
+    thread ``QueueListener``.
+
+    Returns:
+        logging.handlers.QueueListener: O listener em execução.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    file_handler = _file_handler()
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(queue_handler)
+    # passlib registra tracebacks de detecção de versão do bcrypt em nível WARNING.
+    logging.getLogger("passlib").setLevel(logging.ERROR)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Esvazia a fila e encerra a thread de escrita."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,195 @@
+import bisect
+import time
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+_collectors = []
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        _registry.append(self)
+
+    def labels(self, *values):
+        """Retorna a série para os valores de label informados (criando-a se preciso)."""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    """Contador monotônico."""
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {child.value}"]
+
+
+class Gauge(Counter):
+    """Valor instantâneo que pode subir e descer."""
+    kind = "gauge"
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    """Histograma com buckets fixos (contagens cumulativas na exportação)."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def _render_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), list(child.counts)):
+            cumulative += count
+            le = bound if bound == "+Inf" else repr(float(bound))
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, [('le', le)])} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {child.sum}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+def register_collector(fn):
+    """Registra uma função chamada a cada exportação (ex.: para atualizar gauges derivados)."""
+    _collectors.append(fn)
+    return fn
+
+
+def render():
+    """Exporta todas as métricas no formato texto do Prometheus."""
+    for collector in _collectors:
+        collector()
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = Counter("http_requests_total", "Requisições HTTP atendidas.", ("router", "method", "status"))
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "Latência das requisições HTTP.", ("router",))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requisições HTTP em andamento.", ("router",))
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "Duração dos comandos SQL.", ("engine", "statement"))
+DB_POOL_CHECKOUT_WAIT = Histogram("db_pool_checkout_wait_seconds", "Espera para obter uma conexão do pool.", ("engine",))
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Conexões em uso no pool.", ("engine",))
+BCRYPT_LATENCY = Histogram(
+    "bcrypt_duration_seconds", "Duração das operações bcrypt no pool de hashing.", ("operation",),
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0),
+)
+BCRYPT_QUEUE_WAIT = Histogram("bcrypt_queue_wait_seconds", "Espera na fila do pool de hashing.", ("operation",))
+BCRYPT_REJECTED = Counter("bcrypt_rejected_total", "Chamadas recusadas por fila cheia no pool de hashing.")
+CACHE_REQUESTS = Counter("cache_requests_total", "Consultas aos caches da aplicação.", ("cache", "result"))
+CACHE_HIT_RATIO = Gauge("cache_hit_ratio", "Taxa de acerto dos caches da aplicação (desde o início do processo).", ("cache",))
+
+
+def router_label(path: str):
+    """Agrupa o caminho pelo prefixo do router (``/users``, ``/accounts``, ``/api``)."""
+    prefix = "/" + path.lstrip("/").split("/", 1)[0]
+    return prefix if prefix in ("/users", "/accounts", "/api") else "other"
+
+
+def instrument_engine(engine, label: str):
+    """Mede os comandos SQL e a espera no pool de uma engine async.
+
+    Os tempos de consulta vêm dos eventos ``before/after_cursor_execute``. A
+    espera no pool é o tempo da chamada pública ``Engine.connect()``, por onde
+    passam ``AsyncEngine.connect()`` e as sessões: é ali que a conexão é
+    retirada do pool (esperando, se ele estiver esgotado).
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_query_start"].pop()
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_LATENCY.labels(label, kind).observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        if context.connection is not None:
+            starts = context.connection.info.get("metrics_query_start")
+            if starts:
+                starts.pop()
+
+    connect = sync_engine.connect
+
+    def _timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(label).observe(time.perf_counter() - started)
+
+    sync_engine.connect = _timed_connect
+
+    @register_collector
+    def _pool_status():
+        # Lido a cada coleta: ``dispose()`` troca o pool da engine.
+        pool = sync_engine.pool
+        if hasattr(pool, "checkedout"):
+            DB_POOL_CHECKED_OUT.labels(label).set(pool.checkedout())
@@ -0,0 +1,47 @@
+"""Valores monetários: armazenados em centavos inteiros, expostos como ``Decimal``.
+
+O banco guarda saldos e valores em centavos (``BIGINT``); somas e
+comparações no SQL e nos serviços são exatas. A conversão acontece só na
+borda: ``to_cents`` na entrada (rejeita frações de centavo em vez de
+arredondar) e ``from_cents`` na saída.
+"""
+from decimal import Decimal, InvalidOperation
+
+CENT = Decimal("0.01")
+MAX_CENTS = 2**63 - 1
+
+
+def to_cents(value):
+    """Converte um valor em reais para centavos, sem arredondamento.
+
+    Args:
+        value: ``Decimal``, ``int``, ``str`` ou ``float`` (convertido pela sua
+            representação decimal mais curta, ex.: ``0.1`` vira ``"0.1"``).
+    Returns:
+        int: Valor em centavos.
+    Raises:
+        ValueError: Se o valor não for numérico, tiver frações de centavo ou
+            não couber em um BIGINT.
+    """
+    if isinstance(value, bool):
+        raise ValueError("Valor monetário inválido.")
+    try:
+        amount = value if isinstance(value, Decimal) else Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError("Valor monetário inválido.")
+    if not amount.is_finite():
+        raise ValueError("Valor monetário inválido.")
+    cents = amount.scaleb(2)
+    if cents != cents.to_integral_value():
+        raise ValueError("O valor deve ter no máximo 2 casas decimais.")
+    cents = int(cents)
+    if abs(cents) > MAX_CENTS:
+        raise ValueError("Valor monetário fora do limite suportado.")
+    return cents
+
+
+def from_cents(cents):
+    """Converte centavos para reais (``Decimal`` com duas casas); None continua None."""
+    if cents is None:
+        return None
+    return Decimal(int(cents)).scaleb(-2).quantize(CENT)
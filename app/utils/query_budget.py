@@ -0,0 +1,136 @@
+import logging
+import os
+import random
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+from dotenv import load_dotenv
+
+load_dotenv()
+
+APP_DEBUG = os.getenv("APP_DEBUG", "0").lower() in ("1", "true", "yes", "on")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1.0"))
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT", "0"))
+# Ex.: "GET /users/buscar/{user_id}=3;POST /api/deposito/{account_id}=3" (o BEGIN conta como comando)
+QUERY_BUDGETS = os.getenv("QUERY_BUDGETS", "")
+
+logger = logging.getLogger(__name__)
+
+_request_stats = ContextVar("request_query_stats", default=None)
+
+
+def parse_budgets(spec: str):
+    """Converte ``"MÉTODO /rota=n;..."`` em ``{("MÉTODO", "/rota"): n}``.
+
+    Raises:
+        ValueError: Se alguma entrada estiver mal formada.
+    """
+    budgets = {}
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        try:
+            route, limit = entry.rsplit("=", 1)
+            method, path = route.split(None, 1)
+            budgets[(method.upper(), path.strip())] = int(limit)
+        except ValueError:
+            raise ValueError(f"QUERY_BUDGETS inválido: {entry!r} (formato: 'GET /rota=n').")
+    return budgets
+
+
+_budgets = parse_budgets(QUERY_BUDGETS)
+
+
+class RequestQueryStats:
+    """Contagem de comandos SQL e tempo total de banco de uma requisição."""
+
+    __slots__ = ("scope", "count", "seconds")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.count = 0
+        self.seconds = 0.0
+
+    @property
+    def route(self):
+        route = self.scope.get("route")
+        return f"{self.scope.get('method', '')} {route.path if route else self.scope.get('path', '')}"
+
+
+def _params_shape(parameters, executemany: bool):
+    """Descreve os parâmetros sem expor valores (tipos e quantidade)."""
+    if executemany and isinstance(parameters, (list, tuple)):
+        first = parameters[0] if parameters else None
+        return {"rows": len(parameters), "row": _params_shape(first, False)}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def instrument_engine(engine):
+    """Conta os comandos SQL de cada requisição e registra amostras de consultas lentas.
+
+    Só contabiliza comandos executados no contexto da requisição (o pipeline
+    de escrita roda em uma task própria e fica de fora).
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_budget_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_budget_start"].pop()
+        stats = _request_stats.get()
+        if stats is None:
+            return
+        stats.count += 1
+        stats.seconds += elapsed
+        if elapsed * 1000 >= SLOW_QUERY_MS and random.random() < SLOW_QUERY_SAMPLE_RATE:
+            logger.warning(
+                "Consulta lenta (%.1f ms) em %s: %s | parâmetros=%s",
+                elapsed * 1000, stats.route, " ".join(statement.split())[:2000],
+                _params_shape(parameters, executemany),
+            )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        if context.connection is not None:
+            starts = context.connection.info.get("query_budget_start")
+            if starts:
+                starts.pop()
+
+
+def begin_request(scope):
+    """Começa a contagem de comandos SQL da requisição.
+
+    Deve ser chamada na task que executa a requisição (o ``ContextVar`` é
+    herdado pelo endpoint e pelas dependências).
+
+    Returns:
+        tuple: As estatísticas da requisição e o token para ``end_request``.
+    """
+    stats = RequestQueryStats(scope)
+    return stats, _request_stats.set(stats)
+
+
+def debug_headers(stats):
+    """Cabeçalhos ``X-DB-Query-Count`` e ``X-DB-Time-Ms`` (só com ``APP_DEBUG``)."""
+    if not APP_DEBUG:
+        return []
+    return [("X-DB-Query-Count", str(stats.count)), ("X-DB-Time-Ms", f"{stats.seconds * 1000:.2f}")]
+
+
+def end_request(stats, token):
+    """Encerra a contagem e avisa no log se a rota passou do orçamento configurado."""
+    _request_stats.reset(token)
+    route = stats.scope.get("route")
+    key = (stats.scope.get("method", ""), route.path if route else stats.scope.get("path", ""))
+    budget = _budgets.get(key, QUERY_BUDGET_DEFAULT)
+    if budget and stats.count > budget:
+        logger.warning(
+            "Orçamento de consultas excedido em %s %s: %s comandos (orçamento %s), %.1f ms no banco",
+            key[0], key[1], stats.count, budget, stats.seconds * 1000,
+        )
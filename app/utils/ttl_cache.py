@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Cache LRU limitado em tamanho, com expiração por item.
+
+    Thread-safe e sem I/O: seguro para ser usado direto no event loop.
+
+    Args:
+        maxsize (int): Quantidade máxima de itens; o menos usado é descartado.
+        ttl (float): Tempo de vida padrão dos itens, em segundos.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        if maxsize < 1 or ttl <= 0:
+            raise ValueError("maxsize deve ser >= 1 e ttl deve ser positivo.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Retorna o valor associado à chave, ou ``default`` se ausente/expirado."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value, ttl: float = None):
+        """Armazena o valor; ``ttl`` sobrescreve o tempo de vida padrão."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Remove a chave (invalidação explícita) e retorna o valor anterior."""
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Retorna acertos, falhas, tamanho atual e taxa de acerto."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
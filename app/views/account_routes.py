@@ -1,18 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.controllers.auth import get_current_user
 from app.models.database import get_db
-from app.services.bank_service import create_account
+from app.services.bank_service import create_account, set_balance_slots
+from app.utils.money import from_cents
 import logging
 
-# Configura o log básico (opcional, mas útil para depuração)
-logging.basicConfig(
-    filename="log.txt",
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
+logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/accounts", tags=["Contas"])
+router = APIRouter(prefix="/accounts", tags=["Contas"], dependencies=[Depends(get_current_user)])
 
 @router.post("/create", status_code=status.HTTP_201_CREATED)
 async def create_new_account(user_id: int, db: AsyncSession = Depends(get_db)):
@@ -29,19 +25,19 @@ async def create_new_account(user_id: int, db: AsyncSession = Depends(get_db)):
 
     try:
         account = await create_account(db, user_id)
-        logging.info(f"Conta criada com sucesso: user_id={user_id}, account_id={account.id}")
+        logger.info("Conta criada com sucesso: user_id=%s, account_id=%s", user_id, account.id)
 
         return {
             "message": "Conta criada com sucesso!",
             "data": {
                 "account_id": account.id,
                 "user_id": account.user_id,
-                "saldo_inicial": account.balance
+                "saldo_inicial": from_cents(account.balance_cents)
             }
         }
 
     except ValueError as e:
-        logging.warning(f"Erro de validação ao criar conta (user_id={user_id}): {e}")
+        logger.warning("Erro de validação ao criar conta (user_id=%s): %s", user_id, e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -51,8 +47,23 @@ async def create_new_account(user_id: int, db: AsyncSession = Depends(get_db)):
         raise  # Re-levanta exceções HTTP já tratadas
 
     except Exception as e:
-        logging.error(f"Erro inesperado ao criar conta (user_id={user_id}): {e}")
+        logger.exception("Erro inesperado ao criar conta (user_id=%s): %s", user_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ocorreu um erro interno ao criar a conta. Tente novamente mais tarde."
         )
+
+@router.post("/{account_id}/fragmentar")
+async def set_account_balance_slots(account_id: int, slots: int, db: AsyncSession = Depends(get_db)):
+    """
+    Liga ou desliga o saldo fragmentado de uma conta com muitos depósitos simultâneos.
+    
+    - **account_id**: ID da conta.
+    - **slots**: Quantidade de parcelas do saldo (0 desliga e consolida o saldo).
+    """
+    try:
+        balance = await set_balance_slots(db, account_id, slots)
+        logger.info("Saldo fragmentado configurado: account_id=%s, slots=%s", account_id, slots)
+        return {"message": "Configuração do saldo atualizada.", "data": {"account_id": account_id, "slots": slots, "saldo": balance}}
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
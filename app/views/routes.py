@@ -1,51 +1,318 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models import get_db
-from app.services.bank_service import deposit, withdraw, get_statement
+from app.controllers.auth import get_current_user
+from app.models import get_db, get_read_db
+from app.models.database import ReadSessionLocal
+from app.services.bank_service import (
+    BATCH_MAX_OPERATIONS,
+    STATEMENT_DEFAULT_LIMIT,
+    STATEMENT_MAX_LIMIT,
+    apply_batch,
+    deposit,
+    transfer,
+    withdraw,
+    get_balance_at,
+    get_statement,
+    encode_cursor,
+    iter_statement,
+)
+from app.services.idempotency import IdempotencyKeyReused, IdempotentRequest
+from app.services.rollups import summary
+from app.utils.money import from_cents
+
+EXPORT_FIELDS = ("id", "account_id", "type", "amount", "created_at")
+EXPORT_CHUNK_ROWS = 500
+
+router = APIRouter(prefix="/api", tags=["Banco"], dependencies=[Depends(get_current_user)])
+
+
+class OperacaoLote(BaseModel):
+    """Item de um lote de operações: `type` é `deposit` ou `withdraw`."""
+    account_id: int
+    type: str
+    amount: Decimal
+
+
+def _idempotent_request(user: dict, key: Optional[str], *operation):
+    return IdempotentRequest(user["user_id"], key, *operation) if key else None
+
+
+def _replayed_headers(idempotency):
+    """Cabeçalho que sinaliza uma resposta devolvida de uma execução anterior."""
+    return {"Idempotent-Replayed": "true"} if idempotency is not None and idempotency.replayed else None
+
+
+def _mark_replayed(response: Response, idempotency):
+    response.headers.update(_replayed_headers(idempotency) or {})
 
-router = APIRouter(prefix="/api", tags=["Banco"])
 
 @router.post("/deposito/{account_id}")
-async def make_deposit(account_id: int, amount: float, db: AsyncSession = Depends(get_db)):
+async def make_deposit(
+    account_id: int,
+    amount: Decimal,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
     """
     Realiza um depósito em uma conta específica.
     
     - **account_id**: ID da conta onde o depósito será realizado.
     - **amount**: Valor do depósito (deve ser positivo).
+    - **Idempotency-Key** (cabeçalho opcional): repetições com a mesma chave devolvem o resultado da primeira execução.
     """
+    idempotency = _idempotent_request(user, idempotency_key, "deposit", account_id, amount)
     try:
-        new_balance = await deposit(db, account_id, amount)
+        new_balance = await deposit(db, account_id, amount, idempotency=idempotency)
+        _mark_replayed(response, idempotency)
         return {"message": "Depósito realizado com sucesso!", "new_balance": new_balance}
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
     except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e), headers=_replayed_headers(idempotency))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro interno do servidor.")
 
 @router.post("/saque/{account_id}")
-async def make_withdrawal(account_id: int, amount: float, db: AsyncSession = Depends(get_db)):
+async def make_withdrawal(
+    account_id: int,
+    amount: Decimal,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
     """
     Realiza um saque em uma conta específica.
     
     - **account_id**: ID da conta onde o saque será realizado.
     - **amount**: Valor do saque (deve ser positivo e menor ou igual ao saldo disponível).
+    - **Idempotency-Key** (cabeçalho opcional): repetições com a mesma chave devolvem o resultado da primeira execução.
     """
+    idempotency = _idempotent_request(user, idempotency_key, "withdraw", account_id, amount)
     try:
-        new_balance = await withdraw(db, account_id, amount)
+        new_balance = await withdraw(db, account_id, amount, idempotency=idempotency)
+        _mark_replayed(response, idempotency)
         return {"message": "Saque realizado com sucesso!", "new_balance": new_balance}
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e), headers=_replayed_headers(idempotency))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro interno do servidor.")
+
+@router.post("/transferencia")
+async def make_transfer(
+    origem: int,
+    destino: int,
+    amount: Decimal,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Transfere um valor entre duas contas em uma única transação.
+    
+    - **origem**: ID da conta debitada.
+    - **destino**: ID da conta creditada.
+    - **amount**: Valor da transferência (deve ser positivo e menor ou igual ao saldo da origem).
+    - **Idempotency-Key** (cabeçalho opcional): repetições com a mesma chave devolvem o resultado da primeira execução.
+    """
+    idempotency = _idempotent_request(user, idempotency_key, "transfer", origem, destino, amount)
+    try:
+        balances = await transfer(db, origem, destino, amount, idempotency=idempotency)
+        _mark_replayed(response, idempotency)
+        return {"message": "Transferência realizada com sucesso!", **balances}
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e), headers=_replayed_headers(idempotency))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro interno do servidor.")
+
+@router.post("/lote")
+async def make_batch(operations: list[OperacaoLote], db: AsyncSession = Depends(get_db)):
+    """
+    Aplica um lote de depósitos e saques (de uma ou várias contas) com um único commit.
+    
+    - **corpo**: lista JSON de `{"account_id", "type", "amount"}`, com `type` igual a `deposit` ou `withdraw`.
+    
+    Retorna um resultado por item; itens recusados não impedem a aplicação dos demais.
+    """
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"O lote pode ter no máximo {BATCH_MAX_OPERATIONS} operações.",
+        )
+    try:
+        results = await apply_batch(db, [op.model_dump() for op in operations])
+        applied = sum(1 for item in results if item["status"] == "ok")
+        return {"message": "Lote processado.", "applied": applied, "rejected": len(results) - applied, "results": results}
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro interno do servidor.")
 
 @router.get("/extrato/{account_id}")
-async def get_account_statement(account_id: int, db: AsyncSession = Depends(get_db)):
+async def get_account_statement(
+    account_id: int,
+    limit: int = Query(STATEMENT_DEFAULT_LIMIT, ge=1, le=STATEMENT_MAX_LIMIT),
+    after: Optional[str] = None,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
     """
-    Obtém o extrato de transações de uma conta específica.
+    Obtém o extrato de transações de uma conta específica, paginado por cursor.
     
     - **account_id**: ID da conta cujo extrato será obtido.
+    - **limit**: Quantidade máxima de transações por página.
+    - **after**: Cursor (`next_cursor`) devolvido pela página anterior.
+    - **inicio** / **fim**: Intervalo de datas opcional (`fim` exclusivo).
     """
     try:
-        transactions = await get_statement(db, account_id)
-        return {"account_id": account_id, "transactions": transactions}
+        transactions = await get_statement(db, account_id, limit=limit, after=after, start=inicio, end=fim)
+        next_cursor = encode_cursor(transactions[-1]) if len(transactions) == limit else None
+        return {
+            "account_id": account_id,
+            "transactions": [_transaction_row(transaction) for transaction in transactions],
+            "next_cursor": next_cursor,
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro interno do servidor.")
+
+@router.get("/saldo/{account_id}")
+async def get_account_balance_at(
+    account_id: int,
+    em: datetime,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Saldo da conta em um instante passado, a partir do checkpoint de saldo
+    mais próximo (só as transações posteriores a ele são somadas).
+
+    - **account_id**: ID da conta.
+    - **em**: Instante da consulta (ISO 8601; sem fuso, é tratado como UTC). Inclui as transações desse instante.
+    """
+    try:
+        return await get_balance_at(db, account_id, em)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro interno do servidor.")
+
+@router.get("/resumo/{account_id}")
+async def get_account_summary(
+    account_id: int,
+    granularidade: Literal["mes", "dia"] = "mes",
+    inicio: Optional[date] = None,
+    fim: Optional[date] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Resumo do movimento da conta por mês ou por dia (depósitos, saques,
+    transferências, fluxo líquido e saldo de fechamento), lido dos rollups.
+
+    - **account_id**: ID da conta.
+    - **granularidade**: `mes` (padrão) ou `dia`.
+    - **inicio** / **fim**: Intervalo de datas opcional (`fim` exclusivo; no mensal, meses inteiros que começam antes de `fim`).
+    """
+    try:
+        return await summary(db, account_id, start=inicio, end=fim, granularity=granularidade)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro interno do servidor.")
+
+
+def _transaction_row(transaction):
+    return {
+        "id": transaction.id,
+        "account_id": transaction.account_id,
+        "type": transaction.type,
+        "amount": from_cents(transaction.amount_cents),
+        "created_at": transaction.created_at,
+    }
+
+
+def _export_row(transaction):
+    row = _transaction_row(transaction)
+    # Texto com duas casas ("10.50"): o valor exato em reais, sem passar por float.
+    row["amount"] = str(row["amount"])
+    row["created_at"] = row["created_at"].isoformat() if row["created_at"] else None
+    return row
+
+
+async def _export_chunks(account_id: int, formato: str, inicio, fim):
+    """Gera o extrato serializado em blocos de texto.
+
+    Abre a própria sessão: o corpo é enviado depois que as dependências da rota
+    já foram finalizadas.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS) if formato == "csv" else None
+    if writer:
+        writer.writeheader()
+    rows = 0
+    async with ReadSessionLocal() as db:
+        async for transaction in iter_statement(db, account_id, start=inicio, end=fim):
+            row = _export_row(transaction)
+            if writer:
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(row, ensure_ascii=False) + "\n")
+            rows += 1
+            if rows % EXPORT_CHUNK_ROWS == 0:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # wbits=31: formato gzip
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@router.get("/extrato/{account_id}/exportar")
+async def export_account_statement(
+    account_id: int,
+    formato: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+):
+    """
+    Exporta o histórico completo de uma conta em streaming (NDJSON ou CSV).
+    
+    - **account_id**: ID da conta cujo extrato será exportado.
+    - **formato**: `ndjson` (padrão) ou `csv`.
+    - **gzip**: Comprime a resposta com gzip.
+    - **inicio** / **fim**: Intervalo de datas opcional (`fim` exclusivo).
+    """
+    media_type = "application/x-ndjson" if formato == "ndjson" else "text/csv"
+    filename = f"extrato_{account_id}.{formato}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    body = _export_chunks(account_id, formato, inicio, fim)
+    if gzip:
+        body = _gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=media_type, headers=headers)
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Form
+from typing import Optional
+from fastapi import APIRouter, Depends, File, HTTPException, status, Form, UploadFile
+from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.controllers.auth import get_current_user, oauth2_scheme
 from app.models.database import get_db
-from app.models.user import User
-from app.services.auth_service import create_user
+from app.services.auth_service import authenticate_user, create_access_token, create_user, revoke_token
+from app.services.password_pool import PasswordPoolBusy
+from app.services.profile_cache import get_user_profile
+from app.services.user_import import USER_IMPORT_BATCH_SIZE, detect_format, import_users
 from sqlalchemy.exc import IntegrityError
 
 router = APIRouter(prefix="/users", tags=["Usuários"])
@@ -29,13 +34,75 @@ async def register(
         raise HTTPException(status_code=422, detail=str(e))
     except IntegrityError:
         raise HTTPException(status_code=400, detail="Nome de usuário já existe.")
+    except PasswordPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
-@router.get("/buscar/{user_id}", summary="Obter informações do usuário pelo ID", status_code=status.HTTP_200_OK)
-async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
-    """Obtém informações do usuário pelo ID."""
-    user = await db.get(User, user_id)
+@router.post("/login", summary="Autenticar e obter um token de acesso")
+async def login(form: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    """
+    Autentica o usuário e emite um token JWT.
+    - **username**: nome de usuário.
+    - **password**: senha.
+    """
+    try:
+        user = await authenticate_user(db, form.username, form.password)
+    except PasswordPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuário ou senha inválidos.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    token = create_access_token({"sub": str(user.id), "username": user.username})
+    return {"access_token": token, "token_type": "bearer"}
+
+@router.post("/logout", summary="Revogar o token de acesso atual")
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    _user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Revoga o token usado na requisição até a sua expiração (vale para todos os workers)."""
+    await revoke_token(db, token)
+    return {"message": "Token revogado com sucesso."}
+
+@router.get("/buscar/{user_id}", summary="Obter informações do usuário pelo ID", status_code=status.HTTP_200_OK)
+async def get_user(user_id: int):
+    """Obtém informações do usuário pelo ID (via cache de perfis; só consulta o banco em cache miss)."""
+    profile = await get_user_profile(user_id)
+    if not profile:
         raise HTTPException(status_code=404, detail="Usuário não encontrado.")
-    return {"username": user.username, "user_id": user.id, "accounts": [account.id for account in user.accounts]}
+    return {"username": profile["username"], "user_id": profile["user_id"], "accounts": profile["accounts"]}
+
+@router.post("/importar", summary="Importar usuários em massa (CSV ou NDJSON)")
+async def import_users_file(
+    arquivo: UploadFile = File(...),
+    formato: Optional[str] = Form(None),
+    import_id: Optional[str] = Form(None, max_length=64),
+    lote: int = Form(USER_IMPORT_BATCH_SIZE),
+    db: AsyncSession = Depends(get_db),
+    _user: dict = Depends(get_current_user),
+):
+    """
+    Importa usuários de um arquivo CSV (colunas `username,password`) ou NDJSON.
+    - **formato**: `csv` ou `ndjson` (padrão: pela extensão do arquivo).
+    - **import_id**: identificador para retomar a importação (padrão: hash do conteúdo).
+    - **lote**: registros por transação.
+
+    Registros inválidos ou duplicados são listados em `errors` sem interromper a
+    importação. Reenviar o mesmo arquivo retoma do último lote gravado.
+    """
+    try:
+        return await import_users(
+            db,
+            arquivo.file,
+            fmt=formato or detect_format(arquivo.filename),
+            import_id=import_id,
+            source=arquivo.filename,
+            batch_size=lote,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
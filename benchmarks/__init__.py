@@ -0,0 +1 @@
+"""Benchmarks da API e da camada de serviços (fora do fluxo da aplicação)."""
@@ -0,0 +1,338 @@
+"""Benchmark de carga HTTP da API, executado no próprio processo.
+
+Sobe ``app.main:app`` contra um arquivo SQLite temporário (com startup e
+shutdown da aplicação) e dispara uma carga mista sobre ``/users/register``,
+``/accounts/create``, ``/api/deposito``, ``/api/saque`` e ``/api/extrato``
+por um cliente ASGI (httpx), sem rede. Com ``--url`` a mesma carga é enviada
+para um servidor já em execução (ex.: uvicorn local).
+
+Exemplos::
+
+    python -m benchmarks.http_load --requests 2000 --concurrency 16
+    python -m benchmarks.http_load --save-baseline benchmarks/baseline.json
+    python -m benchmarks.http_load --compare benchmarks/baseline.json --threshold 0.2
+
+Com ``--compare``, o processo termina com código 1 se a vazão total cair ou
+o p95 de alguma operação subir mais que ``--threshold`` (fração) em relação
+à baseline.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+DEFAULT_MIX = "deposito=40,saque=25,extrato=25,register=5,create_account=5"
+PASSWORD = "SenhaBench123"
+
+
+def parse_mix(spec: str):
+    """Converte ``"deposito=40,saque=25,..."`` em ``{"deposito": 40, ...}``.
+
+    Raises:
+        ValueError: Se a operação não existir ou o peso não for um inteiro positivo.
+    """
+    mix = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, weight = entry.partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"Operação desconhecida no mix: {name} (use {', '.join(OPERATIONS)}).")
+        if not weight.isdigit() or int(weight) <= 0:
+            raise ValueError(f"Peso inválido para {name}: {weight!r}.")
+        mix[name] = int(weight)
+    if not mix:
+        raise ValueError("O mix de operações está vazio.")
+    return mix
+
+
+def percentile(sorted_values, fraction: float):
+    """Percentil pelo método nearest-rank (``sorted_values`` já ordenado)."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors: int, elapsed: float):
+    """Resume as latências (em segundos) de uma operação: contagem, vazão e percentis em ms."""
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+    }
+
+
+class LoadState:
+    """Usuários, tokens e contas criados durante o benchmark."""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.headers = []
+        self.user_ids = []
+        self.account_ids = []
+        # Usuários ainda sem conta (cada usuário só pode ter uma conta).
+        self.free_user_ids = []
+        self.next_user = 0
+
+    def new_username(self):
+        self.next_user += 1
+        return f"bench_{os.getpid()}_{self.next_user}"
+
+    def auth(self):
+        return self.rng.choice(self.headers)
+
+
+async def _register(client, state: LoadState):
+    response = await client.post("/users/register", data={"username": state.new_username(), "password": PASSWORD})
+    if response.status_code == 201:
+        state.free_user_ids.append(response.json()["user_id"])
+    return response
+
+
+async def _create_account(client, state: LoadState):
+    # Sem usuário livre, a requisição é recusada (400) e conta como erro.
+    user_id = state.free_user_ids.pop() if state.free_user_ids else state.rng.choice(state.user_ids)
+    response = await client.post(f"/accounts/create?user_id={user_id}", headers=state.auth())
+    if response.status_code == 201:
+        state.account_ids.append(response.json()["data"]["account_id"])
+    return response
+
+
+async def _deposit(client, state: LoadState):
+    account_id = state.rng.choice(state.account_ids)
+    amount = round(state.rng.uniform(1, 500), 2)
+    return await client.post(f"/api/deposito/{account_id}?amount={amount}", headers=state.auth())
+
+
+async def _withdraw(client, state: LoadState):
+    account_id = state.rng.choice(state.account_ids)
+    amount = round(state.rng.uniform(1, 100), 2)
+    return await client.post(f"/api/saque/{account_id}?amount={amount}", headers=state.auth())
+
+
+async def _statement(client, state: LoadState):
+    account_id = state.rng.choice(state.account_ids)
+    return await client.get(f"/api/extrato/{account_id}?limit=50", headers=state.auth())
+
+
+OPERATIONS = {
+    "register": _register,
+    "create_account": _create_account,
+    "deposito": _deposit,
+    "saque": _withdraw,
+    "extrato": _statement,
+}
+
+# Respostas esperadas que não contam como erro (ex.: saque com saldo insuficiente).
+EXPECTED_STATUS = {"saque": {200, 400}}
+
+
+async def prepare(client, state: LoadState, users: int, spare_users: int, initial_balance: float):
+    """Cria os usuários, tokens e contas usados pela carga (fora da medição).
+
+    ``spare_users`` usuários extras ficam sem conta, para as operações
+    ``create_account`` da carga.
+    """
+    for _ in range(users):
+        username = state.new_username()
+        response = await client.post("/users/register", data={"username": username, "password": PASSWORD})
+        response.raise_for_status()
+        state.user_ids.append(response.json()["user_id"])
+        response = await client.post("/users/login", data={"username": username, "password": PASSWORD})
+        response.raise_for_status()
+        state.headers.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+    for user_id in state.user_ids:
+        response = await client.post(f"/accounts/create?user_id={user_id}", headers=state.headers[0])
+        response.raise_for_status()
+        account_id = response.json()["data"]["account_id"]
+        state.account_ids.append(account_id)
+        if initial_balance:
+            response = await client.post(
+                f"/api/deposito/{account_id}?amount={initial_balance}", headers=state.headers[0]
+            )
+            response.raise_for_status()
+    for response in await asyncio.gather(*(_register(client, state) for _ in range(spare_users))):
+        response.raise_for_status()
+
+
+async def run_load(client, state: LoadState, mix: dict, total_requests: int, concurrency: int):
+    """Executa ``total_requests`` operações sorteadas pelo mix com ``concurrency`` workers.
+
+    Returns:
+        dict: Resumo por operação e total (vazão e latências p50/p95/p99).
+    """
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    plan = state.rng.choices(names, weights=weights, k=total_requests)
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    position = 0
+
+    async def worker():
+        nonlocal position
+        while position < len(plan):
+            name = plan[position]
+            position += 1
+            started = time.perf_counter()
+            try:
+                response = await OPERATIONS[name](client, state)
+                ok = response.status_code in EXPECTED_STATUS.get(name, range(200, 300))
+            except httpx.HTTPError:
+                ok = False
+            latencies[name].append(time.perf_counter() - started)
+            if not ok:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    results = {name: summarize(latencies[name], errors[name], elapsed) for name in names if latencies[name]}
+    every = [value for values in latencies.values() for value in values]
+    results["total"] = summarize(every, sum(errors.values()), elapsed)
+    results["total"]["elapsed_s"] = round(elapsed, 3)
+    return results
+
+
+async def benchmark(args):
+    """Prepara os dados, executa a carga e devolve o relatório."""
+    state = LoadState(random.Random(args.seed))
+    mix = parse_mix(args.mix)
+    # Usuários sem conta suficientes para os create_account esperados da carga.
+    spare_users = math.ceil(args.requests * mix.get("create_account", 0) / sum(mix.values()) * 1.5)
+    timeout = httpx.Timeout(args.timeout)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout) as client:
+            await prepare(client, state, args.users, spare_users, args.initial_balance)
+            results = await run_load(client, state, mix, args.requests, args.concurrency)
+        target = args.url
+    else:
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as client:
+                await prepare(client, state, args.users, spare_users, args.initial_balance)
+                results = await run_load(client, state, mix, args.requests, args.concurrency)
+        target = "asgi"
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "target": target,
+            "db_profile": os.getenv("DB_PROFILE", "safe"),
+            "write_pipeline": os.getenv("WRITE_PIPELINE", "0"),
+            "python": platform.python_version(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "users": args.users,
+            "mix": mix,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float):
+    """Compara o relatório com a baseline.
+
+    Returns:
+        list[str]: Regressões encontradas (vazia se nenhuma passou do limite).
+    """
+    regressions = []
+    current, previous = report["results"], baseline["results"]
+    base_rps = previous["total"]["throughput_rps"]
+    if base_rps and current["total"]["throughput_rps"] < base_rps * (1 - threshold):
+        regressions.append(
+            f"vazão total: {current['total']['throughput_rps']} req/s (baseline {base_rps} req/s)"
+        )
+    for name, stats in current.items():
+        base_p95 = previous.get(name, {}).get("p95_ms")
+        if base_p95 and stats["p95_ms"] > base_p95 * (1 + threshold):
+            regressions.append(f"{name}: p95 {stats['p95_ms']} ms (baseline {base_p95} ms)")
+    return regressions
+
+
+def print_report(report: dict, baseline=None):
+    header = f"{'operação':<16}{'n':>8}{'erros':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in report["results"].items():
+        line = (
+            f"{name:<16}{stats['count']:>8}{stats['errors']:>8}{stats['throughput_rps']:>10}"
+            f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+        )
+        base = (baseline or {}).get("results", {}).get(name)
+        if base and base.get("p95_ms"):
+            line += f"   (p95 {stats['p95_ms'] / base['p95_ms'] - 1:+.0%})"
+        print(line)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark de carga HTTP da API bancária.")
+    parser.add_argument("--requests", type=int, default=2000, help="Total de requisições medidas.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requisições simultâneas.")
+    parser.add_argument("--users", type=int, default=20, help="Usuários (com uma conta cada) criados antes da carga.")
+    parser.add_argument("--initial-balance", type=float, default=10000.0, help="Depósito inicial em cada conta.")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Pesos das operações (padrão: {DEFAULT_MIX}).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout de cada requisição (s).")
+    parser.add_argument("--url", help="Usa um servidor em execução em vez da aplicação no processo.")
+    parser.add_argument("--save-baseline", metavar="ARQUIVO", help="Grava o relatório em JSON.")
+    parser.add_argument("--compare", metavar="ARQUIVO", help="Compara com uma baseline JSON.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Regressão tolerada (fração, padrão 0.2).")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.requests < 1 or args.concurrency < 1 or args.users < 1:
+        raise SystemExit("--requests, --concurrency e --users devem ser >= 1.")
+
+    if not args.url:
+        # A configuração da aplicação é lida na importação: prepara o ambiente antes.
+        workdir = tempfile.mkdtemp(prefix="bank-bench-")
+        os.environ["DB_URL"] = "sqlite+aiosqlite:///" + os.path.join(workdir, "bench.db")
+        os.environ.setdefault("LOG_FILE", os.path.join(workdir, "api.log"))
+        os.environ.setdefault("AUDIT_JOURNAL_PATH", os.path.join(workdir, "audit.journal"))
+        os.environ.setdefault("SECRET_KEY", "bench-secret")
+        print(f"Banco temporário: {workdir}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    report = asyncio.run(benchmark(args))
+    print_report(report, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Baseline gravada em {args.save_baseline}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressões acima de {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"- {regression}")
+            return 1
+        print(f"\nSem regressões acima de {args.threshold:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
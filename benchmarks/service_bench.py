@@ -0,0 +1,320 @@
+"""Microbenchmarks da camada de serviços (``bank_service`` e ``auth_service``).
+
+Mede ``create_account``, ``deposit``, ``withdraw``, ``get_statement``,
+``create_user`` e ``hash_password`` isoladamente (sem HTTP), em SQLite em
+memória e em arquivo, para contas com históricos de tamanhos diferentes e
+para cada perfil de engine (``ENGINE_PROFILES``).
+
+Para separar o custo de cada camada, duas operações de referência executam o
+mesmo trabalho direto no driver (``exec_driver_sql``, sem ORM nem serviço):
+
+- ``sql_deposit``: o UPDATE ... RETURNING e o INSERT do depósito;
+- ``sql_statement``: o SELECT da primeira página do extrato.
+
+Serviço muito acima da referência aponta para o ORM/serviço; referência que
+piora com o histórico aponta para o esquema (índices); diferença entre
+perfis aponta para o driver/PRAGMAs.
+
+Exemplos::
+
+    python -m benchmarks.service_bench
+    python -m benchmarks.service_bench --backends file --profiles safe,balanced,fast --history 1,1000,100000
+    python -m benchmarks.service_bench --json resultados.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.http_load import percentile
+
+BACKENDS = ("memory", "file")
+DEFAULT_HISTORY = "1,1000,100000"
+SEED_CHUNK = 5000
+STATEMENT_PAGE = 100
+
+
+def _parse_list(spec: str, cast=str):
+    return [cast(item.strip()) for item in spec.split(",") if item.strip()]
+
+
+def summarize(samples):
+    """Resume as amostras (em segundos): média, p50 e p95 em µs e operações por segundo."""
+    ordered = sorted(samples)
+    mean = sum(ordered) / len(ordered)
+    return {
+        "n": len(ordered),
+        "mean_us": round(mean * 1e6, 1),
+        "p50_us": round(percentile(ordered, 0.50) * 1e6, 1),
+        "p95_us": round(percentile(ordered, 0.95) * 1e6, 1),
+        "ops_s": round(1 / mean, 1) if mean else 0.0,
+    }
+
+
+async def measure(fn, repeat: int, warmup: int):
+    """Executa ``fn(i)`` ``warmup + repeat`` vezes e devolve os tempos das ``repeat`` últimas."""
+    for i in range(warmup):
+        await fn(i)
+    samples = []
+    for i in range(warmup, warmup + repeat):
+        started = time.perf_counter()
+        await fn(i)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def seed(engine, history: int, spare_users: int):
+    """Cria o usuário/conta medidos, ``history`` transações e usuários sem conta.
+
+    Returns:
+        int: ID da conta com histórico.
+    """
+    from sqlalchemy import insert
+    from app.models import Account, Base, Transaction, User
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(
+            insert(User),
+            [{"username": f"seed_{i}", "password": "x"} for i in range(spare_users + 1)],
+        )
+        account_id = (await conn.execute(
+            insert(Account).returning(Account.id), [{"user_id": spare_users + 1, "balance_cents": 10**14}]
+        )).scalar_one()
+
+    base = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=365)
+    for offset in range(0, history, SEED_CHUNK):
+        rows = [
+            {
+                "account_id": account_id,
+                "type": "deposit" if i % 2 else "withdraw",
+                "amount_cents": 1000,
+                "created_at": base + timedelta(seconds=i),
+            }
+            for i in range(offset, min(history, offset + SEED_CHUNK))
+        ]
+        async with engine.begin() as conn:
+            await conn.execute(insert(Transaction), rows)
+    return account_id
+
+
+async def statement_plan(engine, account_id: int):
+    """Plano de execução do SELECT do extrato (para conferir o uso do índice)."""
+    async with engine.connect() as conn:
+        rows = (await conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM transactions WHERE account_id = ? "
+            "ORDER BY created_at, id LIMIT ?",
+            (account_id, STATEMENT_PAGE),
+        )).all()
+    return " | ".join(row[-1] for row in rows)
+
+
+async def bench_database(url: str, profile: str, history: int, args):
+    """Mede as operações de banco para uma combinação de backend, perfil e histórico."""
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import sessionmaker
+    from app.models.database import ReadSessionLocal, create_engine_from_settings, load_engine_settings
+    from app.services.auth_service import create_user
+    from app.services.bank_service import create_account, deposit, get_statement, withdraw
+
+    engine = create_engine_from_settings(url, load_engine_settings(profile))
+    Session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    # Os serviços que leem fora da transação de escrita usam o pool de leitura global.
+    ReadSessionLocal.configure(bind=engine)
+    total = args.warmup + args.repeat
+    results = {}
+    try:
+        account_id = await seed(engine, history, spare_users=total)
+
+        async def run_create_account(i):
+            async with Session() as db:
+                await create_account(db, i + 1)
+
+        async def run_deposit(i):
+            async with Session() as db:
+                await deposit(db, account_id, 1.0)
+
+        async def run_withdraw(i):
+            async with Session() as db:
+                await withdraw(db, account_id, 1.0)
+
+        async def run_statement(i):
+            async with Session() as db:
+                await get_statement(db, account_id, limit=STATEMENT_PAGE)
+
+        async def run_sql_deposit(i):
+            async with engine.begin() as conn:
+                await conn.exec_driver_sql(
+                    "UPDATE accounts SET balance_cents = balance_cents + ? WHERE id = ? RETURNING balance_cents", (100, account_id)
+                )
+                await conn.exec_driver_sql(
+                    "INSERT INTO transactions (account_id, type, amount_cents, created_at) VALUES (?, 'deposit', ?, ?)",
+                    (account_id, 100, datetime.now(timezone.utc).replace(tzinfo=None)),
+                )
+
+        async def run_sql_statement(i):
+            async with engine.connect() as conn:
+                (await conn.exec_driver_sql(
+                    "SELECT id, account_id, type, amount_cents, created_at FROM transactions "
+                    "WHERE account_id = ? ORDER BY created_at, id LIMIT ?",
+                    (account_id, STATEMENT_PAGE),
+                )).all()
+
+        async def run_create_user(i):
+            async with Session() as db:
+                await create_user(db, f"bench_{i}", "SenhaBench123")
+
+        operations = {
+            "create_account": (run_create_account, args.repeat),
+            "deposit": (run_deposit, args.repeat),
+            "withdraw": (run_withdraw, args.repeat),
+            "get_statement": (run_statement, args.repeat),
+            "sql_deposit": (run_sql_deposit, args.repeat),
+            "sql_statement": (run_sql_statement, args.repeat),
+            "create_user": (run_create_user, args.auth_repeat),
+        }
+        for name in args.operations:
+            if name in operations:
+                fn, repeat = operations[name]
+                results[name] = summarize(await measure(fn, repeat, min(args.warmup, repeat)))
+        plan = await statement_plan(engine, account_id)
+    finally:
+        await engine.dispose()
+    return results, plan
+
+
+def bench_hash_password(repeat: int):
+    """Mede ``hash_password`` (bcrypt síncrono, independe do banco)."""
+    from app.services.auth_service import hash_password
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        hash_password("SenhaBench123")
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def print_table(rows):
+    header = f"{'backend':<8}{'perfil':<10}{'histórico':>10}  {'operação':<16}{'n':>6}{'média µs':>12}{'p50 µs':>12}{'p95 µs':>12}{'ops/s':>10}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        s = row["stats"]
+        history = "-" if row["history"] is None else row["history"]
+        print(
+            f"{row['backend']:<8}{row['profile']:<10}{history:>10}  {row['operation']:<16}"
+            f"{s['n']:>6}{s['mean_us']:>12}{s['p50_us']:>12}{s['p95_us']:>12}{s['ops_s']:>10}"
+        )
+
+
+def print_scaling(rows):
+    """Mostra quanto o p50 de cada operação cresce do menor para o maior histórico."""
+    groups = {}
+    for row in rows:
+        if row["history"] is not None:
+            groups.setdefault((row["backend"], row["profile"], row["operation"]), []).append(row)
+    if not groups:
+        return
+    print("\nEscala com o histórico (p50 no maior / p50 no menor):")
+    for (backend, profile, operation), items in groups.items():
+        items.sort(key=lambda row: row["history"])
+        first, last = items[0], items[-1]
+        if first is last or not first["stats"]["p50_us"]:
+            continue
+        ratio = last["stats"]["p50_us"] / first["stats"]["p50_us"]
+        print(f"  {backend:<8}{profile:<10}{operation:<16}{first['history']:>8} -> {last['history']:<8} x{ratio:.2f}")
+
+
+def build_parser():
+    operations = "create_account,deposit,withdraw,get_statement,sql_deposit,sql_statement,create_user,hash_password"
+    parser = argparse.ArgumentParser(description="Microbenchmarks dos serviços bancário e de autenticação.")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="memory e/ou file.")
+    parser.add_argument("--profiles", default="safe", help="Perfis de engine separados por vírgula (ex.: legacy,safe,fast).")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help=f"Transações por conta (padrão: {DEFAULT_HISTORY}).")
+    parser.add_argument("--operations", default=operations, help="Operações medidas.")
+    parser.add_argument("--repeat", type=int, default=200, help="Execuções medidas por operação de banco.")
+    parser.add_argument("--auth-repeat", type=int, default=10, help="Execuções de create_user e hash_password (bcrypt).")
+    parser.add_argument("--warmup", type=int, default=10, help="Execuções descartadas antes da medição.")
+    parser.add_argument("--json", metavar="ARQUIVO", help="Grava os resultados em JSON.")
+    return parser
+
+
+async def run(args, workdir: str):
+    rows = []
+    plans = {}
+    for backend in args.backends:
+        if backend not in BACKENDS:
+            raise SystemExit(f"Backend inválido: {backend} (use {', '.join(BACKENDS)}).")
+        for profile in args.profiles:
+            for history in args.history:
+                if backend == "memory":
+                    url = "sqlite+aiosqlite:///:memory:"
+                else:
+                    url = "sqlite+aiosqlite:///" + os.path.join(workdir, f"{profile}_{history}.db")
+                print(f"... {backend} / {profile} / histórico {history}", file=sys.stderr)
+                results, plan = await bench_database(url, profile, history, args)
+                plans[f"{backend}/{profile}/{history}"] = plan
+                for operation, stats in results.items():
+                    rows.append({
+                        "backend": backend, "profile": profile, "history": history,
+                        "operation": operation, "stats": stats,
+                    })
+    if "hash_password" in args.operations:
+        rows.append({
+            "backend": "-", "profile": "-", "history": None,
+            "operation": "hash_password", "stats": bench_hash_password(args.auth_repeat),
+        })
+    return rows, plans
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.backends = _parse_list(args.backends)
+    args.profiles = _parse_list(args.profiles)
+    args.history = _parse_list(args.history, int)
+    args.operations = _parse_list(args.operations)
+    if args.repeat < 1 or args.auth_repeat < 1 or args.warmup < 0 or any(h < 1 for h in args.history):
+        raise SystemExit("--repeat, --auth-repeat e os tamanhos de histórico devem ser >= 1.")
+
+    # Os serviços gravam auditoria ao importar a configuração: mantém tudo no diretório temporário.
+    workdir = tempfile.mkdtemp(prefix="bank-service-bench-")
+    os.environ.setdefault("AUDIT_JOURNAL_PATH", os.path.join(workdir, "audit.journal"))
+    os.environ.setdefault("DB_URL", "sqlite+aiosqlite:///" + os.path.join(workdir, "unused.db"))
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    from app.models.database import ENGINE_PROFILES
+
+    for profile in args.profiles:
+        if profile not in ENGINE_PROFILES:
+            raise SystemExit(f"Perfil inválido: {profile} (opções: {', '.join(ENGINE_PROFILES)}).")
+
+    rows, plans = asyncio.run(run(args, workdir))
+    print_table(rows)
+    print_scaling(rows)
+    print("\nPlano do extrato: " + next(iter(plans.values()), "-"))
+
+    if args.json:
+        report = {
+            "meta": {
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "repeat": args.repeat,
+                "auth_repeat": args.auth_repeat,
+                "statement_plans": plans,
+            },
+            "results": rows,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Resultados gravados em {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
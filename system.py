@@ -5,6 +5,8 @@ import inspect
 from datetime import datetime
 from pathlib import Path
 
+from app.utils.audit import get_journal
+
 ROOT_PATH = Path(__file__).parent
 
 
@@ -32,8 +34,8 @@ def menu():
 
 
 def log_transacao(func):
-    """Decorador que registra transações em um arquivo de log.
-    Logs a data, hora, nome da função, argumentos e valor retornado.
+    """Decorador que registra transações no diário de auditoria (audit.journal).
+    Registra a data, hora, nome da função, argumentos e valor retornado.
     Outputs:
     resultado - Valor retornado pela função decorada.
     """
@@ -41,11 +43,9 @@ def log_transacao(func):
     def envelope(*args, **kwargs):
         resultado = func(*args, **kwargs)
         data_hora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(ROOT_PATH / "log.txt", "a") as arquivo:
-            arquivo.write(
-                f"[{data_hora}] Função '{func.__name__}' chamada com args: {args}, kwargs: {kwargs}. "
-                f"Retornou {resultado}\n"
-            )
+        get_journal(ROOT_PATH / "audit.journal").append(
+            "cli", funcao=func.__name__, args=repr(args), kwargs=repr(kwargs), resultado=repr(resultado)
+        )
 
         print(f"{data_hora}: {func.__name__.upper()}")
         return resultado
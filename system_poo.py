@@ -4,6 +4,8 @@ import functools
 from datetime import datetime
 from pathlib import Path
 
+from app.utils.audit import get_journal
+
 
 ROOT_PATH = Path(__file__).parent
 
@@ -13,17 +15,16 @@ def clear_screen():
 
 
 def log_transacao(func):
-    """Decorador simples que registra chamadas de função/método em log.txt."""
+    """Decorador simples que registra chamadas de função/método no diário de auditoria."""
 
     @functools.wraps(func)
     def envelope(*args, **kwargs):
         resultado = func(*args, **kwargs)
         data_hora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         try:
-            with open(ROOT_PATH / "log.txt", "a", encoding="utf-8") as arquivo:
-                arquivo.write(
-                    f"[{data_hora}] {func.__name__} called with args={args}, kwargs={kwargs} -> {resultado}\n"
-                )
+            get_journal(ROOT_PATH / "audit.journal").append(
+                "cli", funcao=func.__name__, args=repr(args), kwargs=repr(kwargs), resultado=repr(resultado)
+            )
         except Exception:
             # não deixar o logging quebrar a execução
             pass
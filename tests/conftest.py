@@ -0,0 +1,100 @@
+"""Configuração comum dos testes.
+
+Cada sessão de testes usa um banco SQLite temporário (em arquivo, para exercitar
+WAL e o pool de conexões) e um único event loop: as conexões do pool ficam
+presas ao loop em que foram abertas. Os testes são funções síncronas que
+executam as corrotinas com a fixture ``run``.
+"""
+import asyncio
+import itertools
+import os
+import tempfile
+
+import httpx
+import pytest
+
+_TMP_DIR = tempfile.mkdtemp(prefix="bank-tests-")
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{os.path.join(_TMP_DIR, 'bank.db')}"
+os.environ.pop("DB_READ_URL", None)
+os.environ["LOG_FILE"] = os.path.join(_TMP_DIR, "log.txt")
+os.environ["AUDIT_JOURNAL_PATH"] = os.path.join(_TMP_DIR, "audit.journal")
+os.environ.setdefault("SECRET_KEY", "chave-de-teste")
+
+from app.main import _create_missing_indexes, _normalize_legacy_timestamps, app  # noqa: E402
+from app.models import Account, User  # noqa: E402
+from app.models.database import Base, SessionLocal, engine, read_engine  # noqa: E402
+from app.services import auth_service, balance_shards, idempotency, profile_cache, rollups  # noqa: E402
+
+_usernames = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def event_loop_for_tests():
+    loop = asyncio.new_event_loop()
+    yield loop
+    for pool_engine in {engine, read_engine}:
+        loop.run_until_complete(pool_engine.dispose())
+    loop.close()
+
+
+@pytest.fixture
+def run(event_loop_for_tests):
+    """Executa uma corrotina no event loop da sessão e devolve o resultado."""
+    return event_loop_for_tests.run_until_complete
+
+
+async def _reset_database():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
+        await conn.run_sync(_normalize_legacy_timestamps)
+    await rollups.ensure_rollups()
+
+
+@pytest.fixture(autouse=True)
+def clean_state(run):
+    """Banco vazio e caches de processo limpos a cada teste."""
+    run(_reset_database())
+    for cache in (auth_service.token_cache, balance_shards.slot_counts, idempotency.outcome_cache):
+        cache.clear()
+    auth_service.revoked_tokens.clear()
+    profile_cache.backend = profile_cache.create_backend("local")
+    yield
+
+
+@pytest.fixture
+def make_account(run):
+    """Cria um usuário com uma conta e devolve o ID da conta (o usuário tem o mesmo ID).
+
+    O usuário é inserido direto (sem bcrypt); ``balance`` é o saldo inicial em centavos.
+    """
+    async def _make(balance_cents: int = 0):
+        async with SessionLocal() as db:
+            user = User(username=f"cliente{next(_usernames)}", password="x")
+            db.add(user)
+            await db.flush()
+            account = Account(user_id=user.id, balance_cents=balance_cents)
+            db.add(account)
+            await db.commit()
+            return account.id
+
+    return lambda balance_cents=0: run(_make(balance_cents))
+
+
+@pytest.fixture
+def api(run):
+    """Faz uma requisição à aplicação (ASGI, no loop da sessão) e devolve a resposta.
+
+    ``user_id`` autentica a chamada com um token emitido para esse usuário.
+    """
+    async def _request(method, url, user_id=None, **kwargs):
+        headers = kwargs.pop("headers", {})
+        if user_id is not None:
+            token = auth_service.create_access_token({"sub": str(user_id), "username": f"cliente{user_id}"})
+            headers["Authorization"] = f"Bearer {token}"
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            return await client.request(method, url, headers=headers, **kwargs)
+
+    return lambda method, url, user_id=None, **kwargs: run(_request(method, url, user_id, **kwargs))
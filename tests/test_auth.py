@@ -0,0 +1,17 @@
+from app.services import auth_service
+
+
+def test_register_login_and_logout_revokes_token_everywhere(api):
+    assert api("POST", "/users/register", data={"username": "ana", "password": "segredo"}).status_code == 201
+    assert api("POST", "/users/login", data={"username": "ana", "password": "errada"}).status_code == 401
+    token = api("POST", "/users/login", data={"username": "ana", "password": "segredo"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert api("GET", "/api/extrato/1", headers=dict(headers)).status_code != 401
+    assert api("POST", "/users/logout", headers=dict(headers)).status_code == 200
+    assert api("GET", "/api/extrato/1", headers=dict(headers)).status_code == 401
+
+    # Outro worker: sem o cache e a revogação locais, a tabela revoked_tokens ainda barra o token.
+    auth_service.token_cache.clear()
+    auth_service.revoked_tokens.clear()
+    assert api("GET", "/api/extrato/1", headers=dict(headers)).status_code == 401
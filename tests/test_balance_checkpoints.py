@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import select, text
+
+from app.main import _normalize_legacy_timestamps
+from app.models import BalanceCheckpoint
+from app.models.database import SessionLocal, engine
+from app.services import balance_checkpoints
+from app.services.bank_service import deposit, get_balance_at, withdraw
+
+
+async def _legacy_history(account_id, count, created_at):
+    async with engine.begin() as conn:
+        for _ in range(count):
+            await conn.execute(
+                text(
+                    "INSERT INTO transactions (account_id, type, amount_cents, created_at) "
+                    "VALUES (:account_id, 'deposit', 100, :created_at)"
+                ),
+                {"account_id": account_id, "created_at": created_at},
+            )
+        await conn.run_sync(_normalize_legacy_timestamps)
+
+
+async def _rebuild(account_id, every):
+    async with SessionLocal() as db:
+        written = await balance_checkpoints.rebuild_account(db, account_id, every)
+        await db.commit()
+        return written
+
+
+async def _balance_at(account_id, at):
+    async with SessionLocal() as db:
+        return await get_balance_at(db, account_id, at)
+
+
+def test_balance_at_sums_same_second_rows_after_a_legacy_checkpoint(run, make_account):
+    account_id = make_account(300)
+    run(_legacy_history(account_id, 3, "2024-01-01 10:00:00"))
+    assert run(_rebuild(account_id, every=2)) == 1
+
+    result = run(_balance_at(account_id, datetime(2024, 1, 1, 10, 0, 0)))
+    assert result["checkpoint_transaction_id"] == 2
+    assert result["replayed_transactions"] == 1
+    assert result["balance"] == Decimal("3.00")
+
+
+def test_live_checkpoints_continue_the_ledger(run, make_account, monkeypatch):
+    monkeypatch.setattr(balance_checkpoints, "BALANCE_CHECKPOINT_EVERY", 2)
+    account_id = make_account(300)
+    run(_legacy_history(account_id, 3, "2024-01-01 10:00:00"))
+    run(_rebuild(account_id, every=2))
+
+    async def _operations():
+        async with SessionLocal() as db:
+            await deposit(db, account_id, Decimal("10"))
+            await withdraw(db, account_id, Decimal("2.50"))
+            await deposit(db, account_id, Decimal("0.01"))
+
+    run(_operations())
+
+    async def _checkpoints():
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(BalanceCheckpoint.transaction_id, BalanceCheckpoint.balance)
+                .filter(BalanceCheckpoint.account_id == account_id)
+                .order_by(BalanceCheckpoint.transaction_id)
+            )
+            return result.all()
+
+    # O checkpoint do id 4 parte do reconstruído no id 2 e inclui o id 3, do mesmo segundo.
+    assert run(_checkpoints()) == [(2, 200), (4, 1300), (6, 1051)]
+    now = run(_balance_at(account_id, datetime.now(timezone.utc)))
+    assert now["balance"] == Decimal("10.51")
+    assert now["checkpoint_transaction_id"] == 6
+    assert now["replayed_transactions"] == 0
@@ -0,0 +1,78 @@
+import asyncio
+from decimal import Decimal
+
+from sqlalchemy import select
+
+from app.models import Account, AccountBalanceSlot
+from app.models.database import SessionLocal
+from app.services.bank_service import deposit, set_balance_slots, withdraw
+
+
+async def _in_session(op, *args):
+    async with SessionLocal() as db:
+        try:
+            return await op(db, *args)
+        except ValueError as e:
+            return str(e)
+
+
+async def _balances(account_id):
+    async with SessionLocal() as db:
+        base = await db.scalar(select(Account.balance_cents).filter(Account.id == account_id))
+        slots = (await db.execute(
+            select(AccountBalanceSlot.balance)
+            .filter(AccountBalanceSlot.account_id == account_id)
+            .order_by(AccountBalanceSlot.slot)
+        )).scalars().all()
+        return base, slots
+
+
+def test_deposits_spread_over_slots_and_withdrawals_consolidate(run, make_account):
+    account_id = make_account(100)
+    assert run(_in_session(set_balance_slots, account_id, 4)) == Decimal("1.00")
+
+    async def _deposits():
+        return await asyncio.gather(*(_in_session(deposit, account_id, Decimal("1.00")) for _ in range(8)))
+
+    run(_deposits())
+    base, slots = run(_balances(account_id))
+    assert base == 100 and sum(slots) == 800 and len(slots) == 4 and all(slots)
+
+    # O saldo base (1,00) basta: as parcelas não são tocadas, mas o saldo devolvido é o total.
+    assert run(_in_session(withdraw, account_id, Decimal("0.50"))) == Decimal("8.50")
+    assert run(_balances(account_id)) == (50, slots)
+    # Saldo base insuficiente: as parcelas são consolidadas antes do débito.
+    assert run(_in_session(withdraw, account_id, Decimal("3.00"))) == Decimal("5.50")
+    assert run(_balances(account_id)) == (550, [0, 0, 0, 0])
+    assert run(_in_session(withdraw, account_id, Decimal("6.00"))) == "Saldo insuficiente."
+
+
+def test_concurrent_deposits_and_withdrawals_keep_the_total(run, make_account):
+    account_id = make_account()
+    run(_in_session(set_balance_slots, account_id, 3))
+
+    kinds = []
+    for index in range(30):
+        kinds.append(deposit)
+        if index % 3 == 2:
+            kinds.append(withdraw)
+
+    async def _mixed():
+        amounts = {deposit: Decimal("1.00"), withdraw: Decimal("2.00")}
+        return await asyncio.gather(*(_in_session(kind, account_id, amounts[kind]) for kind in kinds))
+
+    results = run(_mixed())
+    withdrawals = sum(1 for kind, result in zip(kinds, results) if kind is withdraw and isinstance(result, Decimal))
+    base, slots = run(_balances(account_id))
+    assert base + sum(slots) == 3000 - 200 * withdrawals
+    assert base >= 0 and min(slots) >= 0
+
+
+def test_turning_slots_off_moves_everything_back(run, make_account):
+    account_id = make_account()
+    run(_in_session(set_balance_slots, account_id, 2))
+    for _ in range(3):
+        run(_in_session(deposit, account_id, Decimal("0.10")))
+    assert run(_in_session(set_balance_slots, account_id, 0)) == Decimal("0.30")
+    assert run(_balances(account_id)) == (30, [])
+    assert run(_in_session(set_balance_slots, account_id, 99)).startswith("A quantidade de parcelas")
@@ -0,0 +1,78 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models import Account, Transaction
+from app.models.database import SessionLocal
+from app.services.bank_service import deposit, withdraw
+
+
+async def _withdraw_in_own_session(account_id, amount):
+    async with SessionLocal() as db:
+        try:
+            return await withdraw(db, account_id, Decimal(amount))
+        except ValueError as e:
+            return str(e)
+
+
+async def _ledger(account_id):
+    async with SessionLocal() as db:
+        balance = await db.scalar(select(Account.balance_cents).filter(Account.id == account_id))
+        withdrawals = await db.scalar(
+            select(func.count()).select_from(Transaction)
+            .filter(Transaction.account_id == account_id, Transaction.type == "withdraw")
+        )
+        return balance, withdrawals
+
+
+def test_concurrent_withdrawals_never_overdraw(run, make_account):
+    account_id = make_account(1000)
+
+    async def _race():
+        return await asyncio.gather(*(_withdraw_in_own_session(account_id, "1.00") for _ in range(20)))
+
+    results = run(_race())
+    assert sum(1 for result in results if isinstance(result, Decimal)) == 10
+    assert results.count("Saldo insuficiente.") == 10
+    assert run(_ledger(account_id)) == (0, 10)
+
+
+def test_deposit_and_withdraw_validate_amounts(run, make_account):
+    account_id = make_account()
+
+    async def _operations():
+        async with SessionLocal() as db:
+            assert await deposit(db, account_id, Decimal("0.10")) == Decimal("0.10")
+            assert await deposit(db, account_id, Decimal("0.20")) == Decimal("0.30")
+            for amount in ("0", "-1", "0.001"):
+                with pytest.raises(ValueError):
+                    await deposit(db, account_id, Decimal(amount))
+            with pytest.raises(ValueError, match="Saldo insuficiente"):
+                await withdraw(db, account_id, Decimal("0.31"))
+            with pytest.raises(ValueError, match="Conta não encontrada"):
+                await withdraw(db, 999, Decimal("1"))
+            return await withdraw(db, account_id, Decimal("0.30"))
+
+    assert run(_operations()) == Decimal("0.00")
+
+
+def test_balance_update_is_atomic_under_concurrent_deposits(run, make_account):
+    account_id = make_account()
+
+    async def _deposit():
+        async with SessionLocal() as db:
+            await deposit(db, account_id, Decimal("0.01"))
+
+    async def _race():
+        await asyncio.gather(*(_deposit() for _ in range(50)))
+
+    run(_race())
+
+    async def _balance():
+        async with SessionLocal() as db:
+            return await db.scalar(select(Account.balance_cents).filter(Account.id == account_id))
+
+    # Nenhum lost update: os 50 incrementos são feitos pelo banco.
+    assert run(_balance()) == 50
@@ -0,0 +1,81 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models import Account, IdempotencyKey, Transaction
+from app.models.database import SessionLocal
+from app.services import idempotency
+from app.services.bank_service import deposit, withdraw
+from app.services.idempotency import IdempotencyKeyReused, IdempotentRequest
+
+
+async def _deposit_with_key(account_id, amount, key):
+    request = IdempotentRequest(1, key, "deposit", account_id, Decimal(amount))
+    async with SessionLocal() as db:
+        return await deposit(db, account_id, Decimal(amount), idempotency=request), request.replayed
+
+
+async def _account_state(account_id):
+    async with SessionLocal() as db:
+        balance = await db.scalar(select(Account.balance_cents).filter(Account.id == account_id))
+        count = await db.scalar(select(func.count()).select_from(Transaction).filter(Transaction.account_id == account_id))
+        return balance, count
+
+
+def test_concurrent_retries_apply_the_operation_once(run, make_account):
+    account_id = make_account()
+
+    async def _race():
+        return await asyncio.gather(*(_deposit_with_key(account_id, "10.00", "mesma-chave") for _ in range(8)))
+
+    results = run(_race())
+    assert {balance for balance, _ in results} == {Decimal("10.00")}
+    assert [replayed for _, replayed in results].count(False) == 1
+    assert run(_account_state(account_id)) == (1000, 1)
+
+
+def test_reused_key_with_other_parameters_is_rejected(run, make_account):
+    account_id = make_account()
+    run(_deposit_with_key(account_id, "10.00", "chave"))
+    assert run(_deposit_with_key(account_id, "10", "chave")) == (Decimal("10.00"), True)
+    with pytest.raises(IdempotencyKeyReused):
+        run(_deposit_with_key(account_id, "10.01", "chave"))
+    # Sem o cache local (outro worker), a tabela dá a mesma resposta.
+    idempotency.outcome_cache.clear()
+    with pytest.raises(IdempotencyKeyReused):
+        run(_deposit_with_key(account_id, "10.01", "chave"))
+    assert run(_account_state(account_id)) == (1000, 1)
+
+
+def test_business_errors_are_replayed(run, make_account):
+    account_id = make_account()
+
+    async def _withdraw_with_key():
+        request = IdempotentRequest(1, "saque", "withdraw", account_id, Decimal("5"))
+        async with SessionLocal() as db:
+            return await withdraw(db, account_id, Decimal("5"), idempotency=request)
+
+    with pytest.raises(ValueError, match="Saldo insuficiente"):
+        run(_withdraw_with_key())
+    run(_deposit_with_key(account_id, "20", "deposito"))
+    # A repetição devolve o erro gravado, mesmo que agora houvesse saldo.
+    with pytest.raises(ValueError, match="Saldo insuficiente"):
+        run(_withdraw_with_key())
+    assert run(_account_state(account_id)) == (2000, 1)
+
+
+def test_purge_removes_expired_keys_in_batches(run, make_account):
+    account_id = make_account()
+    for index in range(5):
+        run(_deposit_with_key(account_id, "1", f"chave-{index}"))
+
+    assert run(idempotency.purge_expired(ttl=3600)) == 0
+    assert run(idempotency.purge_expired(ttl=-1, batch_size=2)) == 5
+
+    async def _remaining():
+        async with SessionLocal() as db:
+            return await db.scalar(select(func.count()).select_from(IdempotencyKey))
+
+    assert run(_remaining()) == 0
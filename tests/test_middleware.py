@@ -0,0 +1,40 @@
+import logging
+
+from app.utils import metrics, query_budget
+
+
+def test_request_id_is_echoed_or_generated(api, make_account):
+    account_id = make_account()
+    response = api("GET", f"/api/extrato/{account_id}", account_id, headers={"X-Request-ID": "abc123"})
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"] == "abc123"
+
+    generated = api("GET", f"/api/extrato/{account_id}", account_id)
+    assert len(generated.headers["X-Request-ID"]) == 32
+
+
+def test_route_metrics_count_status_and_in_flight(api, make_account):
+    account_id = make_account()
+    ok = metrics.HTTP_REQUESTS.labels("/api", "POST", "200")
+    bad = metrics.HTTP_REQUESTS.labels("/api", "POST", "400")
+    before = ok.value, bad.value
+
+    api("POST", f"/api/deposito/{account_id}", account_id, params={"amount": "1.00"})
+    api("POST", f"/api/deposito/{account_id}", account_id, params={"amount": "1.001"})
+
+    assert (ok.value, bad.value) == (before[0] + 1, before[1] + 1)
+    assert metrics.HTTP_IN_FLIGHT.labels("/api").value == 0
+
+
+def test_query_budget_headers_and_warning(api, make_account, monkeypatch, caplog):
+    account_id = make_account()
+    monkeypatch.setattr(query_budget, "APP_DEBUG", True)
+    monkeypatch.setattr(query_budget, "_budgets", {("POST", "/api/deposito/{account_id}"): 1})
+
+    with caplog.at_level(logging.WARNING, logger=query_budget.__name__):
+        response = api("POST", f"/api/deposito/{account_id}", account_id, params={"amount": "1.00"})
+
+    assert response.status_code == 200
+    assert int(response.headers["X-DB-Query-Count"]) > 1
+    assert float(response.headers["X-DB-Time-Ms"]) > 0
+    assert "Orçamento de consultas excedido em POST /api/deposito/{account_id}" in caplog.text
@@ -0,0 +1,29 @@
+import csv
+import io
+import json
+from decimal import Decimal
+
+from app.services.idempotency import IdempotentRequest
+
+
+def test_fingerprint_uses_exact_cents():
+    def fingerprint(amount):
+        return IdempotentRequest(1, "chave", "deposit", 1, Decimal(amount)).fingerprint
+
+    assert fingerprint("10") == fingerprint("10.00")
+    assert fingerprint("100000000000000.01") != fingerprint("100000000000000.02")
+    # Valores que a operação recusa ainda geram uma impressão digital.
+    assert fingerprint("1.005") != fingerprint("1.00")
+
+
+def test_statement_export_keeps_exact_amounts(api, make_account):
+    account_id = make_account()
+    for amount in ("0.10", "0.20", "92233720368547.58"):
+        assert api("POST", f"/api/deposito/{account_id}", account_id, params={"amount": amount}).status_code == 200
+
+    ndjson = api("GET", f"/api/extrato/{account_id}/exportar", account_id)
+    assert [json.loads(line)["amount"] for line in ndjson.text.splitlines()] == ["0.10", "0.20", "92233720368547.58"]
+
+    exported = api("GET", f"/api/extrato/{account_id}/exportar", account_id, params={"formato": "csv"})
+    rows = list(csv.DictReader(io.StringIO(exported.text)))
+    assert [row["amount"] for row in rows] == ["0.10", "0.20", "92233720368547.58"]
@@ -0,0 +1,98 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+
+from app.main import _create_missing_indexes, _normalize_legacy_timestamps
+from app.models.database import Base, SessionLocal, engine
+from app.services import money_migration, rollups
+from app.services.bank_service import deposit, get_statement, withdraw
+from app.services.balance_shards import total_balance
+
+# Esquema criado pela versão com valores em Float (reais).
+LEGACY_SCHEMA = (
+    "CREATE TABLE users (id INTEGER NOT NULL PRIMARY KEY, username VARCHAR, password VARCHAR NOT NULL)",
+    "CREATE TABLE accounts (id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER REFERENCES users (id), balance FLOAT)",
+    "CREATE TABLE transactions (id INTEGER NOT NULL PRIMARY KEY, account_id INTEGER REFERENCES accounts (id), "
+    "type VARCHAR, amount FLOAT, created_at DATETIME DEFAULT (CURRENT_TIMESTAMP))",
+)
+
+
+async def _legacy_database():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        for ddl in LEGACY_SCHEMA:
+            await conn.exec_driver_sql(ddl)
+        await conn.exec_driver_sql("INSERT INTO users (id, username, password) VALUES (1, 'antigo', 'x')")
+        # 0.1 + 0.2 em Float: o saldo gravado é 0.30000000000000004.
+        await conn.exec_driver_sql("INSERT INTO accounts (id, user_id, balance) VALUES (1, 1, ?)", (0.1 + 0.2,))
+        for amount in (0.1, 0.2):
+            await conn.exec_driver_sql(
+                "INSERT INTO transactions (account_id, type, amount) VALUES (1, 'deposit', ?)", (amount,)
+            )
+
+
+async def _old_app_deposit(amount):
+    # Escrita da versão antiga durante a migração: as triggers preenchem os centavos.
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("UPDATE accounts SET balance = balance + ? WHERE id = 1", (amount,))
+        await conn.exec_driver_sql(
+            "INSERT INTO transactions (account_id, type, amount) VALUES (1, 'deposit', ?)", (amount,)
+        )
+
+
+async def _startup():
+    async with engine.begin() as conn:
+        await conn.run_sync(money_migration.check_migrated)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
+        await conn.run_sync(_normalize_legacy_timestamps)
+    await rollups.ensure_rollups()
+
+
+def test_startup_refuses_unmigrated_database(run):
+    run(_legacy_database())
+    with pytest.raises(RuntimeError, match="python -m app.services.money_migration"):
+        run(_startup())
+
+    run(money_migration.add_columns())
+    with pytest.raises(RuntimeError, match="money_migration finalize"):
+        run(_startup())
+
+
+def test_online_migration_keeps_balances_exact(run):
+    run(_legacy_database())
+    assert run(money_migration.add_columns()) == ["accounts", "transactions"]
+    run(_old_app_deposit(0.7))
+
+    with pytest.raises(ValueError, match="backfill"):
+        run(money_migration.finalize())
+    report = run(money_migration.status())
+    assert report["tables"]["transactions"] == {"rows": 3, "missing": 2}
+
+    converted = run(money_migration.backfill(chunk=1, pause=0, progress=lambda message: None))
+    assert converted == {"accounts": 0, "transactions": 2}
+    assert run(money_migration.finalize()) is True
+    assert run(money_migration.finalize()) is False
+    run(_startup())
+
+    async def _use_new_app():
+        async with SessionLocal() as db:
+            assert await total_balance(db, 1) == 100
+            assert await withdraw(db, 1, Decimal("0.30")) == Decimal("0.70")
+            assert await deposit(db, 1, Decimal("0.05")) == Decimal("0.75")
+        async with SessionLocal() as db:
+            statement = await get_statement(db, 1, limit=10)
+            return [(t.type, t.amount_cents) for t in statement]
+
+    assert run(_use_new_app()) == [
+        ("deposit", 10), ("deposit", 20), ("deposit", 70), ("withdraw", 30), ("deposit", 5),
+    ]
+
+    async def _summary():
+        async with SessionLocal() as db:
+            return await rollups.summary(db, 1)
+
+    summary = run(_summary())
+    assert summary["closing_balance"] == Decimal("0.75")
+    assert summary["totals"]["deposits"] == Decimal("1.05")
@@ -0,0 +1,123 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+
+from app.models import Account, AccountBalanceSlot, Transaction
+from app.models.database import SessionLocal
+from app.services import postings, rollups
+from app.services.bank_service import deposit, set_balance_slots
+
+
+async def _post(kind, **kwargs):
+    async with SessionLocal() as db:
+        return await postings.post(db, kind, **kwargs)
+
+
+async def _balances():
+    async with SessionLocal() as db:
+        rows = await db.execute(select(Account.id, Account.balance_cents).order_by(Account.id))
+        return dict(rows.all())
+
+
+async def _postings(kind):
+    async with SessionLocal() as db:
+        rows = await db.execute(
+            select(Transaction.account_id, Transaction.amount_cents).filter(Transaction.type == kind).order_by(Transaction.id)
+        )
+        return rows.all()
+
+
+async def _summary(account_id):
+    async with SessionLocal() as db:
+        return await rollups.summary(db, account_id, granularity="dia")
+
+
+def test_fee_charges_only_accounts_with_enough_balance(run, make_account):
+    rich, exact, poor, empty = make_account(2000), make_account(1290), make_account(1289), make_account()
+
+    report = run(_post("fee", amount="12.90", run_id="fee-teste", chunk_size=2))
+    assert report["status"] == "done" and report["chunks"] == 2
+    assert report["postings"] == 2 and report["posted"] == Decimal("25.80")
+    assert run(_balances()) == {rich: 710, exact: 0, poor: 1289, empty: 0}
+    assert run(_postings("fee")) == [(rich, 1290), (exact, 1290)]
+
+    # Repetir a execução concluída não cobra de novo.
+    again = run(_post("fee", amount="12.90", run_id="fee-teste", chunk_size=2))
+    assert again["status"] == "done" and again["postings"] == 2 and again["resumed_from"] is None
+    assert len(run(_postings("fee"))) == 2
+    with pytest.raises(ValueError, match="outro valor"):
+        run(_post("fee", amount="9.90", run_id="fee-teste"))
+
+
+def test_interest_is_truncated_and_only_for_positive_balances(run, make_account):
+    first, small, empty = make_account(10001), make_account(199), make_account()
+
+    report = run(_post("interest", rate="0.005", run_id="juros-teste"))
+    # 100,01 x 0,5% = 0,500050 -> 0,50; 1,99 x 0,5% = 0,00995 -> nada.
+    assert report["postings"] == 1 and report["posted"] == Decimal("0.50")
+    assert run(_balances()) == {first: 10051, small: 199, empty: 0}
+
+    summary = run(_summary(first))
+    assert summary["totals"]["interest"] == Decimal("0.50") and summary["totals"]["transactions"] == 1
+
+
+def test_invalid_parameters_are_rejected(run):
+    with pytest.raises(ValueError, match="tarifa"):
+        run(_post("fee", amount="0"))
+    with pytest.raises(ValueError, match="6 casas"):
+        run(_post("interest", rate="0.0000001"))
+    with pytest.raises(ValueError, match="entre 0 e 1"):
+        run(_post("interest", rate="1.5"))
+    with pytest.raises(ValueError, match="inválido"):
+        run(_post("bonus"))
+
+
+def test_fee_consolidates_balance_slots(run, make_account):
+    account_id = make_account()
+
+    async def _fill_slots():
+        async with SessionLocal() as db:
+            await set_balance_slots(db, account_id, 3)
+        for _ in range(3):
+            async with SessionLocal() as db:
+                await deposit(db, account_id, Decimal("5.00"))
+
+    run(_fill_slots())
+    report = run(_post("fee", amount="12.90", run_id="fee-parcelas"))
+    assert report["postings"] == 1
+
+    async def _slots():
+        async with SessionLocal() as db:
+            rows = await db.execute(select(AccountBalanceSlot.balance).filter(AccountBalanceSlot.account_id == account_id))
+            return rows.scalars().all()
+
+    # O saldo base não bastava sozinho: as parcelas foram consolidadas antes da cobrança.
+    assert run(_balances())[account_id] == 210
+    assert run(_slots()) == [0, 0, 0]
+    summary = run(_summary(account_id))
+    assert summary["totals"]["fees"] == Decimal("12.90")
+    assert summary["closing_balance"] == Decimal("2.10")
+
+
+def test_interrupted_run_resumes_from_checkpoint(run, make_account, monkeypatch):
+    accounts = [make_account(1000) for _ in range(4)]
+    post_chunk = postings._post_chunk
+
+    async def _failing_chunk(db, run_id, kind, amount_cents, rate_ppm, last_account_id, end):
+        if last_account_id >= accounts[1]:
+            raise RuntimeError("queda no meio da execução")
+        return await post_chunk(db, run_id, kind, amount_cents, rate_ppm, last_account_id, end)
+
+    monkeypatch.setattr(postings, "_post_chunk", _failing_chunk)
+    with pytest.raises(RuntimeError):
+        run(_post("fee", amount="1.00", run_id="fee-retomada", chunk_size=1))
+    assert run(_balances()) == dict(zip(accounts, [900, 900, 1000, 1000]))
+
+    monkeypatch.setattr(postings, "_post_chunk", post_chunk)
+    report = run(_post("fee", amount="1.00", run_id="fee-retomada", chunk_size=1))
+    assert report["resumed_from"] == accounts[1]
+    assert report["status"] == "done" and report["postings"] == 4 and report["posted"] == Decimal("4.00")
+    # Cada conta pagou uma única vez.
+    assert run(_balances()) == dict.fromkeys(accounts, 900)
+    assert sorted(account_id for account_id, _ in run(_postings("fee"))) == accounts
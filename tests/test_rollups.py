@@ -0,0 +1,70 @@
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.database import SessionLocal
+from app.services import rollups
+from app.services.bank_service import deposit, transfer, withdraw
+
+
+async def _summary(account_id, **kwargs):
+    async with SessionLocal() as db:
+        return await rollups.summary(db, account_id, **kwargs)
+
+
+async def _movements(first, second):
+    async with SessionLocal() as db:
+        await deposit(db, first, Decimal("100"))
+        await withdraw(db, first, Decimal("30.50"))
+        await transfer(db, first, second, Decimal("19.50"))
+
+
+def test_inline_rollups_follow_each_write(run, make_account):
+    first, second = make_account(), make_account()
+    run(_movements(first, second))
+
+    summary = run(_summary(first, granularity="dia"))
+    assert summary["totals"]["deposits"] == Decimal("100.00")
+    assert summary["totals"]["withdrawals"] == Decimal("30.50")
+    assert summary["totals"]["transfers_out"] == Decimal("19.50")
+    assert summary["totals"]["transactions"] == 3
+    assert summary["closing_balance"] == Decimal("50.00")
+    assert run(_summary(second))["closing_balance"] == Decimal("19.50")
+
+
+def test_catch_up_consolidates_pending_transactions(run, make_account, monkeypatch):
+    monkeypatch.setattr(rollups, "ROLLUP_MODE", "catchup")
+    run(rollups.ensure_rollups("catchup"))
+    first, second = make_account(), make_account()
+    run(_movements(first, second))
+    assert run(_summary(first))["totals"]["transactions"] == 0
+
+    assert run(rollups.catch_up(batch_size=2)) == 4
+    summary = run(_summary(first))
+    assert summary["closing_balance"] == Decimal("50.00")
+    assert summary["consolidated_through"] == 4
+    assert run(rollups.catch_up()) == 0
+
+
+def test_monthly_end_is_exclusive(run, make_account):
+    account_id = make_account()
+
+    async def _deposit():
+        async with SessionLocal() as db:
+            await deposit(db, account_id, Decimal("10"))
+
+    run(_deposit())
+    month_start = date.today().replace(day=1)
+    assert run(_summary(account_id, end=month_start))["periods"] == []
+    assert len(run(_summary(account_id, start=month_start))["periods"]) == 1
+
+
+def test_catch_up_refuses_other_databases(run, monkeypatch):
+    monkeypatch.setattr(rollups, "engine", SimpleNamespace(dialect=SimpleNamespace(name="postgresql")))
+    with pytest.raises(RuntimeError, match="catchup"):
+        run(rollups.ensure_rollups("catchup"))
+    with pytest.raises(RuntimeError, match="catchup"):
+        run(rollups.catch_up())
+    run(rollups.ensure_rollups("inline"))
@@ -0,0 +1,38 @@
+from app.views import routes
+
+
+def test_batch_applies_valid_items_and_reports_the_rest(api, make_account):
+    first, second = make_account(1000), make_account()
+    operations = [
+        {"account_id": first, "type": "withdraw", "amount": "4.00"},
+        {"account_id": second, "type": "deposit", "amount": "2.50"},
+        {"account_id": first, "type": "withdraw", "amount": "7.00"},
+        {"account_id": 999, "type": "deposit", "amount": "1"},
+        {"account_id": second, "type": "deposit", "amount": "0.001"},
+    ]
+    response = api("POST", "/api/lote", first, json=operations)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["applied"], body["rejected"]) == (2, 3)
+    results = body["results"]
+    assert [item["status"] for item in results] == ["ok", "ok", "erro", "erro", "erro"]
+    assert [item.get("detail") for item in results[2:]] == [
+        "Saldo insuficiente.", "Conta não encontrada.", "O valor deve ter no máximo 2 casas decimais.",
+    ]
+    statement = api("GET", f"/api/extrato/{first}", first).json()["transactions"]
+    assert [(t["type"], t["amount"]) for t in statement] == [("withdraw", 4.0)]
+
+
+def test_balance_and_summary_routes_hide_unexpected_errors(api, make_account, monkeypatch):
+    account_id = make_account()
+
+    async def _fail(*args, **kwargs):
+        raise RuntimeError("falha inesperada")
+
+    monkeypatch.setattr(routes, "get_balance_at", _fail)
+    monkeypatch.setattr(routes, "summary", _fail)
+    for url in (f"/api/saldo/{account_id}?em=2026-01-01T00:00:00", f"/api/resumo/{account_id}"):
+        response = api("GET", url, account_id)
+        assert response.status_code == 500
+        assert response.json() == {"detail": "Erro interno do servidor."}
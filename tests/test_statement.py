@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from app.main import _normalize_legacy_timestamps
+from app.models.database import SessionLocal, engine
+from app.services.bank_service import deposit, encode_cursor, get_statement
+
+
+async def _insert_legacy_rows(account_id, created_at_values):
+    # Formato gravado pelo server_default=func.now() das versões anteriores (só segundos).
+    async with engine.begin() as conn:
+        for created_at in created_at_values:
+            await conn.execute(
+                text(
+                    "INSERT INTO transactions (account_id, type, amount_cents, created_at) "
+                    "VALUES (:account_id, 'deposit', 100, :created_at)"
+                ),
+                {"account_id": account_id, "created_at": created_at},
+            )
+
+
+async def _normalize():
+    async with engine.begin() as conn:
+        await conn.run_sync(_normalize_legacy_timestamps)
+
+
+async def _all_pages(account_id, limit):
+    ids, after = [], None
+    async with SessionLocal() as db:
+        while True:
+            page = await get_statement(db, account_id, limit=limit, after=after)
+            if not page:
+                return ids
+            ids.extend(t.id for t in page)
+            after = encode_cursor(page[-1])
+
+
+def test_cursor_keeps_legacy_rows_from_the_same_second(run, make_account):
+    account_id = make_account()
+    run(_insert_legacy_rows(account_id, ["2024-01-01 10:00:00"] * 3 + ["2024-01-01 10:00:01"]))
+    run(_normalize())
+
+    async def _new_rows():
+        async with SessionLocal() as db:
+            await deposit(db, account_id, Decimal("5"))
+            await deposit(db, account_id, Decimal("6"))
+
+    run(_new_rows())
+    for limit in (1, 2, 4):
+        assert run(_all_pages(account_id, limit)) == [1, 2, 3, 4, 5, 6]
+
+
+def test_normalization_only_touches_second_resolution_values(run, make_account):
+    account_id = make_account()
+    run(_insert_legacy_rows(account_id, ["2024-01-01 10:00:00", "2024-01-01 10:00:00.250000"]))
+    run(_normalize())
+    run(_normalize())
+
+    async def _created_at():
+        async with engine.connect() as conn:
+            result = await conn.execute(text("SELECT created_at FROM transactions ORDER BY id"))
+            return [row[0] for row in result]
+
+    assert run(_created_at()) == ["2024-01-01 10:00:00.000000", "2024-01-01 10:00:00.250000"]
@@ -0,0 +1,63 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+
+from app.models import Account, Transaction
+from app.models.database import SessionLocal
+from app.services.bank_service import transfer
+
+
+async def _transfer(source, target, amount):
+    async with SessionLocal() as db:
+        try:
+            return await transfer(db, source, target, Decimal(amount))
+        except ValueError as e:
+            return str(e)
+
+
+async def _snapshot():
+    async with SessionLocal() as db:
+        balances = dict((await db.execute(select(Account.id, Account.balance_cents))).all())
+        rows = (await db.execute(select(Transaction.account_id, Transaction.type, Transaction.amount_cents))).all()
+        return balances, rows
+
+
+def test_transfer_moves_money_and_records_both_sides(run, make_account):
+    source, target = make_account(1000), make_account(0)
+    assert run(_transfer(source, target, "2.50")) == {"from_balance": Decimal("7.50"), "to_balance": Decimal("2.50")}
+    balances, rows = run(_snapshot())
+    assert balances == {source: 750, target: 250}
+    assert sorted(rows) == sorted([(source, "transfer_out", 250), (target, "transfer_in", 250)])
+
+
+@pytest.mark.parametrize(
+    "source, target, amount, message",
+    [
+        (1, 2, "20.00", "Saldo insuficiente."),
+        (1, 1, "1.00", "As contas de origem e destino devem ser diferentes."),
+        (1, 99, "1.00", "Conta de destino não encontrada."),
+        (99, 1, "1.00", "Conta de origem não encontrada."),
+    ],
+)
+def test_rejected_transfer_changes_nothing(run, make_account, source, target, amount, message):
+    make_account(1000), make_account(0)
+    assert run(_transfer(source, target, amount)) == message
+    assert run(_snapshot()) == ({1: 1000, 2: 0}, [])
+
+
+def test_crossed_concurrent_transfers_keep_the_total(run, make_account):
+    first, second = make_account(500), make_account(500)
+
+    async def _crossed():
+        return await asyncio.gather(*(
+            _transfer(first, second, "1.00") if index % 2 else _transfer(second, first, "1.00")
+            for index in range(40)
+        ))
+
+    results = run(_crossed())
+    assert all(isinstance(result, dict) for result in results)
+    balances, rows = run(_snapshot())
+    assert balances == {first: 500, second: 500}
+    assert len(rows) == 80
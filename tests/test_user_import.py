@@ -0,0 +1,39 @@
+import io
+
+from app.models.database import SessionLocal
+from app.services import user_import
+from app.services.auth_service import authenticate_user
+
+CSV = (
+    "username,password\n"
+    "ana,senha-ana\n"
+    "bruno,\n"
+    "carla,senha-carla\n"
+    "ana,outra\n"
+    "davi," + "x" * 73 + "\n"
+)
+
+
+def test_import_hashes_in_spawned_workers_and_resumes(run):
+    async def _import(**kwargs):
+        async with SessionLocal() as db:
+            return await user_import.import_users(db, io.BytesIO(CSV.encode()), "csv", batch_size=2, **kwargs)
+
+    try:
+        report = run(_import(import_id="lote-1", workers=2))
+        assert user_import._executor._mp_context.get_start_method() == "spawn"
+        # Mesmo import_id: a importação concluída não grava nada de novo.
+        again = run(_import(import_id="lote-1"))
+    finally:
+        user_import.shutdown()
+
+    assert (report["status"], report["rows"], report["imported"], report["rejected"]) == ("done", 5, 2, 3)
+    assert [error["row"] for error in report["errors"]] == [2, 4, 5]
+    assert (again["imported"], again["rejected"], again["resumed_from"]) == (2, 3, 5)
+
+    async def _login(username, password):
+        async with SessionLocal() as db:
+            return await authenticate_user(db, username, password)
+
+    assert run(_login("ana", "senha-ana")) is not None
+    assert run(_login("carla", "senha-ana")) is None
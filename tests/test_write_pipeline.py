@@ -0,0 +1,63 @@
+import asyncio
+from decimal import Decimal
+
+from sqlalchemy import func, select, update
+
+from app.models import Account, Transaction
+from app.models.database import SessionLocal
+from app.services.bank_service import deposit, withdraw
+from app.services.write_pipeline import write_pipeline
+
+
+async def _credit_then_fail(db, account_id):
+    await db.execute(
+        update(Account).where(Account.id == account_id).values(balance_cents=Account.balance_cents + 500)
+    )
+    raise ValueError("falha depois de escrever")
+
+
+async def _outcome(coro):
+    try:
+        return await coro
+    except ValueError as e:
+        return str(e)
+
+
+async def _in_session(op, *args):
+    async with SessionLocal() as db:
+        return await op(db, *args)
+
+
+async def _state(account_id):
+    async with SessionLocal() as db:
+        balance = await db.scalar(select(Account.balance_cents).filter(Account.id == account_id))
+        count = await db.scalar(select(func.count()).select_from(Transaction).filter(Transaction.account_id == account_id))
+        return balance, count
+
+
+def test_failed_operation_rolls_back_only_its_savepoint(run, make_account, monkeypatch):
+    account_id = make_account(100)
+    # Espera longa o bastante para as quatro operações caírem no mesmo lote.
+    monkeypatch.setattr(write_pipeline, "linger", 0.05)
+    before = write_pipeline.stats()
+
+    async def _batch():
+        await write_pipeline.start()
+        try:
+            return await asyncio.gather(
+                _outcome(write_pipeline.submit(_credit_then_fail, account_id)),
+                _outcome(_in_session(deposit, account_id, Decimal("1.00"))),
+                _outcome(_in_session(withdraw, account_id, Decimal("5.00"))),
+                _outcome(_in_session(withdraw, account_id, Decimal("0.50"))),
+            )
+        finally:
+            await write_pipeline.stop()
+
+    results = run(_batch())
+    assert results == ["falha depois de escrever", Decimal("2.00"), "Saldo insuficiente.", Decimal("1.50")]
+    # O crédito da operação que falhou foi desfeito; as outras foram confirmadas no mesmo commit.
+    assert run(_state(account_id)) == (150, 2)
+    stats = write_pipeline.stats()
+    assert stats["batches"] - before["batches"] == 1
+    assert (stats["ops_ok"] - before["ops_ok"], stats["ops_failed"] - before["ops_failed"]) == (2, 2)
+    assert not stats["running"]